@@ -13,9 +13,10 @@ from ttkbootstrap.dialogs import Messagebox as msg
 from ttkbootstrap.tooltip import ToolTip
 
 from libs.interface.character_creater import Character_creater
+from libs.interface.localisation import request_loc_layer
 from libs.interface.map_view import Mapview
 from libs.interface.running_window import RunningWindow
-from libs.reader.cache_reader import save_cache, load_cache
+from libs.reader.cache_reader import save_cache, load_cache, open_parse_cache, close_parse_cache
 from libs.reader.reader import *
 from libs.root import root
 
@@ -24,6 +25,9 @@ class App:
 
         self.has_cache = False
 
+        #查詢到尚未讀取的本地化層時在背景讀取，不在主執行緒讀取
+        root.game_loc.on_missing_layer = request_loc_layer
+
         self.show_and_create_widget()
         self.find_hoi4_path()
         self.update_task()
@@ -176,15 +180,13 @@ class App:
         append_mission(integrate_path,(),None,"整合路徑")
 
         if not root.using_cache:
+            append_mission(open_parse_cache,(),None,"開啟解析快取")
             append_mission(read_loc_files,(),None,"讀取本地化文件")
             append_mission(read_map_files,(),None,"讀取地圖")
             append_mission(read_country_tag_file,(),None,"讀取國家代碼")
             append_mission(read_country_color,(),None,"讀取國家配色")
-            append_mission(create_province_map_image,(),None,"繪製省分地圖")
-            append_mission(create_state_map_image,(),None,"繪製地塊地圖")
-            append_mission(create_strategic_map_image,(),None,"繪製戰略區地圖")
-            append_mission(create_nation_map_image,(),None,"繪製政權地圖")
             append_mission(read_buildings_files,(),None,"讀取建築")
+            append_mission(close_parse_cache,(),None,"關閉解析快取")
             append_mission(save_cache,(),None,"建立快取")
         else:
             append_mission(load_cache,(),None,"讀取快取")
@@ -6,22 +6,17 @@ abstract_map.py
 
 from typing import Literal
 
+from libs.map_store import ProvinceColumns, StateColumns
 from libs.pdxscript import PDXstatement
 
 class Province:
-    def __init__(self,
-                 id:int,
-                 color:tuple[int,int,int],
-                 terrain:Literal["unknown","lakes","forest","ocean","hills","plains","mountain","desert","marsh","urban","jungle"],
-                 type:Literal["land","sea"],
-                 coastal:bool,
-                 continent:int) -> None:
+    def __init__(self,id:int,columns:ProvinceColumns) -> None:
         self.id = id                #省分ID
-        self.color = color          #省分顏色
-        self.terrain = terrain      #省分地形
-        self.type = type            #省分海陸
-        self.coastal = coastal      #省分臨海
-        self.continent = continent  #省分大陸
+        self.color:tuple[int,int,int]   #省分顏色
+        self.terrain:Literal["unknown","lakes","forest","ocean","hills","plains","mountain","desert","marsh","urban","jungle"]  #省分地形
+        self.type:Literal["land","sea","lake"]  #省分海陸
+        self.coastal:bool           #省分臨海
+        self.continent:int          #省分大陸
         self.victory_point:int = None   #勝利點價值
         self.pos:tuple[int,int]     #勝利點座標(西南原點)
         self.buildings:set[Building]    #建築
@@ -29,21 +24,6 @@ class Province:
     @staticmethod
     def from_color(color:tuple[int,int,int]) -> 'Province':...
 
-class Adjacency:
-    def __init__(self,
-                 p1:int,
-                 p2:int,
-                 type:Literal["sea","impassable"] = "sea",
-                 through:int | None = None,
-                 pos1:tuple[int,int] | None = None,
-                 pos2:tuple[int,int] | None = None,
-                 rule:str = None) -> None:
-        self.p1, self.p2 = p1, p2           #連結的兩個省份ID
-        self.type = type                    #連結類型
-        self.through = through              #通過的省分
-        self.pos1, self.pos2 = pos1, pos2   #畫面起始與結束座標
-        self.rule = rule                    #連結規則
-
 class AdjacencyPassType:
     def __init__(self,army:bool,navy:bool,submarine:bool,trade:bool) -> None:
         self.army = army
@@ -73,11 +53,6 @@ class AdjacencyRule:
         self.icon_province = icon                       #圖示所在的省份ID
         self.offset = offset                            #圖示偏移的量
 
-class Railway:
-    def __init__(self,level:int,provinces:tuple[int]) -> None:
-        self.level = level
-        self.provinces = provinces
-
 class Building:
     def __init__(self,
                  name:Literal["infrastructure",
@@ -109,36 +84,24 @@ class Building:
         self.level = level
 
 class State:
-    def __init__(self,
-                 id:int,
-                 manpower:int,
-                 state_category:Literal["wasteland","enclave","tiny_island","pastoral","small_island","rural","town","large_town","city","large_city","metropolis","megalopolis"],                      
-                 owner:str,
-                 provinces:tuple[int],
-                 local_supply:float = 0,
-                 resources:dict[str,int] = None,
-                 buildings:set[Building] = None,
-                 core:set[str] = None,
-                 claim:set[str] = None,
-                 impassable:bool = False,
-                 controller:str = None) -> None:
-        
+    def __init__(self,id:int,columns:StateColumns) -> None:
         self.id = id
-        self.manpower = manpower
-        self.state_category = state_category
-        self.owner = owner
-        self.provinces = provinces
-        self.local_supply = local_supply
-        self.resources = resources
-        self.buildings = buildings
-        self.core = core
-        self.claim = claim
-        self.impassable = impassable
-        self.controller = controller
+        self.manpower:int
+        self.state_category:Literal["wasteland","enclave","tiny_island","pastoral","small_island","rural","town","large_town","city","large_city","metropolis","megalopolis"]
+        self.owner:str
+        self.provinces:list[int]
+        self.local_supply:float
+        self.resources:dict[str,int]
+        self.buildings:set[Building]
+        self.core:set[str]
+        self.claim:set[str]
+        self.impassable:bool
+        self.controller:str
+        self.demilitarized_zone:bool
     
     @staticmethod
     def from_province_id(province_id:int) -> 'State':...
-
+    
 class StrategicRegion:
     def __init__(self,id:int,provinces:tuple[int],name:str,naval_terrain:str=None) -> None:
         self.id = id
@@ -2,9 +2,96 @@
 image_view.py
 圖片檢視器元件
 '''
+from collections import OrderedDict
+import math
+
 from PIL import Image, ImageTk
 import ttkbootstrap as ttk
 
+#金字塔每一層切成的圖塊邊長(像素)，畫面上的圖塊介於一半到此大小之間
+TILE_SIZE = 256
+
+#最多快取的圖塊數量，需大於一個畫面可見的圖塊數
+TILE_CACHE_SIZE = 256
+
+#遮罩縮小時任何一個像素有值即保留
+_MASK_LUT = [0] + [255] * 255
+
+class ImagePyramid:
+    '''
+    圖片的多解析度金字塔，第n層的長寬為原圖的1/2^n(無條件進位)，每一層在第一次使用時才建立。\n
+    第n層的(x, y)取原圖的(x*2^n, y*2^n)，原圖在原處修改後以`invalidate`重新取樣對應的範圍
+    '''
+    def __init__(self,image:Image.Image,is_mask:bool = False) -> None:
+        '''
+        :param image: 原圖
+        :param is_mask: 是否為"L"模式的遮罩，遮罩以2x2取最大值縮小，避免細線在縮小後消失
+        '''
+        self.levels:list[Image.Image] = [image]
+        self.is_mask = is_mask
+
+    def level(self,n:int) -> Image.Image:
+        '''
+        取得第n層的圖片
+        '''
+        while len(self.levels) <= n:
+            if self.is_mask:
+                self.levels.append(self.levels[-1].reduce(2).point(_MASK_LUT))
+
+            #最近鄰取樣的成本只與結果大小有關，直接由原圖取樣
+            else:
+                self.levels.append(self._sample(len(self.levels)))
+
+        return self.levels[n]
+
+    def region(self,n:int,box:tuple[int,int,int,int]) -> tuple[int,int,int,int]:
+        '''
+        原圖中box範圍的像素在第n層對應的範圍
+        '''
+        factor = 1 << n
+        return tuple(-(-value // factor) for value in box)
+
+    def invalidate(self,box:tuple[int,int,int,int]) -> None:
+        '''
+        原圖中box範圍的像素在原處修改後，重新取樣已建立的層級中對應的範圍
+        '''
+        #遮罩是逐層縮小的，直接捨棄，使用時再重建
+        if self.is_mask:
+            del self.levels[1:]
+            return
+
+        for n in range(1,len(self.levels)):
+            region = self.region(n,box)
+            if region[2] > region[0] and region[3] > region[1]:
+                self.levels[n].paste(self._sample(n,region),region[:2])
+
+    def _sample(self,n:int,region:tuple[int,int,int,int] | None = None) -> Image.Image:
+        '''
+        由原圖取樣第n層的圖片，或只取樣第n層中region的範圍
+        '''
+        factor = 1 << n
+        if region is None:
+            w, h = self.levels[0].size
+            region = (0, 0, -(-w // factor), -(-h // factor))
+
+        #仿射轉換以像素中心取樣，偏移後取樣點剛好落在原圖像素上，局部取樣的結果與整層取樣完全相同
+        offset = 0.5 - factor / 2
+        return self.levels[0].transform((region[2] - region[0], region[3] - region[1]),
+                                        Image.Transform.AFFINE,
+                                        (factor, 0, factor * region[0] + offset, 0, factor, factor * region[1] + offset),
+                                        Image.Resampling.NEAREST)
+
+def _tile_level(scale:float) -> tuple[int,int]:
+    '''
+    依縮放倍率選擇解析度不低於畫面的金字塔層級，回傳(層級, 圖塊涵蓋的原圖像素邊長)。\n
+    圖塊涵蓋的原圖像素使其在畫面上介於TILE_SIZE的一半到TILE_SIZE之間
+    '''
+    exponent = math.floor(math.log2(1 / scale))
+    return max(exponent, 0), max(1, int(TILE_SIZE * 2.0 ** exponent))
+
+def _overlaps(a:tuple[int,int,int,int],b:tuple[int,int,int,int]) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
 class Imageview(ttk.Canvas):
     '''
     圖片檢視器元件
@@ -27,12 +114,16 @@ class Imageview(ttk.Canvas):
         super().__init__(**kwargs)
         
         self.image = image
+        self.overlays:list[tuple[Image.Image,tuple[int,int,int]]] = []    #疊加在圖片上的(遮罩, 顏色)
 
-        if self.image is not None:
-            self.image_tk = ImageTk.PhotoImage(self.image)
-        
-        else:
-            self.image_tk = None
+        self.pyramid = ImagePyramid(image) if image is not None else None
+        self.overlay_pyramids:list[tuple[ImagePyramid,tuple[int,int,int]]] = []
+
+        #金字塔圖塊(已疊加圖層)與畫面圖塊的快取，切換圖片或疊加圖層時清空
+        #前者鍵為(層級, 圖塊x, 圖塊y)，縮放時同一層級可以沿用；後者鍵為(縮放倍率, 圖塊x, 圖塊y)
+        self.level_tile_cache:OrderedDict[tuple[int,int,int],Image.Image] = OrderedDict()
+        self.tile_cache:OrderedDict[tuple[float,int,int],ImageTk.PhotoImage] = OrderedDict()
+        self.tiles_tk:list[ImageTk.PhotoImage] = []    #畫面上的圖塊，需保留參照避免被回收
 
         self.image_scale_factor = 1.0
         self.min_scale, self.max_scale = scale_restrction
@@ -42,15 +133,11 @@ class Imageview(ttk.Canvas):
 
         self.always_bg = always_bg
 
-        self.create_image(0, 0, image=self.image_tk, anchor=ttk.NW,tag="_image_28a391cf82739")#單純沒有意義的hash，避免衝突
-
-        if self.always_bg:
-            self.tag_lower("_image_28a391cf82739")
-
-        # 配置互動(滾輪縮放、拖曳)
+        # 配置互動(滾輪縮放、拖曳)，視窗大小改變時重新渲染
         self.bind(operation_key[0], self._zoom)
         self.bind(operation_key[1], self._start_pan)
         self.bind(operation_key[2], self._pan)
+        self.bind("<Configure>", lambda event: self._render_task() if self.image else None)
 
     def _zoom(self, event):
         '''
@@ -100,50 +187,114 @@ class Imageview(ttk.Canvas):
 
     def _render_task(self) -> None:
         '''
-        內部方法，重新渲染畫面。
+        內部方法，重新渲染畫面。依縮放倍率選擇金字塔的層級，只顯示可見的圖塊
         '''
         w, h = self.image.size
         canvas_width, canvas_height = (self.winfo_width(), self.winfo_height())
+        scale = self.image_scale_factor
 
         # 顯示窗口在"圖片"的座標
-        view_x0 = max(0, int(-self.offset_x / self.image_scale_factor))
-        view_y0 = max(0, int(-self.offset_y / self.image_scale_factor))
-        view_x1 = min(w, int((canvas_width - self.offset_x) / self.image_scale_factor))
-        view_y1 = min(h, int((canvas_height - self.offset_y) / self.image_scale_factor))
+        view_x0 = max(0, int(-self.offset_x / scale))
+        view_y0 = max(0, int(-self.offset_y / scale))
+        view_x1 = min(w, int((canvas_width - self.offset_x) / scale))
+        view_y1 = min(h, int((canvas_height - self.offset_y) / scale))
 
         #座標正常才刷新
         if not (view_x1 > view_x0 and view_y1 > view_y0): return
-            
-        #只保留圖片可見區域並裁切
-        cropped_img = self.image.crop((view_x0, view_y0, view_x1, view_y1))
-
-        #裁切後的圖片大小
-        cropped_w = view_x1 - view_x0
-        cropped_h = view_y1 - view_y0
-
-        #縮放裁切影像至視窗大小
-        if int(cropped_w * self.image_scale_factor) > 0 and int(cropped_h * self.image_scale_factor) > 0:
-            scaled_cropped_img = cropped_img.resize(
-                size=(int(cropped_w * self.image_scale_factor), int(cropped_h * self.image_scale_factor)),
-                resample=Image.Resampling.NEAREST,
-            )
-        
-        else:
-            scaled_cropped_img = cropped_img
 
-        # 更新顯示圖像
-        self.image_tk = ImageTk.PhotoImage(scaled_cropped_img)
+        level, span = _tile_level(scale)
+
+        origin_x, origin_y = round(self.offset_x), round(self.offset_y)
+        tiles_tk = []
+
         self.delete("_image_28a391cf82739")
-        self.create_image(
-            self.offset_x + view_x0 * self.image_scale_factor,
-            self.offset_y + view_y0 * self.image_scale_factor,
-            image=self.image_tk,
-            anchor=ttk.NW,
-            tag="_image_28a391cf82739"
-        )
+        for tile_y in range(view_y0 // span, (view_y1 - 1) // span + 1):
+            for tile_x in range(view_x0 // span, (view_x1 - 1) // span + 1):
+                box = (tile_x * span, tile_y * span, min(w, (tile_x + 1) * span), min(h, (tile_y + 1) * span))
+                tile_tk = self._get_tile(scale, level, tile_x, tile_y, box)
+                tiles_tk.append(tile_tk)
+
+                #相鄰圖塊以相同的方式取整，避免出現縫隙
+                self.create_image(
+                    origin_x + round(box[0] * scale),
+                    origin_y + round(box[1] * scale),
+                    image=tile_tk,
+                    anchor=ttk.NW,
+                    tag="_image_28a391cf82739"#單純沒有意義的hash，避免衝突
+                )
+
+        self.tiles_tk = tiles_tk
 
         if self.always_bg:
             self.tag_lower("_image_28a391cf82739")
+
+    def _get_tile(self, scale:float, level:int, tile_x:int, tile_y:int, box:tuple[int,int,int,int]) -> ImageTk.PhotoImage:
+        '''
+        內部方法，取得畫面圖塊，沒有快取時由金字塔圖塊裁切並縮放至畫面上的大小
+
+        :param box: 圖塊在原圖的範圍
+        '''
+        key = (scale, tile_x, tile_y)
+        tile_tk = self.tile_cache.get(key)
+        if tile_tk is not None:
+            self.tile_cache.move_to_end(key)
+            return tile_tk
+
+        #放大超過一倍時，畫面圖塊只是第0層圖塊的一部分
+        factor = 1 << level
+        level_box = tuple(-(-value // factor) for value in box)
+        level_x, level_y = level_box[0] // TILE_SIZE, level_box[1] // TILE_SIZE
+        tile = self._get_level_tile(level, level_x, level_y)
+
+        if tile.size != (level_box[2] - level_box[0], level_box[3] - level_box[1]):
+            origin_x, origin_y = level_x * TILE_SIZE, level_y * TILE_SIZE
+            tile = tile.crop((level_box[0] - origin_x, level_box[1] - origin_y, level_box[2] - origin_x, level_box[3] - origin_y))
+
+        size = (max(1, round(box[2] * scale) - round(box[0] * scale)), max(1, round(box[3] * scale) - round(box[1] * scale)))
+        if tile.size != size:
+            tile = tile.resize(size=size, resample=Image.Resampling.NEAREST)
+
+        tile_tk = ImageTk.PhotoImage(tile)
+        self.tile_cache[key] = tile_tk
+
+        while len(self.tile_cache) > TILE_CACHE_SIZE:
+            self.tile_cache.popitem(last=False)
+
+        return tile_tk
+
+    def _get_level_tile(self, level:int, level_x:int, level_y:int) -> Image.Image:
+        '''
+        內部方法，取得金字塔第level層的圖塊，沒有快取時裁切並疊加圖層
+        '''
+        key = (level, level_x, level_y)
+        tile = self.level_tile_cache.get(key)
+        if tile is not None:
+            self.level_tile_cache.move_to_end(key)
+            return tile
+
+        level_image = self.pyramid.level(level)
+        level_box = (level_x * TILE_SIZE, 
+                     level_y * TILE_SIZE, 
+                     min(level_image.width, (level_x + 1) * TILE_SIZE), 
+                     min(level_image.height, (level_y + 1) * TILE_SIZE))
+
+        #先轉成RGB，建立PhotoImage時不需再轉換
+        tile = level_image.crop(level_box)
+        if tile.mode not in ("RGB","RGBA"):
+            tile = tile.convert("RGB")
+
+        #疊加圖層也只處理圖塊的範圍，大小與圖片不同的遮罩不疊加
+        #遮罩只有0與255，轉成"1"模式後疊加較快
+        for pyramid, color in self.overlay_pyramids:
+            if pyramid.levels[0].size != self.image.size: continue
+            tile.paste(color, mask=pyramid.level(level).crop(level_box).convert("1",dither=Image.Dither.NONE))
+
+        self.level_tile_cache[key] = tile
+
+        while len(self.level_tile_cache) > TILE_CACHE_SIZE:
+            self.level_tile_cache.popitem(last=False)
+
+        return tile
     
     def force_render(self) -> None:
         '''
@@ -153,11 +304,56 @@ class Imageview(ttk.Canvas):
 
     def set_image(self,image) -> None:
         '''
-        設定圖片
+        設定圖片，與目前的圖片相同時只重新渲染，圖片在原處修改後以`invalidate`更新
         '''
-        self.image = image
+        if image is not self.image:
+            self.image = image
+            self.pyramid = ImagePyramid(image)
+            self.level_tile_cache.clear()
+            self.tile_cache.clear()
+
+        self._render_task()
+
+    def invalidate(self,box:tuple[int,int,int,int]) -> None:
+        '''
+        圖片在原處修改後，只重新取樣金字塔中對應的範圍，丟棄與其重疊的圖塊後重新渲染
+
+        :param box: 修改的範圍(左, 上, 右, 下)，原圖座標
+        '''
+        if self.pyramid is None: return
+
+        self.pyramid.invalidate(box)
+
+        for key in [key for key in self.level_tile_cache if _overlaps(self.pyramid.region(key[0],box),
+                                                                      (key[1] * TILE_SIZE, key[2] * TILE_SIZE, (key[1] + 1) * TILE_SIZE, (key[2] + 1) * TILE_SIZE))]:
+            del self.level_tile_cache[key]
+
+        #畫面圖塊由其範圍在對應層級中的像素縮放而成
+        for key in list(self.tile_cache):
+            scale, tile_x, tile_y = key
+            level, span = _tile_level(scale)
+            tile_box = (tile_x * span, tile_y * span, (tile_x + 1) * span, (tile_y + 1) * span)
+            if _overlaps(self.pyramid.region(level,box),self.pyramid.region(level,tile_box)):
+                del self.tile_cache[key]
+
         self._render_task()
     
+    def set_overlays(self,overlays:list[tuple[Image.Image,tuple[int,int,int]]]) -> None:
+        '''
+        設定疊加在圖片上的圖層，切換圖片時保留
+
+        :param overlays: (遮罩, 顏色)的列表，遮罩為與圖片同大小的"L"模式圖像，由前往後疊加
+        '''
+        self.overlays = list(overlays)
+
+        #遮罩沒有改變的圖層沿用已建立的金字塔
+        pyramids = {id(pyramid.levels[0]): pyramid for pyramid, _ in self.overlay_pyramids}
+        self.overlay_pyramids = [(pyramids.get(id(mask)) or ImagePyramid(mask,is_mask=True), color) for mask, color in self.overlays]
+
+        self.level_tile_cache.clear()
+        self.tile_cache.clear()
+        if self.image: self._render_task()
+
     def get_image_postion(self,x:int,y:int) -> tuple[int,int] | None:
         '''
         由畫面座標取得圖像座標
@@ -4,6 +4,9 @@ localisation.py
 本地化文字
 '''
 
+from libs.interface.running_window import RunningWindow
+from libs.loc_resolver import strip_colors
+from libs.reader.reader import read_loc_layer
 from libs.root import root
 
 def loc(key:str) -> str:
@@ -14,4 +17,30 @@ def loc(key:str) -> str:
         return root.game_loc[key]
     
     except KeyError:
-        return key
\ No newline at end of file
+        return key
+
+def loc_text(key:str) -> str:
+    '''
+    獲取展開$KEY$引用並移除顏色代碼的本地化字串，用於介面上的顯示
+    '''
+    return strip_colors(root.game_loc.resolve(key,default=key))
+
+def search_loc(text:str,prefix:bool = False,limit:int | None = 100) -> list[tuple[str,str]]:
+    '''
+    搜尋key或字串中包含`text`的本地化字串，回傳(key, 字串)的列表
+
+    :param prefix: 只搜尋以`text`開頭的key或字串
+    '''
+    return root.game_loc.search(text,prefix=prefix,limit=limit)
+
+def request_loc_layer(language:str) -> None:
+    '''
+    查詢到尚未讀取的本地化層時(`LocStore.on_missing_layer`)，以RunningWindow在背景讀取，讀取完成前查詢退回英文
+    '''
+    #查詢也可能發生在RunningWindow的執行緒，視窗一律交給主執行緒建立
+    root.after(0,lambda: RunningWindow(execute_list=[read_loc_layer],
+                                       args_list=[(language,)],
+                                       callback_function_list=[None],
+                                       prev=root,
+                                       title="執行中",
+                                       progress_msgs=[f"讀取本地化文件({language})"]))
@@ -2,18 +2,18 @@
 map_view.py
 '''
 
-from typing import Literal
-
 from pathlib import Path
 from PIL import Image, ImageTk
 import ttkbootstrap as ttk
+from ttkbootstrap.dialogs import Messagebox as msg
 from ttkbootstrap.tooltip import ToolTip
 from ttkbootstrap.validation import add_numeric_validation
 
 from libs.enums import *
-from libs.interface.localisation import loc
+from libs.interface.localisation import loc, loc_text
 from libs.interface.image_view import Imageview
 from libs.map import *
+from libs.map_render import BORDER_LAYERS, MAP_MODES
 from libs.root import root
 
 class Mapview:
@@ -23,6 +23,11 @@ class Mapview:
 
     def __init__(self,prev:ttk.Toplevel | ttk.Window) -> None:
         self.prev = prev
+
+        #地圖資料重新讀取後，舊的地圖模式圖像會被清除
+        root.map_modes.bind(root.game_image.province_raster,root.map_data)
+        root.map_borders.bind(root.game_image.province_raster,root.map_data)
+
         self.show_and_create_widget()
         self.mode = "province"
     
@@ -40,9 +45,12 @@ class Mapview:
                                    width=900,
                                    scale_restrction=(0.21,20),
                                    operation_key=("<MouseWheel>","<ButtonPress-2>","<B2-Motion>"),
-                                   image=root.game_image.province_map)
+                                   image=root.map_modes.get("province"))
         self.imageview.pack(fill=ttk.Y,expand=True)
 
+        #快取中的圖像在原處重繪後，顯示中的圖片只更新改變的範圍
+        root.map_modes.on_patch = self.on_map_mode_patched
+
         self.imageview.create_rectangle(0,0,900,40,fill="#555555")
         self.imageview.create_text(10,10,text="省分ID:",fill="#CCCCCC",font="Helvetica 12",anchor=ttk.NW,tags="_text")
         self.imageview.create_text(760,10,text="座標:",fill="#CCCCCC",font="Helvetica 12",anchor=ttk.NW,tags="_coord")
@@ -50,21 +58,47 @@ class Mapview:
         self.imageview.bind("<Motion>", self.get_hover_color)
         self.imageview.bind("<ButtonPress-1>",self.show_map_item)
 
+        #地圖模式由資料繪製，另外三種直接顯示原始圖像
+        view_mode_loc = {name: mode.label for name, mode in MAP_MODES.items()} | {"river": "河流","heightmap": "高度圖","terrain": "地形"}
+        image_modes = ("river","heightmap","terrain")
+
         view_mode_frame = ttk.Frame(master=map_frame)
         view_mode_frame.pack(fill=ttk.X)
-
-        view_mode = ("province","state","strategic","nation","river","heightmap","terrain")
-        view_mode_loc = dict(zip(view_mode,("省分","地塊","戰略區","政權","河流","高度圖","地形")))
+        image_mode_frame = ttk.Frame(master=map_frame)
+        image_mode_frame.pack(fill=ttk.X)
 
         view_mode_button:dict[str,ttk.Button] = dict()
 
-        for mode in view_mode:
-            button = ttk.Button(master=view_mode_frame,
+        for mode in view_mode_loc:
+            button = ttk.Button(master=view_mode_frame if mode not in image_modes else image_mode_frame,
                                 text=view_mode_loc[mode],
                                 style=ttk.OUTLINE,
                                 command=lambda x=mode:self.set_view_mode(x))
             view_mode_button[mode] = button
             view_mode_button[mode].pack(side=ttk.LEFT,pady=5)
+
+        #需要參數的地圖模式(如某個國家的核心)使用的參數
+        parameter_text = "/".join(mode.parameter_label for mode in MAP_MODES.values() if mode.parameter_label is not None)
+        ttk.Label(master=image_mode_frame,text=f"  {parameter_text}: ").pack(side=ttk.LEFT)
+
+        self.parameter_var = ttk.StringVar()
+        ttk.Entry(master=image_mode_frame,textvariable=self.parameter_var,width=20).pack(side=ttk.LEFT)
+
+        #邊界圖層的開關
+        border_frame = ttk.Frame(master=map_frame)
+        border_frame.pack(fill=ttk.X)
+        ttk.Label(master=border_frame,text="邊界: ").pack(side=ttk.LEFT)
+
+        self.border_vars:dict[str,ttk.BooleanVar] = dict()
+
+        for name, layer in BORDER_LAYERS.items():
+            self.border_vars[name] = ttk.BooleanVar(value=name in root.map_borders.enabled)
+            ttk.Checkbutton(master=border_frame,
+                            text=layer.label,
+                            variable=self.border_vars[name],
+                            command=lambda x=name:self.toggle_border(x)).pack(side=ttk.LEFT,padx=5)
+
+        self.imageview.set_overlays(root.map_borders.overlays())
         
         self.info_frame = ttk.Labelframe(master=toplevel,width=420,text="詳細資訊")
         self.info_frame.pack(side=ttk.LEFT,fill=ttk.BOTH,expand=True,padx=5,pady=5)
@@ -196,23 +230,20 @@ class Mapview:
                 terrain_picture.config(image=terrain_picture.image)
                 terrain_picture.grid(row=7,column=0,padx=10,sticky=ttk.W)
 
-            ToolTip(terrain_picture,text=loc(province_data.terrain),bootstyle=ttk.LIGHT)
+            ToolTip(terrain_picture,text=loc_text(province_data.terrain),bootstyle=ttk.LIGHT)
         
         elif self.mode == "state":
-            color = root.game_image.state_map.getpixel((img_x, img_y))
-            try:
-                state_data = State.from_province_id(Province.from_color(color).id)
-            except:
-                return
-            name_label = ttk.Label(master=self.inner_info_frame,text="名稱: "+loc(f"STATE_{state_data.id}"))
+            state_data = State.from_province_id(root.game_image.province_raster.province_at(img_x,img_y))
+            if state_data is None: return
+            name_label = ttk.Label(master=self.inner_info_frame,text="名稱: "+loc_text(f"STATE_{state_data.id}"))
             name_label.grid(row=0,column=0,padx=10,sticky=ttk.W)
             id_label = ttk.Label(master=self.inner_info_frame,text="ID: "+str(state_data.id))
             id_label.grid(row=1,column=0,padx=10,sticky=ttk.W)
             manpower_label = ttk.Label(master=self.inner_info_frame,text="人口: "+str(state_data.manpower))
             manpower_label.grid(row=2,column=0,padx=10,sticky=ttk.W)
-            category_label = ttk.Label(master=self.inner_info_frame,text="類型: "+loc(state_data.state_category))
+            category_label = ttk.Label(master=self.inner_info_frame,text="類型: "+loc_text(state_data.state_category))
             category_label.grid(row=3,column=0,padx=10,sticky=ttk.W)
-            owner_label = ttk.Label(master=self.inner_info_frame,text="擁有者: "+loc(f"{state_data.owner}_DEF")+"("+str(state_data.owner)+")")
+            owner_label = ttk.Label(master=self.inner_info_frame,text="擁有者: "+loc_text(f"{state_data.owner}_DEF")+"("+str(state_data.owner)+")")
             owner_label.grid(row=4,column=0,padx=10,sticky=ttk.W)
             local_supply_label = ttk.Label(master=self.inner_info_frame,text="當地補給: "+str(state_data.local_supply))
             local_supply_label.grid(row=5,column=0,padx=10,sticky=ttk.W)
@@ -223,10 +254,10 @@ class Mapview:
 
                 if isinstance(state_data.core,list):
                     for nation in state_data.core:
-                        core_text += loc(nation+"_DEF")+"("+str(nation)+") "
+                        core_text += loc_text(nation+"_DEF")+"("+str(nation)+") "
                 
                 else:
-                    core_text += loc(state_data.core+"_DEF")+"("+str(state_data.core)+") "
+                    core_text += loc_text(state_data.core+"_DEF")+"("+str(state_data.core)+") "
             
             else: 
                 core_text = "無"
@@ -240,10 +271,10 @@ class Mapview:
 
                 if isinstance(state_data.claim,list):
                     for nation in state_data.claim:
-                        claim_text += loc(nation+"_DEF")+"("+str(nation)+") "
+                        claim_text += loc_text(nation+"_DEF")+"("+str(nation)+") "
                 
                 else:
-                    claim_text += loc(state_data.claim+"_DEF")+"("+str(state_data.claim)+") "
+                    claim_text += loc_text(state_data.claim+"_DEF")+"("+str(state_data.claim)+") "
             
             else: 
                 claim_text = "無"
@@ -255,7 +286,7 @@ class Mapview:
 
             if state_data.resources is not None:
                 for resource in state_data.resources:
-                    resource_text += loc(f"PRODUCTION_MATERIALS_{resource.upper()}")+f"x{int(state_data.resources[resource])} "
+                    resource_text += loc_text(f"PRODUCTION_MATERIALS_{resource.upper()}")+f"x{int(state_data.resources[resource])} "
 
             else:
                 resource_text = "無"
@@ -267,7 +298,7 @@ class Mapview:
 
             if state_data.buildings is not None:
                 for building in state_data.buildings:
-                    building_text += loc(building.name)+f"x{building.level} "
+                    building_text += loc_text(building.name)+f"x{building.level} "
 
             else:
                 building_text = "無"
@@ -289,15 +320,16 @@ class Mapview:
                 special_property_label.grid(row=100,column=0,padx=10,sticky=ttk.W)
 
         elif self.mode == "strategic":
-            color = root.game_image.strategic_map.getpixel((img_x, img_y))
+            province_id = root.game_image.province_raster.province_at(img_x,img_y)
+            if province_id == 0: return
 
-            strategic_data = StrategicRegion.from_province_id(Province.from_color(color).id)
+            strategic_data = StrategicRegion.from_province_id(province_id)
 
-            name_label = ttk.Label(master=self.inner_info_frame,text=f"名稱: {loc(strategic_data.name)}")
+            name_label = ttk.Label(master=self.inner_info_frame,text=f"名稱: {loc_text(strategic_data.name)}")
             name_label.grid(row=0,column=0,padx=10,sticky=ttk.W)
             id_label = ttk.Label(master=self.inner_info_frame,text=f"ID: {strategic_data.id}")
             id_label.grid(row=1,column=0,padx=10,sticky=ttk.W)
-            naval_terrain_label = ttk.Label(master=self.inner_info_frame,text=f"海軍地形: {loc(strategic_data.naval_terrain) if strategic_data.naval_terrain is not None else "海洋"}")
+            naval_terrain_label = ttk.Label(master=self.inner_info_frame,text=f"海軍地形: {loc_text(strategic_data.naval_terrain) if strategic_data.naval_terrain is not None else "海洋"}")
             naval_terrain_label.grid(row=2,column=0,padx=10,sticky=ttk.W)
         
     def get_hover_color(self,event) -> None:
@@ -324,16 +356,16 @@ class Mapview:
             terrain = province_data.terrain
             state = State.from_province_id(province_data.id)
 
-            province_name = f"({loc(f"VICTORY_POINTS_{province_data.id}")})"
+            province_name = f"({loc_text(f"VICTORY_POINTS_{province_data.id}")})"
             
             if "VICTORY_POINTS_" in province_name: province_name = ""
 
             if state is not None:
-                state_name = loc(f"STATE_{state.id}") + f"(#{state.id})的"
+                state_name = loc_text(f"STATE_{state.id}") + f"(#{state.id})的"
             else:
                 state_name = ""
 
-            self.imageview.itemconfig("_text",text=f"{state_name}{loc(terrain)}省分(#{province_data.id} {province_name})")
+            self.imageview.itemconfig("_text",text=f"{state_name}{loc_text(terrain)}省分(#{province_data.id} {province_name})")
 
         elif self.mode == "heightmap":
             #灰階圖像
@@ -341,17 +373,14 @@ class Mapview:
             self.imageview.itemconfig("_text",text=f"高度:{color}")
         
         elif self.mode == "state":
-            #以顏色獲取資料
-            province_data = Province.from_color(color)
+            #以省分ID獲取地塊，地圖模式的顏色不對應省分
+            state = State.from_province_id(root.game_image.province_raster.province_at(img_x,img_y))
 
-            if province_data is not None:
-                state = State.from_province_id(province_data.id)
-
-            if province_data is None:
+            if state is None:
                 self.imageview.itemconfig("_text",text="海洋")
 
             else:
-                self.imageview.itemconfig("_text",text=f"{loc("STATE_"+str(state.id))}(#{state.id})")
+                self.imageview.itemconfig("_text",text=f"{loc_text("STATE_"+str(state.id))}(#{state.id})")
 
         elif self.mode == "river":
             try:
@@ -368,38 +397,73 @@ class Mapview:
                 self.imageview.itemconfig("_text",text="")
 
         elif self.mode == "nation":
-            #以state視圖分析
-            color = root.game_image.state_map.getpixel((img_x, img_y))
-
-            #以顏色獲取國家TAG
+            #以省分ID獲取國家TAG
             try:
-                country_tag = State.from_province_id(Province.from_color(color).id).owner
+                country_tag = State.from_province_id(root.game_image.province_raster.province_at(img_x,img_y)).owner
 
-                self.imageview.itemconfig("_text",text=f"{loc(country_tag+"_DEF")}({country_tag})")
+                self.imageview.itemconfig("_text",text=f"{loc_text(country_tag+"_DEF")}({country_tag})")
             except:
                 self.imageview.itemconfig("_text",text="")
 
         elif self.mode == "strategic":
             try:
-                strategic = StrategicRegion.from_province_id(Province.from_color(color).id)
+                strategic = StrategicRegion.from_province_id(root.game_image.province_raster.province_at(img_x,img_y))
 
-                self.imageview.itemconfig("_text",text=f"{loc(root.map_data.strategicregions[strategic.id].name)}(#{strategic.id})")
+                self.imageview.itemconfig("_text",text=f"{loc_text(root.map_data.strategicregions[strategic.id].name)}(#{strategic.id})")
             except:
                 self.imageview.itemconfig("_text",text="")
 
+        elif self.mode in MAP_MODES:
+            #其他地圖模式顯示所在的地塊與省分
+            province_id = root.game_image.province_raster.province_at(img_x,img_y)
+            state = State.from_province_id(province_id)
+
+            if province_id == 0:
+                self.imageview.itemconfig("_text",text="")
+
+            elif state is None:
+                self.imageview.itemconfig("_text",text=f"省分(#{province_id})")
+
+            else:
+                self.imageview.itemconfig("_text",text=f"{loc_text("STATE_"+str(state.id))}(#{state.id})的省分(#{province_id})")
+
         self.imageview.itemconfig("_coord",text=f"座標:({img_x},{img_y})")
 
-    def set_view_mode(self,mode_name:Literal["province","state","strategic","nation","river","heightmap","terrain"]) -> None:
+    def toggle_border(self,name:str) -> None:
+        '''
+        開關邊界圖層
+        '''
+        root.map_borders.toggle(name,self.border_vars[name].get())
+        self.update_borders()
+
+    def update_borders(self) -> None:
         '''
-        設定視圖模式
+        重新疊加開啟的邊界圖層，區域沒有改變的圖層使用快取
         '''
+        self.imageview.set_overlays(root.map_borders.overlays())
+
+    def on_map_mode_patched(self,image:Image.Image,box:tuple[int,int,int,int]) -> None:
+        '''
+        地圖模式的圖像在原處重繪，正在顯示時更新金字塔與圖塊中改變的範圍
+        '''
+        if image is self.imageview.image and self.imageview.winfo_exists():
+            self.imageview.invalidate(box)
+
+    def set_view_mode(self,mode_name:str) -> None:
+        '''
+        設定視圖模式，`MAP_MODES`中的模式在第一次選用時繪製
+
+        :param mode_name: `MAP_MODES`中的代號，或river、heightmap、terrain
+        '''
+        if mode_name in MAP_MODES:
+            try: using_image = root.map_modes.get(mode_name,self.parameter_var.get().strip() or None)
+            except Exception as e:
+                msg.show_warning(message=str(e),title="提示")
+                return
+
         self.mode = mode_name
 
         match self.mode:
-            case "province":    using_image = root.game_image.province_map
-            case "state":       using_image = root.game_image.state_map
-            case "strategic":   using_image = root.game_image.strategic_map
-            case "nation":      using_image = root.game_image.nation_map
             case "river":       using_image = root.game_image.rivers_image
             case "heightmap":   using_image = root.game_image.heightmap_image
             case "terrain":     using_image = root.game_image.terrain_image
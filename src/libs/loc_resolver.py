@@ -0,0 +1,106 @@
+'''
+loc_resolver.py
+
+展開本地化字串中的$KEY$引用
+'''
+
+import re
+from typing import Callable
+
+#形如 $KEY$ 或 $KEY|Y$ 的引用，|後面為數字或顏色格式，展開時忽略
+REFERENCE_PATTERN = re.compile(r"\$(\w+)(?:\|[^$\n]*)?\$")
+
+#形如 §Y 或 §! 的顏色代碼
+COLOR_PATTERN = re.compile(r"§.")
+
+class LocResolver:
+    '''
+    說明
+    ---------------------------------------------
+    遞迴展開本地化字串中的`$KEY$`引用：
+    >>> resolver = LocResolver({"A": "$B$ army", "B": "Germany"}.get)
+    >>> resolver.resolve("A")
+    'Germany army'
+
+    找不到的key(如腳本填入的`$VALUE$`)與循環引用會保留原本的`$KEY$`。\n
+    展開的結果會被保存，並記錄每個key引用了哪些key；
+    某個key改變時，`invalidate`只清除直接或間接引用它的結果。
+    '''
+
+    def __init__(self,lookup:Callable[[str],str | None]) -> None:
+        '''
+        :param lookup: 查詢未展開的字串，找不到時回傳None
+        '''
+        self.lookup = lookup
+
+        self._resolved:dict[str,str | None] = dict()        #key→展開後的字串
+        self._dependents:dict[str,set[str]] = dict()        #key→引用它的key
+
+    def resolve(self,key:str) -> str | None:
+        '''
+        回傳`key`展開後的字串，找不到時回傳None
+        '''
+        if key in self._resolved: return self._resolved[key]
+        return self._resolve(key,set())[0]
+
+    def _resolve(self,key:str,resolving:set[str]) -> tuple[str | None,bool]:
+        '''
+        :param resolving: 正在展開的key，用於偵測循環引用
+        :return: 展開後的字串，以及展開過程中是否遇到循環引用
+        '''
+        text = self.lookup(key)
+
+        if text is None or "$" not in text:
+            self._resolved[key] = text
+            return text, False
+
+        resolving.add(key)
+        cyclic = False
+
+        def expand(match:re.Match) -> str:
+            nonlocal cyclic
+            reference = match.group(1)
+
+            #不論是否找得到，都記錄引用關係，之後新增該key時也能清除
+            self._dependents.setdefault(reference,set()).add(key)
+
+            if reference in resolving:
+                cyclic = True
+                return match.group(0)
+
+            if reference in self._resolved:
+                value = self._resolved[reference]
+            else:
+                value, reference_cyclic = self._resolve(reference,resolving)
+                cyclic = cyclic or reference_cyclic
+
+            return match.group(0) if value is None else value
+
+        result = REFERENCE_PATTERN.sub(expand,text)
+        resolving.discard(key)
+
+        #循環中的結果取決於從哪個key開始展開，不保存
+        if not cyclic: self._resolved[key] = result
+        return result, cyclic
+
+    def invalidate(self,keys) -> None:
+        '''
+        清除`keys`以及直接或間接引用它們的展開結果
+        '''
+        pending = list(keys)
+        while pending:
+            key = pending.pop()
+            self._resolved.pop(key,None)
+
+            for dependent in self._dependents.pop(key,()):
+                pending.append(dependent)
+
+    def clear(self) -> None:
+        self._resolved.clear()
+        self._dependents.clear()
+
+def strip_colors(text:str) -> str:
+    '''
+    移除字串中的§顏色代碼
+    '''
+    return COLOR_PATTERN.sub("",text)
@@ -0,0 +1,462 @@
+'''
+loc_store.py
+
+本地化字串的硬碟儲存區，以sqlite保存，查詢時才讀取並保留少量的最近使用結果
+'''
+
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from threading import RLock
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+from libs.enums import LANGUAGE
+from libs.loc_resolver import LocResolver
+from libs.reader.loc_reader import merge_locs, read_loc_groups
+
+#所有語言最後都會退回英文
+FALLBACK_LANGUAGE = "english"
+
+class LocStore:
+    '''
+    說明
+    ---------------------------------------------
+    以sqlite儲存本地化字串，每個語言為獨立的一層，用法類似dict：
+    >>> store = LocStore("data/loc.db")
+    >>> store.reset(["C:/.../Hearts of Iron IV"],"simp_chinese")
+    >>> store["GER"]
+
+    查詢順序為`language` → 英文，都找不到時引發KeyError。\n
+    每一層在第一次需要時才從`paths`的本地化文檔讀取並寫入資料庫，切換語言只需要讀取新的那一層。\n
+    查詢不會在呼叫的執行緒讀取該層(讀取需要數秒，且會啟動process pool)，而是以`on_missing_layer(language)`通知，
+    由呼叫端在背景執行`load_layer`；讀取完成前該層視為沒有任何字串，查詢退回英文：
+    >>> store.on_missing_layer = lambda language: start_background_task(store.load_layer,language)
+
+    最近查詢過的結果(包含不存在的key)依語言分別保留在記憶體中，每層最多`cache_size`筆。\n
+    讀取的層數超過`max_layers`時，最久沒有使用的層(不包含英文與目前的語言)會從資料庫移除。\n
+    `resolve`回傳展開`$KEY$`引用的字串，結果會被保存，字串改變時只清除受影響的部分。\n
+    key與字串另外建立trigram全文索引(第一次搜尋該層時建立並保存)，`search`可以搜尋子字串或開頭。\n
+    pickle時只保存路徑與設定，還原後不需要讀取任何字串。
+    '''
+
+    #資料庫格式的版本，格式變更時遞增使舊的資料庫重建
+    VERSION = 3
+
+    def __init__(self,path:str,cache_size:int = 4096,max_layers:int = 3) -> None:
+        self.path = path
+        self.cache_size = cache_size
+        self.max_layers = max_layers
+
+        self.paths:list[str] = []               #讀取本地化文檔的路徑，後面的優先
+        self.language = FALLBACK_LANGUAGE       #目前的語言
+
+        self._connection:sqlite3.Connection | None = None
+        self._searchable = False            #sqlite是否支援FTS5的trigram索引
+
+        #已讀取的層→該層最近查詢的結果，依使用順序排列
+        self._layers:OrderedDict[str,OrderedDict[str,str | None]] = OrderedDict()
+
+        #各語言展開$KEY$引用的結果
+        self._resolvers:dict[str,LocResolver] = dict()
+
+        #資料的讀取在RunningWindow的執行緒，查詢則在主執行緒
+        self._lock = RLock()
+
+        #查詢到尚未讀取的層時呼叫on_missing_layer(語言)，應在背景執行`load_layer`，不會被pickle
+        self.on_missing_layer:Callable[[str],Any] | None = None
+        self._requested:set[str] = set()    #已通知但尚未讀取完成的層
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path,
+                "cache_size": self.cache_size,
+                "max_layers": self.max_layers,
+                "paths": self.paths,
+                "language": self.language}
+
+    def __setstate__(self,state:dict) -> None:
+        self.__init__(state["path"],state["cache_size"],state.get("max_layers",3))
+        self.paths = state.get("paths",[])
+        self.language = state.get("language",FALLBACK_LANGUAGE)
+
+    def __repr__(self) -> str:
+        return f"LocStore({self.path!r}, language={self.language!r})"
+
+    def _connect(self) -> sqlite3.Connection:
+        '''
+        第一次使用時才連接資料庫，版本不符時重建資料表
+        '''
+        if self._connection is not None: return self._connection
+
+        Path(self.path).parent.mkdir(parents=True,exist_ok=True)
+        connection = sqlite3.connect(self.path,check_same_thread=False)
+
+        if connection.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+            connection.execute("DROP TABLE IF EXISTS loc")
+            connection.execute("DROP TABLE IF EXISTS loc_search")
+            connection.execute("DROP TABLE IF EXISTS layers")
+            connection.execute(f"PRAGMA user_version = {self.VERSION}")
+
+        connection.execute("CREATE TABLE IF NOT EXISTS loc (lang TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, UNIQUE (lang, key))")
+        connection.execute("CREATE TABLE IF NOT EXISTS layers (lang TEXT PRIMARY KEY, indexed INTEGER NOT NULL DEFAULT 0)")
+
+        #key與value的trigram全文索引，內容直接引用loc表，在第一次搜尋該層時才建立
+        try:
+            connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS loc_search USING fts5(key, value, content='loc', content_rowid='rowid', tokenize='trigram')")
+            self._searchable = True
+
+        #舊版sqlite沒有FTS5或trigram時，搜尋改為逐筆比對
+        except sqlite3.OperationalError:
+            self._searchable = False
+
+        connection.commit()
+
+        self._connection = connection
+        return connection
+
+    def _chain(self,language:str | None = None) -> tuple[str,...]:
+        '''
+        查詢的語言順序
+        '''
+        if language is None: language = self.language
+        if language == FALLBACK_LANGUAGE: return (language,)
+        return (language,FALLBACK_LANGUAGE)
+
+    def _layer(self,language:str,load:bool = False) -> OrderedDict[str,str | None] | None:
+        '''
+        取得`language`層的快取，該層還沒讀取時以`on_missing_layer`通知並回傳None
+
+        :param load: 該層還沒讀取時直接在呼叫的執行緒讀取，只在RunningWindow的執行緒中使用
+        '''
+        with self._lock:
+            cache = self._layers.get(language)
+            if cache is not None:
+                self._layers.move_to_end(language)
+                return cache
+
+            stored = self._is_stored(language)
+            if not stored and not load:
+                self._request(language)
+                return None
+
+        #讀取時不持有鎖，主執行緒的查詢不會被擋住
+        if not stored: self.load_layer(language)
+
+        with self._lock:
+            cache = self._layers.get(language)
+            if cache is None:
+                cache = OrderedDict()
+                self._layers[language] = cache
+                self._evict()
+            return cache
+
+    def _is_stored(self,language:str) -> bool:
+        return self._connect().execute("SELECT 1 FROM layers WHERE lang = ?",(language,)).fetchone() is not None
+
+    def _request(self,language:str) -> None:
+        '''
+        通知`on_missing_layer`在背景讀取`language`層，讀取完成或失敗前不重複通知
+        '''
+        if language in self._requested or self.on_missing_layer is None: return
+
+        self._requested.add(language)
+        self.on_missing_layer(language)
+
+    def _evict(self) -> None:
+        '''
+        移除超過`max_layers`的層，英文與目前的語言不會被移除
+        '''
+        connection = self._connect()
+        stored = [row[0] for row in connection.execute("SELECT lang FROM layers")]
+
+        #本次執行沒有使用過的層最先移除，其餘依使用順序
+        order = [language for language in stored if language not in self._layers] + list(self._layers)
+        pinned = self._chain()
+
+        for language in order:
+            if len(stored) <= self.max_layers: break
+            if language in pinned: continue
+
+            stored.remove(language)
+            self._layers.pop(language,None)
+            self._invalidate(language)
+            with connection:
+                self._unindex_layer(language)
+                connection.execute("DELETE FROM loc WHERE lang = ?",(language,))
+                connection.execute("DELETE FROM layers WHERE lang = ?",(language,))
+
+    def _is_indexed(self,language:str) -> bool:
+        row = self._connect().execute("SELECT indexed FROM layers WHERE lang = ?",(language,)).fetchone()
+        return row is not None and bool(row[0])
+
+    def _index_layer(self,language:str) -> None:
+        '''
+        建立`language`層的全文索引
+        '''
+        if not self._searchable or self._is_indexed(language): return
+
+        connection = self._connect()
+        with connection:
+            connection.execute("INSERT INTO loc_search(rowid, key, value) SELECT rowid, key, value FROM loc WHERE lang = ?",(language,))
+            connection.execute("UPDATE layers SET indexed = 1 WHERE lang = ?",(language,))
+
+    def _unindex_layer(self,language:str) -> None:
+        '''
+        移除`language`層的全文索引，必須在刪除該層的字串之前呼叫
+        '''
+        if not self._searchable or not self._is_indexed(language): return
+
+        connection = self._connect()
+        connection.execute("INSERT INTO loc_search(loc_search, rowid, key, value) SELECT 'delete', rowid, key, value FROM loc WHERE lang = ?",(language,))
+        connection.execute("UPDATE layers SET indexed = 0 WHERE lang = ?",(language,))
+
+    def _lookup(self,key:str,language:str) -> str | None:
+        '''
+        在`language`層查詢key，先找最近使用的結果，找不到時才讀取資料庫
+        '''
+        with self._lock:
+            cache = self._layer(language)
+            if cache is None: return None
+
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+
+            row = self._connect().execute("SELECT value FROM loc WHERE lang = ? AND key = ?",(language,key)).fetchone()
+            value = row[0] if row is not None else None
+
+            cache[key] = value
+            if len(cache) > self.cache_size: cache.popitem(last=False)
+
+            return value
+
+    def __getitem__(self,key:str) -> str:
+        for language in self._chain():
+            value = self._lookup(key,language)
+            if value is not None: return value
+        raise KeyError(key)
+
+    def get(self,key:str,default:Any = None,language:str | None = None) -> str | Any:
+        '''
+        依`language`(預設為目前的語言) → 英文的順序查詢key
+        '''
+        for layer in self._chain(language):
+            value = self._lookup(key,layer)
+            if value is not None: return value
+        return default
+
+    def __contains__(self,key:str) -> bool:
+        return any(self._lookup(key,language) is not None for language in self._chain())
+
+    def translations(self,key:str,languages:Iterable[str] = LANGUAGE) -> dict[str,str | None]:
+        '''
+        查詢key在各語言的翻譯，不退回英文，用於並排比較
+        '''
+        return {language: self._lookup(key,language) for language in languages}
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.keys())
+
+    def keys(self,language:str | None = None) -> Iterator[str]:
+        '''
+        `language`(預設為目前的語言)與英文層中所有的key
+        '''
+        return (key for key, _ in self.items(language))
+
+    def items(self,language:str | None = None) -> Iterator[tuple[str,str]]:
+        '''
+        `language`(預設為目前的語言)與英文層中所有的字串，同一個key以前面的語言為準
+        '''
+        items:dict[str,str] = dict()
+        with self._lock:
+            #先放入英文，再以前面的語言覆蓋，尚未讀取的層略過
+            for layer in reversed(self._chain(language)):
+                if self._layer(layer) is None: continue
+                items.update(self._connect().execute("SELECT key, value FROM loc WHERE lang = ?",(layer,)))
+        return iter(items.items())
+
+    def search(self,
+               text:str,
+               language:str | None = None,
+               prefix:bool = False,
+               keys:bool = True,
+               values:bool = True,
+               limit:int | None = 100) -> list[tuple[str,str]]:
+        '''
+        搜尋key或字串中包含`text`的本地化字串，不分大小寫
+
+        :param language: 搜尋`language`(預設為目前的語言)與英文層，同一個key以前面的語言為準
+        :param prefix: 只搜尋以`text`開頭的key或字串
+        :param keys: 是否搜尋key
+        :param values: 是否搜尋字串
+        :param limit: 最多回傳的數量，None為不限制
+        :return: (key, 字串)的列表
+        '''
+        folded = text.casefold()
+        results:dict[str,str] = dict()
+
+        if not folded or not (keys or values): return []
+
+        def matched(field:str) -> bool:
+            field = field.casefold()
+            return field.startswith(folded) if prefix else folded in field
+
+        with self._lock:
+            chain = self._chain(language)
+            for i, layer in enumerate(chain):
+                if self._layer(layer) is None: continue
+                self._index_layer(layer)
+
+                #前面的語言已有的key不再搜尋後面的語言
+                for key, value in self._search_candidates(text,layer,chain[:i],keys,values):
+                    if not ((keys and matched(key)) or (values and matched(value))): continue
+
+                    results[key] = value
+                    if limit is not None and len(results) >= limit: return list(results.items())
+
+        return list(results.items())
+
+    def _search_candidates(self,text:str,language:str,exclude:tuple[str,...],keys:bool,values:bool) -> sqlite3.Cursor:
+        '''
+        以索引找出`language`層中可能符合的字串，結果需要再次比對
+
+        :param exclude: 略過這些語言層中已有的key
+        '''
+        connection = self._connect()
+        excluded = "".join(" AND key NOT IN (SELECT key FROM loc WHERE lang = ?)" for _ in exclude)
+
+        #trigram索引只能搜尋3個字以上的子字串
+        if self._searchable and len(text) >= 3:
+            columns = "{key value}" if keys and values else ("key" if keys else "value")
+            phrase = text.replace('"','""')
+            return connection.execute(f"SELECT key, value FROM loc WHERE rowid IN (SELECT rowid FROM loc_search WHERE loc_search MATCH ?) AND lang = ?{excluded}",
+                                      (f'{columns}: "{phrase}"',language,*exclude))
+
+        return connection.execute(f"SELECT key, value FROM loc WHERE lang = ?{excluded}",(language,*exclude))
+
+    def resolve(self,key:str,default:Any = None,language:str | None = None) -> str | Any:
+        '''
+        依`language`(預設為目前的語言) → 英文的順序查詢key，並遞迴展開其中的`$KEY$`引用
+        '''
+        if language is None: language = self.language
+        with self._lock:
+            resolver = self._resolvers.get(language)
+            if resolver is None:
+                resolver = LocResolver(lambda key: self.get(key,language=language))
+                self._resolvers[language] = resolver
+
+            value = resolver.resolve(key)
+        return default if value is None else value
+
+    def _invalidate(self,language:str,keys:Iterable[str] | None = None) -> None:
+        '''
+        `language`層的字串改變時，清除會用到該層的展開結果
+
+        :param keys: 改變的key，None為整層
+        '''
+        for chain_language, resolver in self._resolvers.items():
+            if language not in self._chain(chain_language): continue
+
+            if keys is None: resolver.clear()
+            else: resolver.invalidate(keys)
+
+    def set_language(self,language:str) -> None:
+        '''
+        切換目前的語言，尚未讀取的層立即以`on_missing_layer`通知在背景讀取
+        '''
+        with self._lock:
+            self.language = language
+            for layer in self._chain():
+                self._layer(layer)
+
+    def load_layer(self,
+                   language:str,
+                   progress:Callable[[int,int],Any] | None = None,
+                   is_cancelled:Callable[[],bool] | None = None,
+                   on_read:Callable[[list[Path],list[Path],list[dict[str,str]]],Any] | None = None) -> bool:
+        '''
+        從`paths`的本地化文檔讀取`language`層並寫入資料庫，已存在的層會被取代
+
+        :param on_read: 讀取後以`on_read(一般檔案, replace底下的檔案, 每個檔案的內容)`呼叫，供檢查等需要逐檔內容的用途
+        :return: 被取消時回傳False
+        '''
+        #讀取期間查詢到該層時不需要再通知
+        with self._lock:
+            self._requested.add(language)
+
+        try:
+            groups = read_loc_groups(self.paths,language,progress=progress,is_cancelled=is_cancelled)
+            if groups is None: return False
+
+            if on_read is not None: on_read(*groups)
+
+            self.replace(merge_locs(groups[2]),language)
+            return True
+
+        #讀取完成、取消或失敗後，下次查詢到尚未讀取的層可以再次通知
+        finally:
+            with self._lock:
+                self._requested.discard(language)
+
+    def update(self,mapping:Mapping[str,str],language:str | None = None) -> None:
+        '''
+        寫入多筆字串到`language`層(預設為目前的語言)，已存在的key會被覆蓋
+        '''
+        if language is None: language = self.language
+
+        #先讀取該層，避免之後讀取時覆蓋寫入的字串(寫入在RunningWindow的執行緒中)
+        self._layer(language,load=True)
+
+        with self._lock:
+            connection = self._connect()
+            indexed = self._searchable and self._is_indexed(language)
+            with connection:
+                #已建立索引時，先移除舊字串的索引再加入新的
+                if indexed:
+                    connection.executemany("INSERT INTO loc_search(loc_search, rowid, key, value) SELECT 'delete', rowid, key, value FROM loc WHERE lang = ? AND key = ?",((language,key) for key in mapping))
+                connection.executemany("INSERT INTO loc VALUES (?, ?, ?) ON CONFLICT (lang, key) DO UPDATE SET value = excluded.value",((language,key,value) for key, value in mapping.items()))
+                if indexed:
+                    connection.executemany("INSERT INTO loc_search(rowid, key, value) SELECT rowid, key, value FROM loc WHERE lang = ? AND key = ?",((language,key) for key in mapping))
+            cache = self._layers.get(language)
+            if cache is not None: cache.clear()
+            self._invalidate(language,mapping.keys())
+
+    def replace(self,mapping:Mapping[str,str],language:str | None = None) -> None:
+        '''
+        以`mapping`取代`language`層(預設為目前的語言)全部的字串
+        '''
+        if language is None: language = self.language
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                self._unindex_layer(language)
+                connection.execute("DELETE FROM loc WHERE lang = ?",(language,))
+                connection.executemany("INSERT INTO loc VALUES (?, ?, ?)",((language,key,value) for key, value in mapping.items()))
+                connection.execute("INSERT OR IGNORE INTO layers (lang) VALUES (?)",(language,))
+            cache = self._layers.get(language)
+            if cache is not None: cache.clear()
+            self._invalidate(language)
+
+    def reset(self,paths:list[str],language:str) -> None:
+        '''
+        更換讀取的路徑與目前的語言，並清除所有已讀取的層
+        '''
+        with self._lock:
+            self.paths = list(paths)
+            self.language = language
+
+            connection = self._connect()
+            with connection:
+                if self._searchable: connection.execute("INSERT INTO loc_search(loc_search) VALUES ('delete-all')")
+                connection.execute("DELETE FROM loc")
+                connection.execute("DELETE FROM layers")
+            self._layers.clear()
+            self._resolvers.clear()
+            self._requested.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._layers.clear()
+            self._resolvers.clear()
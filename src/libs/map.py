@@ -6,60 +6,110 @@ map.py
 NOTICE: 更新任何東西時請確認是否連帶更新abstract_map.py
 '''
 
-from typing import Literal
+from collections.abc import Mapping
+from typing import Iterator, Literal
 
+from libs.map_store import ProvinceColumns, StateColumns, unpack_color
 from libs.pdxscript import PDXstatement
 from libs.root import root
 
 class Province:
     '''
-    省分(province)相關
+    省分(province)相關，為`ProvinceColumns`中一個省分的檢視，讀寫都直接對應到陣列，修改後地圖模式只重繪改變的省分
     '''
-    def __init__(self,
-                 id:int,
-                 color:tuple[int,int,int],
-                 terrain:Literal["unknown","lakes","forest","ocean","hills","plains","mountain","desert","marsh","urban","jungle"],
-                 type:Literal["land","sea"],
-                 coastal:bool,
-                 continent:int) -> None:
+    __slots__ = ("id","_columns")
+
+    def __init__(self,id:int,columns:ProvinceColumns) -> None:
         self.id = id                #省分ID
-        self.color = color          #省分顏色
-        self.terrain = terrain      #省分地形
-        self.type = type            #省分海陸
-        self.coastal = coastal      #省分臨海
-        self.continent = continent  #省分大陸
-        self.victory_point:int = None   #勝利點價值
-        self.pos:tuple[int,int]  = None   #勝利點座標(西南原點)
-        self.buildings:set[Building] = None    #建築
-    
+        self._columns = columns
+
+    @property
+    def color(self) -> tuple[int,int,int]:
+        '''省分顏色'''
+        return unpack_color(self._columns.color[self.id])
+
+    @property
+    def terrain(self) -> Literal["unknown","lakes","forest","ocean","hills","plains","mountain","desert","marsh","urban","jungle"]:
+        '''省分地形'''
+        return self._columns.terrain_names[self._columns.terrain[self.id]]
+
+    @property
+    def type(self) -> Literal["land","sea","lake"]:
+        '''省分海陸'''
+        return self._columns.type_names[self._columns.type[self.id]]
+
+    @property
+    def coastal(self) -> bool:
+        '''省分臨海'''
+        return bool(self._columns.coastal[self.id])
+
+    @property
+    def continent(self) -> int:
+        '''省分大陸'''
+        return int(self._columns.continent[self.id])
+
+    @property
+    def victory_point(self) -> int | float | None:
+        '''勝利點價值'''
+        value = float(self._columns.victory_point[self.id])
+        if value != value: return None
+        return int(value) if value.is_integer() else value
+
+    @victory_point.setter
+    def victory_point(self,value:int | float | None) -> None:
+        self._columns.victory_point[self.id] = float("nan") if value is None else value
+        root.map_modes.mark_stale("victory_point")
+
+    @property
+    def pos(self) -> tuple[float,float] | None:
+        '''勝利點座標(西南原點)'''
+        x, y = self._columns.pos[self.id].tolist()
+        return None if x != x else (x,y)
+
+    @pos.setter
+    def pos(self,value:tuple[float,float] | None) -> None:
+        self._columns.pos[self.id] = (float("nan"),float("nan")) if value is None else value
+
+    @property
+    def buildings(self) -> set['Building'] | None:
+        '''建築'''
+        return self._columns.buildings.get(self.id)
+
+    @buildings.setter
+    def buildings(self,value:set['Building'] | None) -> None:
+        if value is None: self._columns.buildings.pop(self.id,None)
+        else: self._columns.buildings[self.id] = value
+        root.map_modes.mark_stale("buildings")
+
     @staticmethod
-    def from_color(color:tuple[int,int,int]) -> 'Province':
+    def from_color(color:tuple[int,int,int]) -> 'Province | None':
         '''
-        由給予的顏色獲取省分
+        由給予的顏色獲取省分，找不到時回傳None
         '''
-        try:
-            return root.map_data.province[root.map_data.color_mapping.province_id_from_color[color]]
-        
-        except KeyError:
-            return None
+        province_id = root.map_data.province_columns.id_of_color(color)
+        if province_id is None: return None
+        return root.map_data.province.get(province_id)
 
-class Adjacency:
+class ProvinceTable(Mapping[int,Province]):
     '''
-    省分連結
+    以省分ID查詢`Province`，用法同dict[int,Province]
     '''
-    def __init__(self,
-                 p1:int,
-                 p2:int,
-                 type:Literal["sea","impassable"] = "sea",
-                 through:int | None = None,
-                 pos1:tuple[int,int] | None = None,
-                 pos2:tuple[int,int] | None = None,
-                 rule:str = None) -> None:
-        self.p1, self.p2 = p1, p2           #連結的兩個省份ID
-        self.type = type if type in ("sea","impassable") else "sea"  #連結類型
-        self.through = through              #通過的省分
-        self.pos1, self.pos2 = pos1, pos2   #畫面起始與結束座標
-        self.rule = rule                    #連結規則
+    def __init__(self,columns:ProvinceColumns) -> None:
+        self.columns = columns
+
+    def __getitem__(self,province_id:int) -> Province:
+        if province_id not in self.columns: raise KeyError(province_id)
+        return Province(int(province_id),self.columns)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.columns.ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __contains__(self,province_id:object) -> bool:
+        try: return int(province_id) in self.columns
+        except (TypeError,ValueError): return False
 
 class AdjacencyPassType:
     '''
@@ -96,14 +146,6 @@ class AdjacencyRule:
         self.icon_province = icon                       #圖示所在的省份ID
         self.offset = offset                            #圖示偏移的量
 
-class Railway:
-    '''
-    鐵路
-    '''
-    def __init__(self,level:int,provinces:tuple[int]) -> None:
-        self.level = level
-        self.provinces = provinces
-
 class Building:
     '''
     建築
@@ -139,47 +181,116 @@ class Building:
 
 class State:
     '''
-    地塊(state)相關
+    地塊(state)相關，為`StateColumns`中一個地塊的檢視，讀寫都直接對應到陣列，修改後地圖模式只重繪改變的省分
     '''
-    def __init__(self,
-                 id:int,
-                 manpower:int,
-                 state_category:Literal["wasteland","enclave","tiny_island","pastoral","small_island","rural","town","large_town","city","large_city","metropolis","megalopolis"],                      
-                 owner:str,
-                 provinces:tuple[int],
-                 local_supply:float = 0,
-                 resources:dict[str,int] = None,
-                 buildings:set[Building] = None,
-                 core:set[str] = None,
-                 claim:set[str] = None,
-                 impassable:bool = False,
-                 demilitarized_zone:bool = False,
-                 controller:str = None) -> None:
-        
+    __slots__ = ("id","_columns")
+
+    def __init__(self,id:int,columns:StateColumns) -> None:
         self.id = id
-        self.manpower = manpower
-        self.state_category = state_category
-        self.owner = owner
-        self.provinces = provinces
-        self.local_supply = local_supply
-        self.resources = resources
-        self.buildings = buildings
-        self.core = core
-        self.claim = claim
-        self.impassable = impassable
-        self.controller = controller
-        self.demilitarized_zone = demilitarized_zone
-    
+        self._columns = columns
+
+    @property
+    def manpower(self) -> int:
+        return int(self._columns.manpower[self.id])
+
+    @manpower.setter
+    def manpower(self,value:int) -> None:
+        self._columns.manpower[self.id] = value
+        root.map_modes.mark_stale("manpower")
+
+    @property
+    def state_category(self) -> Literal["wasteland","enclave","tiny_island","pastoral","small_island","rural","town","large_town","city","large_city","metropolis","megalopolis"]:
+        return self._columns.category_names[self._columns.category[self.id]]
+
+    @property
+    def owner(self) -> str | None:
+        return self._columns.tags[self._columns.owner[self.id]]
+
+    @owner.setter
+    def owner(self,tag:str | None) -> None:
+        self._columns.owner[self.id] = self._columns.tag_code(tag)
+        root.map_modes.mark_stale("owner")
+
+    @property
+    def controller(self) -> str | None:
+        return self._columns.tags[self._columns.controller[self.id]]
+
+    @controller.setter
+    def controller(self,tag:str | None) -> None:
+        self._columns.controller[self.id] = self._columns.tag_code(tag)
+        root.map_modes.mark_stale("controller")
+
+    @property
+    def provinces(self) -> list[int]:
+        return self._columns.provinces_of(self.id).tolist()
+
+    @provinces.setter
+    def provinces(self,provinces:list[int]) -> None:
+        self._columns.set_provinces(self.id,provinces)
+
+        #省分所屬的地塊也要跟著更新
+        root.map_data.province_columns.assign_states(self._columns)
+        root.map_modes.mark_stale("provinces")
+
+    @property
+    def local_supply(self) -> float | None:
+        value = float(self._columns.local_supply[self.id])
+        return None if value != value else value
+
+    @property
+    def resources(self) -> dict[str,int] | None:
+        return self._columns.resources.get(self.id)
+
+    @property
+    def buildings(self) -> set[Building] | None:
+        return self._columns.buildings.get(self.id)
+
+    @property
+    def core(self) -> str | list[str] | None:
+        return self._columns.core.get(self.id)
+
+    @property
+    def claim(self) -> str | list[str] | None:
+        return self._columns.claim.get(self.id)
+
+    @property
+    def impassable(self) -> bool:
+        return bool(self._columns.impassable[self.id])
+
+    @property
+    def demilitarized_zone(self) -> bool:
+        return bool(self._columns.demilitarized_zone[self.id])
+
     @staticmethod
     def from_province_id(province_id:int) -> 'State':
         '''
         由省分ID獲得地塊資訊
         '''
-        try:
-            return root.map_data.states[root.map_data.map_mapping.province_to_state[province_id]]
-        except KeyError:
-            return None
-    
+        columns = root.map_data.province_columns
+        if province_id not in columns: return None
+        return root.map_data.states.get(int(columns.state[province_id]))
+
+class StateTable(Mapping[int,State]):
+    '''
+    以地塊ID查詢`State`，用法同dict[int,State]
+    '''
+    def __init__(self,columns:StateColumns) -> None:
+        self.columns = columns
+
+    def __getitem__(self,state_id:int) -> State:
+        if state_id not in self.columns: raise KeyError(state_id)
+        return State(int(state_id),self.columns)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.columns.ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __contains__(self,state_id:object) -> bool:
+        try: return int(state_id) in self.columns
+        except (TypeError,ValueError): return False
+
 class StrategicRegion:
     '''
     戰略區
@@ -195,4 +306,4 @@ class StrategicRegion:
         '''
         由省分ID獲得戰略區資料
         '''
-        return root.map_data.strategicregions[root.map_data.map_mapping.province_to_strategic[id]]
+        return root.map_data.strategicregions[int(root.map_data.province_columns.strategic[id])]
@@ -0,0 +1,702 @@
+'''
+map_render.py
+
+地圖模式的繪製，provinces.bmp只解碼一次成省分ID圖層，每個地圖模式只需要提供省分ID→顏色的查詢表
+地圖模式在第一次選用時才繪製，並以LRU保存在記憶體預算內
+省分、地塊、戰略區與國家的邊界由省分ID圖層與相鄰像素比較得出，作為疊加在地圖上的圖層
+註:不可以匯入libs.root等會建立視窗的模組
+'''
+
+from collections import OrderedDict
+import colorsys
+from typing import Any, Callable, Iterable
+
+import numpy as np
+from PIL import Image
+
+from libs.map_store import PROVINCE_ID, ProvinceColumns, image_of_pixels, paint, paint_pixels, rgbx_palette
+
+#沒有資料的陸地與海洋的顏色
+BACKGROUND_COLOR = (40,40,40)
+
+#地圖模式快取預設的記憶體預算(位元組)，完整地圖一張約46MB
+MAP_MODE_BUDGET = 256 * 1024 * 1024
+
+#definition.csv的地形→顏色，沒有列出的地形為灰色
+TERRAIN_PALETTE:dict[str,tuple[int,int,int]] = {
+    "plains": (86,124,27),
+    "forest": (0,86,6),
+    "hills": (112,74,31),
+    "mountain": (134,84,30),
+    "desert": (206,169,99),
+    "marsh": (75,147,174),
+    "jungle": (255,0,127),
+    "urban": (240,255,0),
+    "ocean": (8,31,130),
+    "lakes": (40,90,200),
+}
+
+#熱度圖的顏色，由低到高
+HEAT_STOPS = np.array([0.0,0.5,1.0])
+HEAT_COLORS = np.array([(20,30,110),(230,200,40),(200,30,30)],dtype=np.float64)
+
+class MapRaster:
+    '''
+    說明
+    ---------------------------------------------
+    provinces.bmp每個像素的省分ID，以uint16陣列保存，找不到的顏色為0。\n
+    繪製地圖模式時只需要以省分ID為索引的查詢表：
+    >>> image = raster.paint(palette)
+
+    只重繪部分省分時，以CSR格式的省分→像素索引找到這些省分的像素，索引在第一次使用時建立：
+    >>> pixels.ravel()[raster.pixels_of(province_ids)] = colors
+    '''
+
+    def __init__(self,columns:ProvinceColumns,image:Image.Image) -> None:
+        '''
+        :param columns: 省分資料，用於由顏色查詢省分ID
+        :param image: provinces.bmp
+        '''
+        self.ids = columns.id_raster(image)     #形狀為(高, 寬)的省分ID
+
+        self._pixel_offsets:np.ndarray | None = None    #每個省分在_pixel_indices中的起點
+        self._pixel_indices:np.ndarray | None = None    #依省分ID排列的像素索引(攤平後)
+
+    def __getstate__(self) -> dict:
+        #像素索引可以重建，不寫入快取
+        return {"ids": self.ids}
+
+    def __setstate__(self,state:dict) -> None:
+        self.ids = state["ids"]
+        self._pixel_offsets = None
+        self._pixel_indices = None
+
+    @property
+    def size(self) -> tuple[int,int]:
+        '''
+        圖像的(寬, 高)
+        '''
+        height, width = self.ids.shape
+        return width, height
+
+    def province_at(self,x:int,y:int) -> int:
+        '''
+        座標上的省分ID，0表示沒有
+        '''
+        return int(self.ids[y,x])
+
+    def paint(self,palette:np.ndarray) -> Image.Image:
+        '''
+        依查詢表繪製圖像
+
+        :param palette: 形狀為(省分數量, 3)的uint8陣列，以省分ID為索引
+        '''
+        return paint(self.ids,palette)
+
+    def pixels_of(self,province_ids:np.ndarray) -> np.ndarray:
+        '''
+        省分的所有像素在攤平後的圖像中的索引
+        '''
+        if self._pixel_indices is None:
+            flat = self.ids.ravel()
+            counts = np.bincount(flat)
+
+            self._pixel_indices = np.argsort(flat,kind="stable").astype(np.uint32)
+            self._pixel_offsets = np.zeros(len(counts)+1,dtype=np.int64)
+            np.cumsum(counts,out=self._pixel_offsets[1:])
+
+        province_ids = np.asarray(province_ids,dtype=np.int64)
+        province_ids = province_ids[province_ids < len(self._pixel_offsets) - 1]
+
+        starts = self._pixel_offsets[province_ids]
+        counts = self._pixel_offsets[province_ids+1] - starts
+
+        #每一段的起點加上段內的位置
+        total = int(counts.sum())
+        segment_starts = np.repeat(starts - np.concatenate([[0],np.cumsum(counts)[:-1]]),counts)
+        return self._pixel_indices[segment_starts + np.arange(total)]
+
+def unpack_palette(packed:np.ndarray) -> np.ndarray:
+    '''
+    將壓縮後的顏色陣列轉為形狀為(數量, 3)的uint8陣列
+    '''
+    colors = np.zeros((len(packed),3),dtype=np.uint8)
+    colors[:,0] = packed >> 16
+    colors[:,1] = packed >> 8
+    colors[:,2] = packed
+    return colors
+
+def first_province_colors(columns:ProvinceColumns,offsets:np.ndarray,province_ids:np.ndarray) -> np.ndarray:
+    '''
+    以CSR表示的每一組省分中，第一個省分的顏色
+
+    :return: 形狀為(組數, 3)的uint8陣列，沒有省分的組為黑色
+    '''
+    counts = np.diff(offsets)
+    first = np.zeros(len(counts),dtype=np.int64)
+    first[counts != 0] = province_ids[offsets[:-1][counts != 0]]
+    first[first >= len(columns.color)] = 0
+
+    colors = unpack_palette(columns.color[first])
+    colors[first == 0] = 0
+
+    return colors
+
+def heat_colors(values:np.ndarray,log:bool = False) -> np.ndarray:
+    '''
+    將數值依最大值正規化後轉為熱度圖的顏色
+
+    :param log: 以對數刻度正規化，用於差距很大的數值如人口
+    :return: 形狀為(數量, 3)的uint8陣列
+    '''
+    values = np.asarray(values,dtype=np.float64)
+    if log: values = np.log1p(np.maximum(values,0))
+
+    top = values.max() if len(values) != 0 else 0
+    scaled = values / top if top > 0 else np.zeros(len(values))
+
+    colors = np.stack([np.interp(scaled,HEAT_STOPS,HEAT_COLORS[:,channel]) for channel in range(3)],axis=1)
+    return colors.astype(np.uint8)
+
+def category_colors(count:int) -> np.ndarray:
+    '''
+    `count`個容易區分的顏色，色相以黃金比例分布，每次呼叫的結果相同
+
+    :return: 形狀為(count, 3)的uint8陣列
+    '''
+    hues = (np.arange(count) * 0.618033988749895) % 1.0
+    colors = [colorsys.hsv_to_rgb(hue,0.65,0.9) for hue in hues]
+
+    return (np.array(colors,dtype=np.float64).reshape(-1,3) * 255).astype(np.uint8)
+
+def background_palette(columns:ProvinceColumns) -> np.ndarray:
+    '''
+    有定義的省分為`BACKGROUND_COLOR`，其餘為黑色
+    '''
+    palette = np.zeros((len(columns.color),3),dtype=np.uint8)
+    palette[columns.defined] = BACKGROUND_COLOR
+    return palette
+
+def province_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    省分視圖，每個省分使用definition.csv中的顏色
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+
+    palette = unpack_palette(columns.color)
+    palette[~columns.defined] = 0
+    return palette
+
+def state_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    地塊視圖，每個地塊使用其第一個省分的顏色，海洋與未登記的省分為黑色
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+    states = map_data.state_columns
+
+    in_state = columns.state != 0
+    palette = np.zeros((len(columns.color),3),dtype=np.uint8)
+    palette[in_state] = first_province_colors(columns,states.province_offsets,states.province_ids)[columns.state[in_state]]
+    return palette
+
+def strategic_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    戰略區視圖，每個戰略區使用其第一個省分的顏色
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+    regions = map_data.strategicregions
+
+    #所有省分都必須屬於某個戰略區
+    missing = np.flatnonzero(columns.defined & (columns.strategic == 0))
+    if len(missing) != 0:
+        raise Exception(f"以下省分尚未指派戰略區，請在戰略區文件中添加該省分:{missing[0]}")
+
+    #戰略區也以CSR表示，依戰略區ID排列
+    size = max(regions) + 1 if regions else 1
+    province_lists = [np.asarray(regions[index].provinces or () if index in regions else (),dtype=np.int64) for index in range(size)]
+    offsets = np.zeros(size+1,dtype=np.int64)
+    np.cumsum([len(province_list) for province_list in province_lists],out=offsets[1:])
+
+    palette = np.zeros((len(columns.color),3),dtype=np.uint8)
+    palette[columns.defined] = first_province_colors(columns,offsets,np.concatenate(province_lists))[columns.strategic[columns.defined]]
+    return palette
+
+def nation_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    無條件時的政權地圖(有條件ex:比屬剛果)，沒有配色的國家為灰色，不屬於任何地塊為黑色
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+    states = map_data.state_columns
+    country_color = map_data.color_mapping.country_color
+
+    #國家代碼→顏色
+    tag_colors = np.array([country_color.get(tag,(25,25,25)) for tag in states.tags],dtype=np.uint8).reshape(-1,3)
+
+    palette = tag_colors[states.owner[columns.state]]
+    palette[columns.state == 0] = 0
+    return palette
+
+def terrain_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    地形類型，依definition.csv的地形上色
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+
+    terrain_colors = np.array([TERRAIN_PALETTE.get(name,(128,128,128)) for name in columns.terrain_names],dtype=np.uint8).reshape(-1,3)
+
+    palette = np.zeros((len(columns.color),3),dtype=np.uint8)
+    palette[columns.defined] = terrain_colors[columns.terrain[columns.defined]]
+    return palette
+
+def continent_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    大陸，每個大陸一個顏色，不屬於任何大陸為`BACKGROUND_COLOR`
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+
+    continent_colors = category_colors(int(columns.continent.max()) + 1 if len(columns.continent) != 0 else 1)
+    continent_colors[0] = BACKGROUND_COLOR
+
+    palette = continent_colors[columns.continent]
+    palette[~columns.defined] = 0
+    return palette
+
+def victory_point_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    勝利點，依勝利點價值的熱度圖
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+
+    has_victory_point = ~np.isnan(columns.victory_point)
+    palette = background_palette(columns)
+    palette[has_victory_point] = heat_colors(columns.victory_point[has_victory_point],log=True)
+    return palette
+
+def manpower_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    人口，依所屬地塊人口的熱度圖
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+    states = map_data.state_columns
+
+    in_state = columns.state != 0
+    palette = background_palette(columns)
+    palette[in_state] = heat_colors(states.manpower,log=True)[columns.state[in_state]]
+    return palette
+
+def resource_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    資源，依地塊中數量最多的資源種類上色，沒有資源為`BACKGROUND_COLOR`
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+    states = map_data.state_columns
+
+    #地塊→主要資源，資源種類依名稱排序，每次的顏色相同
+    main_resources = {state_id: max(resources,key=resources.get) for state_id, resources in states.resources.items() if resources}
+    resource_names = sorted(set(main_resources.values()))
+    resource_codes = {name: code for code, name in enumerate(resource_names,start=1)}
+
+    state_codes = np.zeros(len(states.defined),dtype=np.int64)
+    for state_id, name in main_resources.items():
+        state_codes[state_id] = resource_codes[name]
+
+    resource_colors = np.zeros((len(resource_names)+1,3),dtype=np.uint8)
+    resource_colors[0] = BACKGROUND_COLOR
+    resource_colors[1:] = category_colors(len(resource_names))
+
+    palette = resource_colors[state_codes[columns.state]]
+    palette[~columns.defined] = 0
+    return palette
+
+def building_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    建築等級，地塊建築與省分建築的等級相加後的熱度圖
+
+    :param parameter: 建築名稱，預設為infrastructure
+    '''
+    columns:ProvinceColumns = map_data.province_columns
+    states = map_data.state_columns
+    name = parameter or "infrastructure"
+
+    def level_of(buildings) -> float:
+        return sum(float(building.level) for building in buildings or () if building.name == name)
+
+    state_levels = np.zeros(len(states.defined),dtype=np.float64)
+    for state_id, buildings in states.buildings.items():
+        state_levels[state_id] = level_of(buildings)
+
+    levels = state_levels[columns.state]
+    for province_id, buildings in columns.buildings.items():
+        if province_id < len(levels): levels[province_id] += level_of(buildings)
+
+    has_building = columns.defined & (levels > 0)
+    palette = background_palette(columns)
+    palette[has_building] = heat_colors(levels)[has_building]
+    return palette
+
+def core_palette(map_data:Any,parameter:str | None = None) -> np.ndarray:
+    '''
+    某個國家的核心與宣稱，核心為紅色，只有宣稱為黃色
+
+    :param parameter: 國家代碼
+    '''
+    if not parameter: raise Exception("請指定國家代碼")
+
+    columns:ProvinceColumns = map_data.province_columns
+    states = map_data.state_columns
+    tag = parameter.strip().upper()
+
+    def has_tag(value) -> bool:
+        if value is None: return False
+        if isinstance(value,str): return value == tag
+        return tag in value
+
+    marks = np.zeros(len(states.defined),dtype=np.uint8)
+    marks[[state_id for state_id, claim in states.claim.items() if has_tag(claim)]] = 2
+    marks[[state_id for state_id, core in states.core.items() if has_tag(core)]] = 1
+
+    mark_colors = np.array([BACKGROUND_COLOR,(210,40,40),(230,190,40)],dtype=np.uint8)
+
+    palette = mark_colors[marks[columns.state]]
+    palette[~columns.defined] = 0
+    return palette
+
+class MapMode:
+    '''
+    說明
+    ---------------------------------------------
+    地圖模式，以`palette(map_data, parameter)`產生每個省分的顏色。
+
+    需要參數的模式(如某個國家的核心)以`parameter_label`說明參數的意義。\n
+    `inputs`列出查詢表所使用的資料欄位，資料修改時只有使用到該欄位的模式需要重繪(見`MapModeCache.mark_stale`)。
+    '''
+
+    def __init__(self,
+                 name:str,
+                 label:str,
+                 palette:Callable[[Any,str | None],np.ndarray],
+                 parameter_label:str | None = None,
+                 inputs:Iterable[str] | None = None) -> None:
+        self.name = name                        #代號
+        self.label = label                      #顯示名稱
+        self.palette = palette                  #由地圖資料產生查詢表的函式
+        self.parameter_label = parameter_label  #參數的說明，None表示不需要參數
+
+        #使用的資料欄位，None表示任何資料修改時都需要重繪
+        self.inputs = frozenset(inputs) if inputs is not None else None
+
+#地圖模式的代號→地圖模式，依註冊順序排列
+MAP_MODES:dict[str,MapMode] = dict()
+
+def register_map_mode(mode:MapMode) -> MapMode:
+    '''
+    註冊地圖模式，同名的模式會被取代
+    '''
+    MAP_MODES[mode.name] = mode
+    return mode
+
+#欄位名稱與ProvinceColumns、StateColumns的屬性相同，"provinces"為地塊包含的省分(也決定省分所屬的地塊)
+register_map_mode(MapMode("province","省分",province_palette,inputs=()))
+register_map_mode(MapMode("state","地塊",state_palette,inputs=("provinces",)))
+register_map_mode(MapMode("strategic","戰略區",strategic_palette,inputs=("strategic",)))
+register_map_mode(MapMode("nation","政權",nation_palette,inputs=("owner","provinces")))
+register_map_mode(MapMode("province_terrain","地形類型",terrain_palette,inputs=("terrain",)))
+register_map_mode(MapMode("continent","大陸",continent_palette,inputs=("continent",)))
+register_map_mode(MapMode("victory_point","勝利點",victory_point_palette,inputs=("victory_point",)))
+register_map_mode(MapMode("manpower","人口",manpower_palette,inputs=("manpower","provinces")))
+register_map_mode(MapMode("resource","資源",resource_palette,inputs=("resources","provinces")))
+register_map_mode(MapMode("building","建築等級",building_palette,"建築名稱",inputs=("buildings","provinces")))
+register_map_mode(MapMode("core","核心/宣稱",core_palette,"國家代碼",inputs=("core","claim","provinces")))
+
+class MapModeImage:
+    '''
+    快取中的一張地圖模式圖像，圖像與`pixels`共用記憶體，並記錄繪製時的查詢表以找出改變的省分
+    '''
+    __slots__ = ("image","pixels","palette")
+
+    def __init__(self,pixels:np.ndarray,palette:np.ndarray) -> None:
+        self.pixels = pixels                        #形狀為(高, 寬)的RGBX像素
+        self.palette = palette                      #繪製時的查詢表
+        self.image = image_of_pixels(pixels)        #RGBX圖像
+
+class MapModeCache:
+    '''
+    說明
+    ---------------------------------------------
+    地圖模式的圖像快取，第一次選用時才繪製，超過記憶體預算時丟棄最久沒有使用的圖像：
+    >>> cache.bind(raster,map_data)
+    >>> image = cache.get("core","GER")
+
+    地圖資料或省分ID圖層更換時需要重新`bind`，舊的圖像會全部清除。\n
+    地塊或省分的資料被修改時以修改的欄位呼叫`mark_stale`，使用到該欄位的圖像在下次`get`時重新計算查詢表，
+    只重繪顏色改變的省分的像素，並直接修改快取中的圖像，修改的範圍會通知`on_patch`：
+    >>> cache.mark_stale("owner")
+    >>> cache.on_patch = lambda image, box: imageview.invalidate(box) if image is imageview.image else None
+    '''
+
+    def __init__(self,budget:int = MAP_MODE_BUDGET) -> None:
+        '''
+        :param budget: 記憶體預算(位元組)，至少會保留最近使用的一張圖像
+        '''
+        self.budget = budget
+        self.raster:MapRaster | None = None
+        self.map_data:Any = None
+
+        self._images:OrderedDict[tuple[str,str | None],MapModeImage] = OrderedDict()
+        self._stale:set[tuple[str,str | None]] = set()     #資料修改後尚未重繪的圖像
+        self._bytes = 0
+
+        #圖像在原處重繪後呼叫on_patch(圖像, 改變的範圍)，範圍為(左, 上, 右, 下)
+        self.on_patch:Callable[[Image.Image,tuple[int,int,int,int]],Any] | None = None
+
+    def __getstate__(self) -> dict:
+        #圖像可以重新繪製，不需要保存
+        return {"budget": self.budget}
+
+    def __setstate__(self,state:dict) -> None:
+        self.__init__(state["budget"])
+
+    def __contains__(self,key:tuple[str,str | None]) -> bool:
+        return key in self._images
+
+    def bind(self,raster:MapRaster,map_data:Any) -> None:
+        '''
+        設定繪製時使用的省分ID圖層與地圖資料，與目前的不同時清除所有圖像
+        '''
+        if raster is self.raster and map_data is self.map_data: return
+
+        self.raster = raster
+        self.map_data = map_data
+        self.clear()
+
+    def get(self,name:str,parameter:str | None = None) -> Image.Image:
+        '''
+        獲取地圖模式的圖像，不在快取中時繪製，資料修改過時只重繪改變的省分
+
+        :param name: MAP_MODES中的代號
+        :param parameter: 地圖模式的參數，不需要參數的模式忽略
+        '''
+        mode = MAP_MODES[name]
+        key = (name,parameter if mode.parameter_label is not None else None)
+
+        if key in self._images:
+            if key in self._stale: self._patch(key)
+            self._images.move_to_end(key)
+            return self._images[key].image
+
+        if self.raster is None: raise Exception("尚未讀取地圖")
+
+        palette = mode.palette(self.map_data,key[1])
+        entry = MapModeImage(paint_pixels(self.raster.ids,palette),palette)
+
+        self._images[key] = entry
+        self._bytes += entry.pixels.nbytes
+        self._evict()
+
+        return entry.image
+
+    def mark_stale(self,*inputs:str) -> None:
+        '''
+        地圖資料被修改，使用到這些欄位的圖像在下次使用時重繪改變的部分
+
+        :param inputs: 修改的欄位(見`MapMode.inputs`)，不給予時所有圖像都需要重繪
+        '''
+        changed = frozenset(inputs)
+
+        for key in self._images:
+            depends = MAP_MODES[key[0]].inputs
+            if not changed or depends is None or not depends.isdisjoint(changed):
+                self._stale.add(key)
+
+    def _patch(self,key:tuple[str,str | None]) -> None:
+        '''
+        重新計算查詢表，只重繪顏色改變的省分
+        '''
+        entry = self._images[key]
+        palette = MAP_MODES[key[0]].palette(self.map_data,key[1])
+
+        box = None
+
+        #省分數量改變時整張重繪，仍寫入同一塊記憶體
+        if palette.shape != entry.palette.shape:
+            entry.pixels[...] = paint_pixels(self.raster.ids,palette)
+            box = (0,0) + self.raster.size
+
+        else:
+            changed = np.flatnonzero((palette != entry.palette).any(axis=1))
+            pixels = self.raster.pixels_of(changed) if len(changed) != 0 else ()
+
+            if len(pixels) != 0:
+                colors = rgbx_palette(palette)
+                entry.pixels.ravel()[pixels] = colors[self.raster.ids.ravel()[pixels]]
+
+                width = self.raster.size[0]
+                ys, xs = np.divmod(pixels,width)
+                box = (int(xs.min()),int(ys.min()),int(xs.max())+1,int(ys.max())+1)
+
+        entry.palette = palette
+        self._stale.discard(key)
+
+        if box is not None and self.on_patch is not None:
+            self.on_patch(entry.image,box)
+
+    def invalidate(self,name:str | None = None) -> None:
+        '''
+        清除某個地圖模式的所有圖像，不給予名稱時清除全部
+        '''
+        for key in [key for key in self._images if name is None or key[0] == name]:
+            self._bytes -= self._images.pop(key).pixels.nbytes
+            self._stale.discard(key)
+
+    def clear(self) -> None:
+        self._images.clear()
+        self._stale.clear()
+        self._bytes = 0
+
+    def _evict(self) -> None:
+        '''
+        超過預算時由最久沒有使用的圖像開始丟棄
+        '''
+        while self._bytes > self.budget and len(self._images) > 1:
+            key, entry = self._images.popitem(last=False)
+            self._bytes -= entry.pixels.nbytes
+            self._stale.discard(key)
+
+class BorderLayer:
+    '''
+    說明
+    ---------------------------------------------
+    邊界圖層，以`regions(map_data)`將每個省分對應到所屬區域的ID(0表示不屬於任何區域)，
+    相鄰像素的區域不同時即為邊界。
+    '''
+
+    def __init__(self,
+                 name:str,
+                 label:str,
+                 regions:Callable[[Any],np.ndarray],
+                 color:tuple[int,int,int]) -> None:
+        self.name = name            #代號
+        self.label = label          #顯示名稱
+        self.regions = regions      #由地圖資料產生省分ID→區域ID的函式
+        self.color = color          #邊界的顏色
+
+def province_regions(map_data:Any) -> np.ndarray:
+    '''
+    每個省分自成一個區域
+    '''
+    return np.arange(len(map_data.province_columns.defined),dtype=PROVINCE_ID)
+
+def state_regions(map_data:Any) -> np.ndarray:
+    return map_data.province_columns.state
+
+def strategic_regions(map_data:Any) -> np.ndarray:
+    return map_data.province_columns.strategic
+
+def country_regions(map_data:Any) -> np.ndarray:
+    '''
+    擁有者相同的地塊為同一個區域
+    '''
+    return map_data.state_columns.owner[map_data.province_columns.state]
+
+#邊界圖層的代號→邊界圖層，依註冊順序由下往上疊加
+BORDER_LAYERS:dict[str,BorderLayer] = dict()
+
+def register_border_layer(layer:BorderLayer) -> BorderLayer:
+    '''
+    註冊邊界圖層，同名的圖層會被取代
+    '''
+    BORDER_LAYERS[layer.name] = layer
+    return layer
+
+register_border_layer(BorderLayer("province","省分",province_regions,(90,90,90)))
+register_border_layer(BorderLayer("strategic","戰略區",strategic_regions,(30,60,200)))
+register_border_layer(BorderLayer("state","地塊",state_regions,(0,0,0)))
+register_border_layer(BorderLayer("country","國家",country_regions,(255,255,255)))
+
+def border_mask(region_raster:np.ndarray) -> np.ndarray:
+    '''
+    與右方或下方像素的區域不同的像素為邊界
+
+    :param region_raster: 形狀為(高, 寬)的區域ID
+    :return: 形狀相同的uint8陣列，邊界為255
+    '''
+    mask = np.zeros(region_raster.shape,dtype=bool)
+    mask[:,:-1] |= region_raster[:,:-1] != region_raster[:,1:]
+    mask[:-1] |= region_raster[:-1] != region_raster[1:]
+
+    return mask.view(np.uint8) * np.uint8(255)
+
+class BorderOverlays:
+    '''
+    說明
+    ---------------------------------------------
+    邊界圖層的遮罩快取，每個圖層可以個別開關：
+    >>> borders.bind(raster,map_data)
+    >>> borders.toggle("state")
+    >>> imageview.set_overlays(borders.overlays())
+
+    遮罩為"L"模式的圖像，同時記錄計算時的省分ID→區域ID，
+    區域改變(如地塊易主)時才重新計算。
+    '''
+
+    def __init__(self) -> None:
+        self.raster:MapRaster | None = None
+        self.map_data:Any = None
+        self.enabled:set[str] = set()       #開啟的圖層
+
+        self._masks:dict[str,Image.Image] = dict()
+        self._regions:dict[str,np.ndarray] = dict()
+
+    def __getstate__(self) -> dict:
+        #遮罩可以重新計算，不需要保存
+        return {"enabled": self.enabled}
+
+    def __setstate__(self,state:dict) -> None:
+        self.__init__()
+        self.enabled = state["enabled"]
+
+    def bind(self,raster:MapRaster,map_data:Any) -> None:
+        '''
+        設定計算時使用的省分ID圖層與地圖資料，與目前的不同時清除所有遮罩
+        '''
+        if raster is self.raster and map_data is self.map_data: return
+
+        self.raster = raster
+        self.map_data = map_data
+        self._masks.clear()
+        self._regions.clear()
+
+    def toggle(self,name:str,enabled:bool | None = None) -> bool:
+        '''
+        開關邊界圖層
+
+        :param enabled: None表示切換
+        :return: 圖層是否開啟
+        '''
+        if enabled is None: enabled = name not in self.enabled
+
+        if enabled: self.enabled.add(name)
+        else: self.enabled.discard(name)
+
+        return enabled
+
+    def mask(self,name:str) -> Image.Image:
+        '''
+        邊界圖層的遮罩，區域沒有改變時使用快取
+        '''
+        if self.raster is None: raise Exception("尚未讀取地圖")
+
+        regions = np.asarray(BORDER_LAYERS[name].regions(self.map_data))
+
+        cached = self._regions.get(name)
+        if cached is None or not np.array_equal(cached,regions):
+            self._masks[name] = Image.fromarray(border_mask(regions[self.raster.ids]))
+            self._regions[name] = regions.copy()
+
+        return self._masks[name]
+
+    def overlays(self) -> list[tuple[Image.Image,tuple[int,int,int]]]:
+        '''
+        開啟的圖層的(遮罩, 顏色)，依`BORDER_LAYERS`的順序由下往上
+        '''
+        return [(self.mask(name),layer.color) for name, layer in BORDER_LAYERS.items() if name in self.enabled]
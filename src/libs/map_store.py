@@ -0,0 +1,528 @@
+'''
+map_store.py
+
+地圖資料的欄位式儲存區，以numpy陣列保存，陣列的索引即為省分ID
+註:不可以匯入libs.root等會建立視窗的模組
+'''
+
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+from PIL import Image
+
+#省分ID的資料型態，原版約有13000個省分
+PROVINCE_ID = np.uint16
+
+#地塊ID、戰略區ID與國家代碼索引的資料型態
+STATE_ID = np.uint16
+
+def pack_color(color:tuple[int,int,int]) -> int:
+    '''
+    將(r,g,b)壓縮成24位元的整數
+    '''
+    r, g, b = color
+    return (int(r) << 16) | (int(g) << 8) | int(b)
+
+def unpack_color(packed:int) -> tuple[int,int,int]:
+    '''
+    將24位元的整數還原成(r,g,b)
+    '''
+    packed = int(packed)
+    return (packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF
+
+def pack_colors(pixels:np.ndarray) -> np.ndarray:
+    '''
+    將形狀為(..., 3)的uint8陣列壓縮成uint32陣列
+    '''
+    pixels = pixels.astype(np.uint32)
+    return (pixels[...,0] << 16) | (pixels[...,1] << 8) | pixels[...,2]
+
+class ProvinceColumns:
+    '''
+    說明
+    ---------------------------------------------
+    省分資料，每一欄為一個陣列，以省分ID為索引：
+    >>> columns.terrain_names[columns.terrain[province_id]]
+
+    definition.csv的欄位以外，還有所屬的地塊、戰略區與勝利點，0或NaN表示沒有。\n
+    沒有定義的ID其`defined`為False。\n
+    顏色以24位元整數保存，由顏色查詢省分時以排序後的顏色做二分搜尋。\n
+    整張地圖的查詢可以直接以陣列運算，例如德國擁有的臨海省分：
+    >>> ids = np.flatnonzero(columns.coastal & (states.owner[columns.state] == states.tag_code("GER")))
+    '''
+
+    def __init__(self,
+                 ids:np.ndarray | None = None,
+                 colors:np.ndarray | None = None,
+                 types:np.ndarray | None = None,
+                 coastal:np.ndarray | None = None,
+                 terrains:np.ndarray | None = None,
+                 continents:np.ndarray | None = None) -> None:
+        '''
+        不給予任何參數時為沒有省分的空表
+
+        :param ids: 每一列的省分ID
+        :param colors: 每一列壓縮後的顏色
+        :param types: 每一列的海陸類型字串
+        :param coastal: 每一列是否臨海
+        :param terrains: 每一列的地形字串
+        :param continents: 每一列的大陸ID
+        '''
+        if ids is None:
+            ids = np.zeros(0,dtype=np.int64)
+            colors = np.zeros(0,dtype=np.uint32)
+            types = terrains = np.zeros(0,dtype=str)
+            coastal = np.zeros(0,dtype=bool)
+            continents = np.zeros(0,dtype=np.int64)
+
+        size = int(ids.max()) + 1 if len(ids) != 0 else 1
+
+        type_names, type_codes = np.unique(types,return_inverse=True)
+        terrain_names, terrain_codes = np.unique(terrains,return_inverse=True)
+
+        self.type_names:list[str] = type_names.tolist()         #海陸類型的名稱
+        self.terrain_names:list[str] = terrain_names.tolist()   #地形的名稱
+
+        self.defined = np.zeros(size,dtype=bool)            #是否有定義
+        self.color = np.zeros(size,dtype=np.uint32)         #壓縮後的顏色
+        self.type = np.zeros(size,dtype=np.uint8)           #海陸類型，type_names的索引
+        self.coastal = np.zeros(size,dtype=bool)            #是否臨海
+        self.terrain = np.zeros(size,dtype=np.uint8)        #地形，terrain_names的索引
+        self.continent = np.zeros(size,dtype=np.uint16)     #大陸ID
+
+        self.defined[ids] = True
+        self.color[ids] = colors
+        self.type[ids] = type_codes
+        self.coastal[ids] = coastal
+        self.terrain[ids] = terrain_codes
+        self.continent[ids] = continents
+
+        self.state = np.zeros(size,dtype=STATE_ID)                      #所屬的地塊ID
+        self.strategic = np.zeros(size,dtype=STATE_ID)                  #所屬的戰略區ID
+        self.victory_point = np.full(size,np.nan,dtype=np.float32)      #勝利點價值
+        self.pos = np.full((size,2),np.nan,dtype=np.float32)            #勝利點座標(西南原點)
+        self.buildings:dict[int,Any] = dict()                           #省分建築，只有少數省分有
+
+        #顏色查詢表，同一個顏色以後定義的省分為準
+        order = np.argsort(colors,kind="stable")
+        sorted_colors = colors[order]
+        last = np.append(sorted_colors[1:] != sorted_colors[:-1],True)[:len(sorted_colors)]
+        self._sorted_colors = sorted_colors[last]
+        self._sorted_ids = ids[order][last].astype(PROVINCE_ID)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.defined))
+
+    def __contains__(self,province_id:object) -> bool:
+        #非整數(如找不到顏色時的None)視為不存在
+        if not isinstance(province_id,(int,np.integer)): return False
+        return 0 <= province_id < len(self.defined) and bool(self.defined[province_id])
+
+    def assign_states(self,states:'StateColumns') -> None:
+        '''
+        依`states`的省分列表填入每個省分所屬的地塊
+        '''
+        self.state[:] = 0
+        province_ids = states.province_ids.astype(np.int64)
+        used = province_ids < len(self.state)
+        self.state[province_ids[used]] = states.state_of_entries()[used]
+
+    @property
+    def ids(self) -> np.ndarray:
+        '''
+        所有有定義的省分ID
+        '''
+        return np.flatnonzero(self.defined)
+
+    def id_of_color(self,color:tuple[int,int,int]) -> int | None:
+        '''
+        由顏色獲取省分ID，找不到時回傳None
+        '''
+        packed = pack_color(color[:3])
+        index = int(np.searchsorted(self._sorted_colors,packed))
+
+        if index < len(self._sorted_colors) and self._sorted_colors[index] == packed:
+            return int(self._sorted_ids[index])
+        return None
+
+    def ids_of_colors(self,packed:np.ndarray) -> np.ndarray:
+        '''
+        由壓縮後的顏色陣列獲取省分ID陣列，找不到的顏色為0
+        '''
+        if len(self._sorted_colors) == 0: return np.zeros(packed.shape,dtype=PROVINCE_ID)
+
+        index = np.searchsorted(self._sorted_colors,packed)
+        index[index == len(self._sorted_colors)] = 0
+
+        return np.where(self._sorted_colors[index] == packed,self._sorted_ids[index],0).astype(PROVINCE_ID)
+
+    def id_raster(self,image:Image.Image) -> np.ndarray:
+        '''
+        將provinces.bmp轉為每個像素的省分ID，找不到的顏色為0
+
+        :return: 形狀為(高, 寬)的uint16陣列
+        '''
+        packed = pack_colors(np.asarray(image.convert("RGB")))
+
+        #全圖的像素很多，以完整的24位元查詢表取代二分搜尋
+        lut = np.zeros(1 << 24,dtype=PROVINCE_ID)
+        lut[self._sorted_colors] = self._sorted_ids
+
+        return lut[packed]
+
+class StateColumns:
+    '''
+    說明
+    ---------------------------------------------
+    地塊資料，每一欄為一個陣列，以地塊ID為索引。\n
+    擁有者與控制者為`tags`的索引，0表示沒有；地塊的省分以CSR格式保存：
+    >>> states.province_ids[states.province_offsets[state_id]:states.province_offsets[state_id+1]]
+
+    資源、建築、核心與宣稱只有部分地塊有，以字典保存。
+    '''
+
+    def __init__(self,
+                 ids:Sequence[int] = (),
+                 manpower:Sequence[int] = (),
+                 categories:Sequence[str] = (),
+                 owners:Sequence[str | None] = (),
+                 controllers:Sequence[str | None] = (),
+                 local_supplies:Sequence[float | None] = (),
+                 impassable:Sequence[bool] = (),
+                 demilitarized_zone:Sequence[bool] = (),
+                 provinces:Sequence[Sequence[int] | None] = ()) -> None:
+        '''
+        每個參數為依地塊順序排列的值，不給予任何參數時為沒有地塊的空表
+        '''
+        ids = np.asarray(ids,dtype=np.int64)
+        size = int(ids.max()) + 1 if len(ids) != 0 else 1
+
+        self.tags:list[str | None] = [None]             #國家代碼，索引0表示沒有
+        self._tag_codes:dict[str | None,int] = {None: 0}
+
+        category_names, category_codes = np.unique(np.asarray(categories,dtype=str),return_inverse=True)
+        self.category_names:list[str] = category_names.tolist()    #地塊類型的名稱
+
+        self.defined = np.zeros(size,dtype=bool)                        #是否有定義
+        self.manpower = np.zeros(size,dtype=np.int64)                   #人口
+        self.category = np.zeros(size,dtype=np.uint8)                   #地塊類型，category_names的索引
+        self.owner = np.zeros(size,dtype=STATE_ID)                      #擁有者，tags的索引
+        self.controller = np.zeros(size,dtype=STATE_ID)                 #控制者，tags的索引
+        self.local_supply = np.full(size,np.nan,dtype=np.float32)       #當地補給
+        self.impassable = np.zeros(size,dtype=bool)                     #不可通行
+        self.demilitarized_zone = np.zeros(size,dtype=bool)             #非軍事區
+
+        self.defined[ids] = True
+        self.manpower[ids] = [value or 0 for value in manpower]
+        self.category[ids] = category_codes
+        self.owner[ids] = [self.tag_code(tag) for tag in owners]
+        self.controller[ids] = [self.tag_code(tag) for tag in controllers]
+        self.local_supply[ids] = [np.nan if value is None else value for value in local_supplies]
+        self.impassable[ids] = impassable
+        self.demilitarized_zone[ids] = demilitarized_zone
+
+        self.resources:dict[int,dict[str,int]] = dict()     #資源
+        self.buildings:dict[int,Any] = dict()               #建築
+        self.core:dict[int,Any] = dict()                    #核心
+        self.claim:dict[int,Any] = dict()                   #宣稱
+
+        #省分列表，依地塊ID排列
+        by_id = dict(zip(ids.tolist(),provinces))
+        self._set_provinces(by_id)
+
+    def _set_provinces(self,by_id:dict[int,Iterable[int] | None]) -> None:
+        '''
+        以地塊ID→省分列表重建CSR
+        '''
+        size = len(self.defined)
+        counts = np.zeros(size,dtype=np.int64)
+        lists = [np.asarray(by_id[state_id] if by_id.get(state_id) is not None else (),dtype=np.int64) for state_id in range(size)]
+
+        for state_id, province_list in enumerate(lists):
+            counts[state_id] = len(province_list)
+
+        self.province_offsets = np.zeros(size+1,dtype=np.int64)        #每個地塊在province_ids中的起點
+        np.cumsum(counts,out=self.province_offsets[1:])
+        self.province_ids = np.concatenate(lists).astype(PROVINCE_ID) if size != 0 else np.zeros(0,dtype=PROVINCE_ID)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.defined))
+
+    def __contains__(self,state_id:object) -> bool:
+        #非整數(如找不到顏色時的None)視為不存在
+        if not isinstance(state_id,(int,np.integer)): return False
+        return 0 <= state_id < len(self.defined) and bool(self.defined[state_id])
+
+    @property
+    def ids(self) -> np.ndarray:
+        '''
+        所有有定義的地塊ID
+        '''
+        return np.flatnonzero(self.defined)
+
+    def tag_code(self,tag:str | None) -> int:
+        '''
+        國家代碼在`tags`中的索引，不存在時新增
+        '''
+        code = self._tag_codes.get(tag)
+        if code is None:
+            code = len(self.tags)
+            self.tags.append(tag)
+            self._tag_codes[tag] = code
+        return code
+
+    def provinces_of(self,state_id:int) -> np.ndarray:
+        '''
+        地塊的省分ID
+        '''
+        return self.province_ids[self.province_offsets[state_id]:self.province_offsets[state_id+1]]
+
+    def set_provinces(self,state_id:int,provinces:Iterable[int]) -> None:
+        '''
+        更換地塊的省分列表，需要重建CSR
+        '''
+        by_id = {index: self.provinces_of(index) for index in range(len(self.defined))}
+        by_id[state_id] = list(provinces)
+        self._set_provinces(by_id)
+
+    def state_of_entries(self) -> np.ndarray:
+        '''
+        `province_ids`中每一項所屬的地塊ID
+        '''
+        return np.repeat(np.arange(len(self.defined),dtype=STATE_ID),np.diff(self.province_offsets))
+
+class UnitStacks:
+    '''
+    說明
+    ---------------------------------------------
+    unitstacks.txt的物件位置，依(類型, 省分)排序，同一省分同一類型的多筆資料保持檔案中的順序。\n
+    每個類型在陣列中是連續的一段，以`type_offsets`找到：
+    >>> provinces, positions = unitstacks.of_type(UnitStacks.VICTORY_POINT)
+
+    座標為(x, y, z)，y為高度，地圖上的位置為(x, z)。
+    '''
+
+    VICTORY_POINT = 38      #勝利點的類型
+
+    def __init__(self,
+                 provinces:np.ndarray | None = None,
+                 types:np.ndarray | None = None,
+                 positions:np.ndarray | None = None,
+                 rotations:np.ndarray | None = None,
+                 offsets:np.ndarray | None = None) -> None:
+        '''
+        不給予任何參數時為沒有物件的空表
+
+        :param provinces: 每一列的省分ID
+        :param types: 每一列的物件類型
+        :param positions: 形狀為(列數, 3)的座標
+        :param rotations: 每一列的旋轉角度
+        :param offsets: 每一列的偏移量
+        '''
+        if provinces is None:
+            provinces = types = rotations = offsets = np.zeros(0)
+            positions = np.zeros((0,3))
+
+        order = np.lexsort((provinces,types))
+
+        self.province = np.asarray(provinces)[order].astype(PROVINCE_ID)       #省分ID
+        self.type = np.asarray(types)[order].astype(np.uint8)                  #物件類型
+        self.position = np.asarray(positions)[order].astype(np.float32)        #座標(x, y, z)
+        self.rotation = np.asarray(rotations)[order].astype(np.float32)        #旋轉角度
+        self.offset = np.asarray(offsets)[order].astype(np.float32)            #偏移量
+
+        #每個類型在陣列中的起點
+        self.type_offsets = np.searchsorted(self.type,np.arange(257),side="left")
+
+    def __len__(self) -> int:
+        return len(self.province)
+
+    @property
+    def types(self) -> list[int]:
+        '''
+        有資料的物件類型
+        '''
+        return np.flatnonzero(np.diff(self.type_offsets)).tolist()
+
+    def _range(self,type:int) -> slice:
+        return slice(self.type_offsets[type],self.type_offsets[type+1])
+
+    def of_type(self,type:int) -> tuple[np.ndarray,np.ndarray]:
+        '''
+        某一類型的所有物件
+
+        :return: 省分ID與座標，依省分ID排序
+        '''
+        rows = self._range(type)
+        return self.province[rows], self.position[rows]
+
+    def positions_of(self,province_id:int,type:int) -> np.ndarray:
+        '''
+        某個省分某一類型的所有座標，形狀為(數量, 3)
+        '''
+        rows = self._range(type)
+        provinces = self.province[rows]
+
+        start = np.searchsorted(provinces,province_id,side="left")
+        end = np.searchsorted(provinces,province_id,side="right")
+        return self.position[rows][start:end]
+
+class Railways:
+    '''
+    說明
+    ---------------------------------------------
+    railways.txt的鐵路，每條鐵路的省分以CSR格式保存：
+    >>> railways.province_ids[railways.offsets[index]:railways.offsets[index+1]]
+
+    `edges`將鐵路拆成相鄰省分的連線，可以直接用於圖形演算法。
+    '''
+
+    def __init__(self,
+                 levels:np.ndarray | None = None,
+                 offsets:np.ndarray | None = None,
+                 province_ids:np.ndarray | None = None) -> None:
+        '''
+        不給予任何參數時為沒有鐵路的空表
+
+        :param levels: 每條鐵路的等級
+        :param offsets: 每條鐵路在`province_ids`中的起點，長度為鐵路數量+1
+        :param province_ids: 所有鐵路的省分ID依序相接
+        '''
+        if levels is None:
+            levels = np.zeros(0)
+            offsets = np.zeros(1)
+            province_ids = np.zeros(0)
+
+        self.level = np.asarray(levels).astype(np.uint8)                #鐵路等級
+        self.offsets = np.asarray(offsets).astype(np.int64)             #每條鐵路的起點
+        self.province_ids = np.asarray(province_ids).astype(PROVINCE_ID)   #經過的省分ID
+
+    def __len__(self) -> int:
+        return len(self.level)
+
+    def provinces_of(self,index:int) -> np.ndarray:
+        '''
+        第`index`條鐵路經過的省分ID
+        '''
+        return self.province_ids[self.offsets[index]:self.offsets[index+1]]
+
+    def edges(self) -> tuple[np.ndarray,np.ndarray]:
+        '''
+        所有相鄰省分的連線
+
+        :return: 形狀為(連線數量, 2)的省分ID，以及每條連線的等級
+        '''
+        #下一個省分屬於同一條鐵路時才是連線
+        railway_of_entries = np.repeat(np.arange(len(self.level)),np.diff(self.offsets))
+        starts = np.flatnonzero(railway_of_entries[:-1] == railway_of_entries[1:])
+
+        pairs = np.stack([self.province_ids[starts],self.province_ids[starts+1]],axis=1)
+
+        return pairs, self.level[railway_of_entries[starts]]
+
+class Adjacencies:
+    '''
+    說明
+    ---------------------------------------------
+    adjacencies.csv的省分連結，以結構化陣列`rows`保存，每一列的欄位為：
+    from, to, type(type_names的索引), through(-1表示沒有), start, stop, rule(rule_names的索引)
+
+    連結的兩端都會建立索引，以省分ID找到相關的連結：
+    >>> adjacencies.of_province(province_id)["to"]
+    '''
+
+    def __init__(self,
+                 froms:np.ndarray | None = None,
+                 tos:np.ndarray | None = None,
+                 types:np.ndarray | None = None,
+                 throughs:np.ndarray | None = None,
+                 starts:np.ndarray | None = None,
+                 stops:np.ndarray | None = None,
+                 rules:np.ndarray | None = None) -> None:
+        '''
+        每個參數為依連結順序排列的值，不給予任何參數時為沒有連結的空表
+
+        :param types: 連結類型字串，空字串為陸地連結
+        :param starts: 形狀為(連結數量, 2)的畫面起始座標
+        :param stops: 形狀為(連結數量, 2)的畫面結束座標
+        :param rules: 連結規則名稱，空字串表示沒有
+        '''
+        if froms is None:
+            froms = tos = throughs = np.zeros(0,dtype=np.int64)
+            types = rules = np.zeros(0,dtype=str)
+            starts = stops = np.zeros((0,2))
+
+        type_names, type_codes = np.unique(np.asarray(types,dtype=str),return_inverse=True)
+        rule_names, rule_codes = np.unique(np.asarray(rules,dtype=str),return_inverse=True)
+
+        self.type_names:list[str] = type_names.tolist()     #連結類型的名稱
+        self.rule_names:list[str] = rule_names.tolist()     #連結規則的名稱
+
+        self.rows = np.zeros(len(froms),dtype=[("from",PROVINCE_ID),
+                                               ("to",PROVINCE_ID),
+                                               ("type",np.uint8),
+                                               ("through",np.int32),
+                                               ("start",np.float32,(2,)),
+                                               ("stop",np.float32,(2,)),
+                                               ("rule",np.uint16)])
+        self.rows["from"] = froms
+        self.rows["to"] = tos
+        self.rows["type"] = type_codes
+        self.rows["through"] = throughs
+        self.rows["start"] = starts
+        self.rows["stop"] = stops
+        self.rows["rule"] = rule_codes
+
+        #以省分ID為索引的CSR，每個連結在兩端各出現一次
+        endpoints = np.concatenate([self.rows["from"],self.rows["to"]]).astype(np.int64)
+        row_indices = np.tile(np.arange(len(self.rows)),2)
+        order = np.argsort(endpoints,kind="stable")
+
+        size = int(endpoints.max()) + 1 if len(endpoints) != 0 else 1
+        self.province_offsets = np.zeros(size+1,dtype=np.int64)        #每個省分在row_indices中的起點
+        np.cumsum(np.bincount(endpoints,minlength=size),out=self.province_offsets[1:])
+        self.row_indices = row_indices[order]                           #依省分ID排列的連結索引
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def of_province(self,province_id:int) -> np.ndarray:
+        '''
+        與省分相關的所有連結
+        '''
+        if not 0 <= province_id < len(self.province_offsets) - 1: return self.rows[:0]
+        return self.rows[self.row_indices[self.province_offsets[province_id]:self.province_offsets[province_id+1]]]
+
+def rgbx_palette(palette:np.ndarray) -> np.ndarray:
+    '''
+    將形狀為(數量, 3)的uint8查詢表補成4個位元組，以uint32陣列回傳
+    '''
+    rgbx = np.zeros((len(palette),4),dtype=np.uint8)
+    rgbx[:,:3] = palette
+    return rgbx.view(np.uint32).ravel()
+
+def paint_pixels(id_raster:np.ndarray,palette:np.ndarray) -> np.ndarray:
+    '''
+    依每個省分ID的顏色繪製像素，一次搬移一個uint32比逐色搬移快
+
+    :param id_raster: `ProvinceColumns.id_raster`的結果
+    :param palette: 形狀為(省分數量, 3)的uint8陣列，以省分ID為索引
+    :return: 形狀為(高, 寬)的uint32陣列，每個元素為一個RGBX像素
+    '''
+    return rgbx_palette(palette)[id_raster]
+
+def image_of_pixels(pixels:np.ndarray) -> Image.Image:
+    '''
+    以`paint_pixels`的結果建立RGBX圖像，圖像與陣列共用記憶體，修改陣列即修改圖像
+    '''
+    height, width = pixels.shape
+    return Image.frombuffer("RGBX",(width,height),pixels,"raw","RGBX",0,1)
+
+def paint(id_raster:np.ndarray,palette:np.ndarray) -> Image.Image:
+    '''
+    依每個省分ID的顏色繪製RGB圖像
+
+    :param id_raster: `ProvinceColumns.id_raster`的結果
+    :param palette: 形狀為(省分數量, 3)的uint8陣列，以省分ID為索引
+    '''
+    return image_of_pixels(paint_pixels(id_raster,palette)).convert("RGB")
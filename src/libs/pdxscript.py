@@ -1,6 +1,19 @@
 
+import codecs
+import marshal
+import mmap
+import multiprocessing
+import os
+import re
+from array import array
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from hashlib import sha1
 from os.path import abspath
-from typing import Literal
+from pathlib import Path
+from sys import intern
+from typing import Any, Callable, Iterator, Literal
 
 class PDXstatement:
     '''
@@ -16,15 +29,49 @@ class PDXstatement:
     >>> }
 
     其包含兩個屬性：keyword和value。\n
+    讀取檔案時value會預先轉型：yes/no為bool，數字為int或float，整數列表為`array('i')`，其餘維持str。\n
     使用時可以用__init__()方法創建。
     '''
     
     Operator = Literal["=",">","<"]
 
-    def __init__(self,keyword:str, value:str, operator:Operator = "#E") -> None:
+    #固定屬性，省去每個statement的__dict__
+    __slots__ = ("keyword", "_value", "operator", "_index", "_source", "span")
+
+    def __init__(self,keyword:str, value:Any, operator:Operator = "#E") -> None:
         self.keyword = keyword
-        self.value = value
+        self._value = value
         self.operator = operator
+
+        #keyword→子statement的索引，(建立時的value, 建立時的長度, 索引)
+        self._index:tuple[list,int,dict[str,list['PDXstatement']]] | None = None
+
+        #延遲建立的區塊範圍，只有以lazy或mapped模式讀取時才會記錄
+        self._source:_MappedBlock | None = None
+
+        #在原始檔案中的位置，(起點, 終點)的byte offset，只有以spans模式讀取時才會記錄
+        self.span:tuple[int,int] | None = None
+
+    @property
+    def value(self):
+        #延遲建立的區塊在第一次存取時才轉為statement
+        if self._source is not None:
+            self._materialize()
+        return self._value
+
+    @value.setter
+    def value(self,value) -> None:
+        self._value = value
+        self._source = None
+        self._index = None
+
+    def _materialize(self) -> None:
+        '''
+        將延遲建立的區塊轉為statement，其中的下一層區塊同樣延遲建立
+        '''
+        source = self._source
+        self._source = None
+        self._value = source.build()
     
     def __repr__(self) -> str:
         symbols = {"#E":"=","#S":"<","#G":">"}
@@ -40,209 +87,1199 @@ class PDXstatement:
                     self.operator == other.operator)
     
     def __getitem__(self, key):
+        '''
+        以keyword查詢子statement，沒有時回傳None，多個時回傳list。\n
+        第一次查詢時建立keyword索引，重新指派value或value長度改變時自動重建。\n
+        注意：直接替換value中的元素(如`statement.value[i] = other`)或修改子statement的keyword而長度不變時，
+        索引不會察覺，修改後需呼叫`reindex()`
+        '''
+        value = self.value
+        index = self._index
 
-        #getitem只適用於本身value屬於list[PDXStatement]的
-        if not isinstance(self.value,list):
-            raise Exception("__getitem__() method can only be used on the PDXStatement object with PDXstatment as value.")
-        
-        if len(self.value) > 0:
-            if not isinstance(self.value[0],PDXstatement):
+        #索引不存在或value已改變時才需要檢查並重建索引
+        if index is None or index[0] is not value or index[1] != len(value):
+
+            #getitem只適用於本身value屬於list[PDXStatement]的
+            if not isinstance(value,list):
                 raise Exception("__getitem__() method can only be used on the PDXStatement object with PDXstatment as value.")
+            
+            if len(value) > 0:
+                if not isinstance(value[0],PDXstatement):
+                    raise Exception("__getitem__() method can only be used on the PDXStatement object with PDXstatment as value.")
+
+            index = self._build_index()
         
-        #依序尋找符合的關鍵字
-        result = list()
-        for statement in self.value:
-            if statement.keyword == key:
-
-                #對於value是script類型(list[PDXStatement])，提供方便進入下一層的接口
-                if len(statement.value) > 0:
-                    if isinstance(statement.value[0],PDXstatement):
-                        result.append(PDXstatement(statement.keyword,statement.value))
-                    else:
-                        result.append(statement.value)
-                else:
-                    result.append(None)
+        #由索引找出符合的關鍵字
+        matches = index[2].get(key)
 
-        if len(result) == 0:
+        if matches is None:
             return None
         
-        elif len(result) == 1:
-            return result[0]
+        elif len(matches) == 1:
+            return _lookup_value(matches[0])
+
+        else:
+            return [_lookup_value(statement) for statement in matches]
+
+    def reindex(self) -> None:
+        '''
+        捨棄keyword索引，下一次查詢時重建
+        '''
+        self._index = None
+
+    def _build_index(self) -> tuple[list,int,dict[str,list['PDXstatement']]]:
+        '''
+        建立keyword→子statement的索引，value被重新指派或長度改變時會在下一次查詢時重建
+        '''
+        children:dict[str,list[PDXstatement]] = dict()
+
+        for statement in self.value:
+            matches = children.get(statement.keyword)
+
+            if matches is None:
+                children[statement.keyword] = [statement]
+            else:
+                matches.append(statement)
+
+        self._index = (self.value, len(self.value), children)
+        return self._index
 
+def _lookup_value(statement:PDXstatement) -> Any:
+    '''
+    __getitem__()的回傳值：value是script類型時回傳statement本身，方便進入下一層；空的value回傳None
+    '''
+    value = statement.value
+
+    if isinstance(value,(list,array,str)):
+        if len(value) == 0:
+            return None
+        if isinstance(value[0],PDXstatement):
+            return statement
+
+    return value
+
+class Query:
+    '''
+    說明
+    ---------------------------------------------
+    預先編譯的路徑查詢，以`.`分隔每一層的keyword，`*`代表該層的所有statement。\n
+    重複出現的keyword(如並排的resources)會全部走訪，結果一律是平坦的statement list，不必再區分單一或多個的情況。
+
+    >>> buildings = compile_query("history.buildings.*")
+    >>> for statement in buildings.run(state):
+    >>>     print(statement.keyword, statement.value)
+    '''
+
+    __slots__ = ("pattern", "keys")
+
+    def __init__(self,pattern:str) -> None:
+        self.pattern = pattern
+
+        #每一層要比對的keyword，None代表全部
+        self.keys:tuple[str | None, ...] = tuple(None if key == "*" else intern(key) for key in pattern.split("."))
+
+        if any(key == "" for key in self.keys):
+            raise Exception(f"Invalid query pattern: {pattern!r}")
+
+    def __repr__(self) -> str:
+        return f"Query({self.pattern!r})"
+
+    def run(self,tree:'PDXstatement | list[PDXstatement]') -> list['PDXstatement']:
+        '''
+        在`tree`中查詢，`tree`可以是單一statement(從其子statement開始比對)或read()回傳的statement list
+        '''
+        keys = self.keys
+        key = keys[0]
+
+        #第一層直接比對
+        if isinstance(tree,PDXstatement):
+            current = _children(tree,key)
+        elif key is None:
+            current = list(tree)
         else:
-            return result
+            current = [statement for statement in tree if statement.keyword == key]
+
+        for key in keys[1:]:
+            if not current: break
+
+            matches = []
+            for statement in current:
+                matches += _children(statement,key)
+            current = matches
+
+        return list(current)
 
-def read(path:str) -> list['PDXstatement']:
+    def run_many(self,trees:list) -> list[list['PDXstatement']]:
+        '''
+        對多個tree執行同一個查詢，依序回傳每個tree的結果
+        '''
+        return [self.run(tree) for tree in trees]
+
+    def values(self,tree:'PDXstatement | list[PDXstatement]') -> list[Any]:
+        '''
+        查詢並只回傳符合的statement的value
+        '''
+        return [statement.value for statement in self.run(tree)]
+
+    def first(self,tree:'PDXstatement | list[PDXstatement]',default:Any = None) -> Any:
+        '''
+        查詢並回傳第一個符合的statement的value，沒有符合時回傳`default`
+        '''
+        matches = self.run(tree)
+        return matches[0].value if matches else default
+
+def compile_query(pattern:str) -> Query:
+    '''
+    編譯路徑查詢，如`"history.buildings.*.level"`、`"resources.*"`，詳見Query
+    '''
+    return Query(pattern)
+
+def _children(statement:PDXstatement,key:str | None) -> list[PDXstatement] | tuple:
+    '''
+    取得statement中keyword為`key`的子statement，`key`為None時回傳所有子statement，value不是script類型時回傳空的tuple
+    '''
+    value = statement.value
+
+    if value.__class__ is not list or not value or value[0].__class__ is not PDXstatement:
+        return ()
+
+    if key is None:
+        return value
+
+    index = statement._index
+    if index is None or index[0] is not value or index[1] != len(value):
+        index = statement._build_index()
+
+    return index[2].get(key,())
+
+class ParseCache:
+    '''
+    說明
+    ---------------------------------------------
+    pdxscript的解析結果快取，每個檔案的結果以marshal存成`directory`下的一個檔案。\n
+    以絕對路徑、修改時間與檔案大小判斷檔案是否變更，未變更的檔案直接還原成statement樹而不重新解析。
+
+    >>> cache = ParseCache("data/parse_cache")
+    >>> set_cache(cache)
+    >>> read(path)  #之後的read都會先查詢快取
+    >>> cache.hits, cache.misses
+    '''
+
+    #快取格式的版本，格式或轉型規則變更時遞增使舊的快取失效
+    VERSION = 3
+
+    def __init__(self,directory:str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True,exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self) -> str:
+        return f"ParseCache({str(self.directory)!r}, hits={self.hits}, misses={self.misses})"
+
+    def _entry(self,path:str) -> tuple[Path,int,int]:
+        '''
+        回傳`path`對應的快取檔位置、修改時間與檔案大小
+        '''
+        path = abspath(path)
+        stat = os.stat(path)
+        name = sha1(path.encode("utf-8","surrogatepass")).hexdigest()
+        return self.directory.joinpath(name), stat.st_mtime_ns, stat.st_size
+
+    def load(self,path:str) -> list['PDXstatement'] | None:
+        '''
+        讀取`path`的快取，快取不存在或檔案已變更時回傳None
+        '''
+        entry, mtime, size = self._entry(path)
+
+        try:
+            with open(entry,"rb") as file:
+                version, cached_path, cached_mtime, cached_size, tree = marshal.loads(file.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            self.misses += 1
+            return None
+
+        if version != self.VERSION or cached_path != abspath(path) or cached_mtime != mtime or cached_size != size:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return _decode(tree)
+
+    def store(self,path:str,statements:list['PDXstatement']) -> None:
+        '''
+        將`path`的解析結果寫入快取
+        '''
+        self._write(path,_encode(statements))
+
+    def _write(self,path:str,tree:tuple) -> None:
+        '''
+        將`_encode`過的解析結果寫入快取
+        '''
+        entry, mtime, size = self._entry(path)
+
+        try:
+            data = marshal.dumps((self.VERSION, abspath(path), mtime, size, tree))
+        except ValueError:
+            #含有無法序列化的值時不快取
+            return
+
+        #先寫入暫存檔再取代，避免中斷時留下不完整的快取
+        temp = entry.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp,"wb") as file:
+            file.write(data)
+        os.replace(temp,entry)
+
+    def clear(self) -> None:
+        '''
+        刪除所有快取並歸零計數
+        '''
+        for entry in self.directory.iterdir():
+            if entry.is_file(): entry.unlink()
+        self.hits = 0
+        self.misses = 0
+
+def _encode(statements:list['PDXstatement']) -> tuple:
+    '''
+    將statement樹轉為只含tuple、list與純量的結構，子statement以tuple表示，列表維持list，整數列表存為bytes
+    '''
+    result = []
+    for statement in statements:
+        value = statement.value
+        if isinstance(value,array):
+            value = value.tobytes()
+        elif isinstance(value,list) and len(value) > 0 and isinstance(value[0],PDXstatement):
+            value = _encode(value)
+        result.append((statement.keyword, value, statement.operator))
+    return tuple(result)
+
+def _decode(tree:tuple) -> list['PDXstatement']:
+    '''
+    將`_encode`的結果還原成statement樹
+    '''
+    return [PDXstatement(keyword,
+                         _decode(value) if value.__class__ is tuple else array("i",value) if value.__class__ is bytes else value,
+                         operator)
+            for keyword, value, operator in tree]
+
+#read()使用的快取，None代表不使用快取
+_cache:ParseCache | None = None
+
+def set_cache(cache:ParseCache | None) -> None:
+    '''
+    設定`read`使用的解析快取，傳入None則停用
+    '''
+    global _cache
+    _cache = cache
+
+def get_cache() -> ParseCache | None:
+    '''
+    取得`read`目前使用的解析快取
+    '''
+    return _cache
+
+#註解
+_COMMENT = re.compile(r"#[^\n]*")
+
+#str.split()會視為空白、但pdxscript不視為空白的字元
+_ASCII_EXTRA_SPACE = "\x0b\x0c\x1c\x1d\x1e\x1f"
+_EXTRA_SPACE = re.compile(r"[\x0b\x0c\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]")
+
+#引號字串中不能出現的字元，否則無法直接以str.split()切割
+_UNSAFE_QUOTED = " \t\n\\=<>{}"
+
+#token的樣式：前綴的空白與註解會被吞掉，只擷取操作符、括號或一般文字(可含引號字串)
+#token可以不存在，讓檔案結尾的註解也整段被吞掉，否則下一次比對會從註解中間開始
+_TOKEN = re.compile(r"""(?:[ \t\r\n]++|\#[^\r\n]*+)*+
+                        ( [=<>{}]
+                        | (?:[^ \t\r\n=<>{}\#"]++|"(?:[^"\\\r\n]|\\.)*+"?)++ )?""",re.VERBOSE)
+
+#spans模式以bytes切割token，才能取得byte位置
+_TOKEN_BYTES = re.compile(_TOKEN.pattern.encode("ascii"),re.VERBOSE)
+
+_OPERATORS = {"=":"#E","<":"#S",">":"#G"}
+_SPECIAL = frozenset(("=","<",">","{","}"))
+_NOT_LIST_ITEM = frozenset(("=","<",">","}"))
+
+#bytes層級中需要略過括號的引號字串與註解
+_MASKED = re.compile(rb'"(?:[^"\\\r\n]|\\.)*+"?|\#[^\r\n]*+')
+
+#有結尾引號的引號字串
+_CLOSED_QUOTE = re.compile(rb'"(?:[^"\\\r\n]|\\.)*+"')
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+_BOM = b"\xef\xbb\xbf"
+
+#超過此大小的檔案才使用記憶體映射
+_MMAP_THRESHOLD = 1 << 20
+
+#iterparse每次讀取的大小(位元組)
+_STREAM_CHUNK_SIZE = 1 << 16
+
+#可能是數字的開頭字元，避免nan、inf等文字被float()當成數字
+_NUMBER_START = frozenset("0123456789-+.")
+_BOOLEANS = {"yes":True,"no":False}
+
+#已轉型的scalar token，檔案間大量重複(yes、國家標籤、建築等級等)，超過上限時整個清空
+_SCALARS:dict[str,int | float | bool | str] = dict()
+_SCALARS_LIMIT = 1 << 16
+
+Event = Literal["start","assign","list","end"]
+
+def read(path:str,lazy:bool = False,mapped:bool = False,spans:bool = False) -> list['PDXstatement']:
     '''
     讀取`path`位置的pdxscript檔案，輸出成statement的list
+
+    :param lazy: 延遲建立模式，先在原始內容中找出配對的括號，只切割最外層的token；\n
+                 含有下一層區塊的`{ ... }`區塊在第一次存取其value時才切割token並轉為statement。\n
+                 適合只需要少數區塊的檔案，如略過weather的戰略區檔案。\n
+                 有設定快取(`set_cache`)時，命中的結果一律直接完整還原；未命中時依此模式讀取，結果不存入快取。
+    :param mapped: 記憶體映射模式，與`lazy`相同，但大檔案以記憶體映射讀取而不複製，只解碼實際建立的部分。\n
+                   快取的處理與`lazy`相同。
+    :param spans: 記錄每個statement在檔案中的byte位置(`statement.span`)，供編輯後以`reparse`局部更新。\n
+                  此模式不使用快取；檔案含有不常見的寫法時，所有statement的span皆為None。
+    '''
+    if spans:
+        with open(abspath(path),mode="rb") as file:
+            return _parse_spans(file.read())
+
+    cache = _cache
+    statements = cache.load(path) if cache is not None else None
+    if statements is not None: return statements
+
+    #未命中時依模式讀取，延遲建立與記憶體映射的結果只有部分建立，不存入快取
+    if mapped or lazy: return _read_blocks(path,mapped)
+
+    statements = _parse(_read_text(path))
+    if cache is not None: cache.store(path,statements)
+
+    return statements
+
+def read_many(paths:list[str],
+              workers:int | None = None,
+              progress:Callable[[int,int],Any] | None = None,
+              is_cancelled:Callable[[],bool] | None = None) -> list[list['PDXstatement']] | None:
+    '''
+    以多個process平行讀取多個pdxscript檔案，依`paths`的順序回傳每個檔案的statement list。\n
+    有設定快取(`set_cache`)時，命中的檔案直接在本process還原，只有未命中的檔案交給process pool。
+
+    >>> read_many(files,
+    >>>           progress=lambda done, total: running_window.update_progress(int(done/total*100)),
+    >>>           is_cancelled=lambda: running_window.is_cancel_task)
+
+    :param workers: process數量，預設為CPU核心數；檔案太少或只有一個process時直接在本process讀取
+    :param progress: 每讀完一批檔案時呼叫`progress(已完成數量, 總數量)`
+    :param is_cancelled: 回傳True時停止讀取，並回傳None
+    :return: 每個檔案的statement list，被取消時回傳None
     '''
+    paths = list(paths)
+    total = len(paths)
+    results:list[list['PDXstatement'] | None] = [None] * total
+    done = 0
+
+    def report(count:int) -> None:
+        nonlocal done
+        done += count
+        if progress is not None: progress(done,total)
+
+    def cancelled() -> bool:
+        return is_cancelled is not None and is_cancelled()
+
+    #先從快取還原
+    cache = _cache
+    pending = []
+    for index, path in enumerate(paths):
+        statements = cache.load(path) if cache is not None else None
+        if statements is None:
+            pending.append(index)
+        else:
+            results[index] = statements
+
+    report(total - len(pending))
 
-    #讀取檔案寫入記憶體
-    raw_file:list[str] = list()
+    if workers is None: workers = os.cpu_count() or 1
+    workers = min(workers, len(pending) // _MIN_FILES_PER_WORKER)
 
+    #檔案太少時，啟動process的成本高於平行化的好處
+    if workers <= 1:
+        for index in pending:
+            if cancelled(): return None
+            results[index] = _parse(_read_text(paths[index]))
+            if cache is not None: cache.store(paths[index],results[index])
+            report(1)
+        return results
+
+    #分批交給process，每批數量兼顧進度回報的頻率與傳輸成本
+    chunk_size = max(1, min(_MAX_CHUNK_SIZE, len(pending) // (workers * 4)))
+    chunks = [pending[start:start+chunk_size] for start in range(0, len(pending), chunk_size)]
+
+    #spawn在各平台行為一致，也不會複製主程式的Tk視窗與執行緒
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
     try:
-        with open(abspath(path),mode="r",encoding="utf-8-sig") as file:
-            for line in file:
-                raw_file.append(line)
+        futures = {executor.submit(_read_chunk,[paths[index] for index in chunk]): chunk for chunk in chunks}
+        running = set(futures)
+
+        while running:
+            finished, running = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+
+            if cancelled():
+                executor.shutdown(wait=False, cancel_futures=True)
+                return None
+
+            for future in finished:
+                chunk = futures[future]
+                for index, result in zip(chunk, future.result()):
+                    tree = marshal.loads(result) if isinstance(result,bytes) else result
+                    results[index] = _decode(tree)
+                    if cache is not None: cache._write(paths[index],tree)
+                report(len(chunk))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+#每個process至少分到的檔案數量
+_MIN_FILES_PER_WORKER = 16
+
+#每批交給process的檔案數量上限
+_MAX_CHUNK_SIZE = 32
+
+def _read_chunk(paths:list[str]) -> list[bytes | tuple]:
+    '''
+    read_many的子process工作：讀取一批檔案，將結果`_encode`後以marshal序列化回傳
+    '''
+    results = []
+    for path in paths:
+        try:
+            tree = _encode(_parse(_read_text(path)))
+        except Exception as e:
+            raise Exception(f"Failed to parse {path}: {e}") from None
+
+        #marshal比pickle快得多，無法序列化時才交給pickle
+        try:
+            results.append(marshal.dumps(tree))
+        except ValueError:
+            results.append(tree)
+    return results
+
+def reparse(statements:list['PDXstatement'],source:bytes,start:int,old_end:int,new_end:int) -> list['PDXstatement']:
+    '''
+    檔案內容被編輯後，只重新解析受影響的最外層statement，並接回`statements`之中(直接修改並回傳該list)。\n
+    `statements`必須是以`read(path, spans=True)`讀取的結果。
+
+    >>> tree = read(path,spans=True)
+    >>> #將原本[120, 135)的內容改為新的內容，新內容位於[120, 140)
+    >>> reparse(tree,new_source,120,135,140)
+
+    :param source: 編輯後的完整檔案內容
+    :param start: 編輯範圍的起點
+    :param old_end: 編輯範圍在編輯前的終點
+    :param new_end: 編輯範圍在編輯後的終點
+    '''
+    delta = new_end - old_end
+
+    #沒有位置資訊時只能整個重新解析
+    if any(statement.span is None for statement in statements):
+        statements[:] = _parse_spans(source)
+        return statements
+
+    #找出受影響的最外層statement，範圍延伸到前後未受影響的statement之間，讓空白與註解也一併處理
+    first = 0
+    while first < len(statements) and statements[first].span[1] < start:
+        first += 1
+
+    #註解與引號字串最多延伸到行尾，編輯新增的#或引號可能吞掉同一行之後的statement，範圍至少要到編輯後的行尾
+    line_end = source.find(b"\n",new_end)
+    if line_end == -1: line_end = len(source)
+
+    last = first
+    while last < len(statements) and (statements[last].span[0] <= old_end or statements[last].span[0] + delta <= line_end):
+        last += 1
+
+    region_start = statements[first-1].span[1] if first > 0 else 0
+    region_end = statements[last].span[0] + delta if last < len(statements) else len(source)
+
+    #範圍內有沒有結尾的引號時，整個重新解析
+    for match in _MASKED.finditer(source,region_start,region_end):
+        if match.group().startswith(b'"') and _CLOSED_QUOTE.fullmatch(match.group()) is None:
+            statements[:] = _parse_spans(source)
+            return statements
+
+    tokens, starts, ends = _span_tokens(source,region_start,region_end)
+    replacement = _build_spans(tokens,starts,ends)
+    if replacement is None:
+        replacement = _build_top_level_spans(tokens,starts,ends)
+
+    #局部解析無法記錄位置(如括號不成對跨越了範圍、不符合文法的編輯)時整個重新解析，結果才會與完整解析一致
+    if replacement is None or any(statement.span is None for statement in replacement):
+        statements[:] = _parse_spans(source)
+        return statements
+
+    #之後的statement整體位移
+    if delta != 0:
+        _shift_spans(statements[last:],delta)
+
+    statements[first:last] = replacement
+    return statements
+
+def iterparse(path:str) -> Iterator[tuple[Event, str | None, Any, str | None]]:
+    '''
+    逐步讀取`path`位置的pdxscript檔案，不建立statement樹，而是依序產生事件：\n
+    - `("start", keyword, None, operator)`：進入`keyword = { ... }`區塊，匿名區塊的keyword為None\n
+    - `("assign", keyword, value, operator)`：`keyword = value`\n
+    - `("list", keyword, values, operator)`：`keyword = { v1 v2 ... }`，區塊內的裸字則以keyword為None回報\n
+    - `("end", keyword, None, None)`：離開區塊\n
+    檔案分段讀取與切割token，事件在迭代時才產生，使用者可以隨時中斷迭代，只取出需要的內容。
+
+    >>> for event, keyword, value, operator in iterparse(path):
+    >>>     if event == "assign" and keyword == "id": break
+    '''
+    tokens = _stream_tokens(path)
+    pending = deque()   #預讀後退回的token，優先於檔案中的token
+    stack = []          #已進入的區塊keyword
+
+    while True:
+        token = pending.popleft() if pending else next(tokens,None)
+        if token is None: return
+
+        #右括號，離開區塊
+        if token == "}":
+            if len(stack): yield ("end", stack.pop(), None, None)
+            continue
+
+        #匿名區塊
+        if token == "{":
+            stack.append(None)
+            yield ("start", None, None, None)
+            continue
+
+        #收集操作符，連續的操作符以最後一個為準
+        operator = None
+        following = pending.popleft() if pending else next(tokens,None)
+        while following in _OPERATORS:
+            operator = _OPERATORS[following]
+            following = pending.popleft() if pending else next(tokens,None)
+
+        #沒有操作符的裸字，收集至下一個特殊符號為止
+        if operator is None:
+            array = [token]
+            while following is not None and following not in _SPECIAL:
+                array.append(following)
+                following = pending.popleft() if pending else next(tokens,None)
+            if following is not None: pending.appendleft(following)
+            yield ("list", None, _convert_array(array), None)
+            continue
+
+        if following is None: return
+
+        #左括號，讀到下一個特殊符號為止判斷是列表或是下一層
+        if following == "{":
+            array = []
+            item = pending.popleft() if pending else next(tokens,None)
+            while item is not None and item not in _SPECIAL:
+                array.append(item)
+                item = pending.popleft() if pending else next(tokens,None)
+
+            if item == "}":
+                yield ("list", token, _convert_array(array), operator)
+            else:
+                if item is not None: array.append(item)
+                pending.extendleft(reversed(array))
+                stack.append(token)
+                yield ("start", token, None, operator)
+
+        #缺少value，交由下一輪處理右括號
+        elif following == "}":
+            pending.appendleft(following)
+
+        else:
+            yield ("assign", token, _convert_scalar(following), operator)
+
+def _stream_tokens(path:str) -> Iterator[str]:
+    '''
+    分段讀取檔案並逐個產生token，每段只切割到最後一個換行，剩下的部分併入下一段。\n
+    以utf-8解碼，遇到無效位元組時，之後的內容改以latin1解碼
+    '''
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    rest = ""
+
+    with open(abspath(path),mode="rb") as file:
+        while True:
+            data = file.read(_STREAM_CHUNK_SIZE)
+            final = len(data) == 0
+            buffered = decoder.getstate()[0]
+
+            try:
+                text = rest + decoder.decode(data,final)
+            except UnicodeDecodeError:
+                decoder = codecs.getincrementaldecoder("latin1")()
+                text = rest + decoder.decode(buffered + data,final)
+
+            #token與註解都不會跨行，切在換行之後即可
+            cut = len(text) if final else text.rfind("\n") + 1
+            yield from _tokenize(text[:cut])
+
+            if final: return
+            rest = text[cut:]
+
+def _read_text(path:str) -> str:
+    '''
+    讀取整個檔案寫入記憶體，以utf-8解碼，失敗時以latin1解碼同一份內容
+    '''
+    with open(abspath(path),mode="rb") as file:
+        data = file.read()
+
+    try:
+        return data.decode("utf-8-sig")
     except UnicodeDecodeError:
-        with open(abspath(path),mode="r",encoding="latin1") as file:
-            for line in file:
-                raw_file.append(line)
-    
-    #token化
-    tokens:list[str] = list()   #最後輸出的token
-    text_buffer = ""            #拼字版
-    in_text = False             #檢查位置是否在引號中
-    has_backslash = False       #前者是否為跳脫字元
-
-    #逐行讀取原始檔案
-    for line in raw_file:
-
-        #逐字讀取行
-        for char in line:
-
-            #如果是換行或是註解，則跳至下一行病新增紀錄的token
-            if char in "\n#": 
-                if len(text_buffer): tokens.append(text_buffer)
-                text_buffer = ""
-                break
-            
-            #對於空白、tab則確認是否在引號內，若否，則新增紀錄的token
-            elif char in " \t" and not in_text: 
-                if len(text_buffer): tokens.append(text_buffer)
-                text_buffer = ""
+        return data.decode("latin1")
+
+def _detect_encoding(buffer:bytes | mmap.mmap) -> tuple[str,int]:
+    '''
+    判斷檔案編碼，回傳(編碼, 內容起點)。\n
+    有BOM時為utf-8並跳過BOM；沒有非ascii位元組時直接視為utf-8；否則從第一個非ascii位元組開始檢查，有無效位元組時為latin1
+    '''
+    if buffer[:3] == _BOM: return "utf-8", 3
+
+    if isinstance(buffer,bytes) and buffer.isascii(): return "utf-8", 0
+
+    match = _NON_ASCII.search(buffer)
+    if match is None: return "utf-8", 0
+
+    try:
+        buffer[match.start():].decode("utf-8")
+    except UnicodeDecodeError:
+        return "latin1", 0
+
+    return "utf-8", 0
+
+def _read_blocks(path:str,mapped:bool = False) -> list['PDXstatement']:
+    '''
+    讀取檔案，先以bytes找出所有區塊，再只解碼與切割最外層的內容，下一層區塊延遲到存取時才處理
+
+    :param mapped: 大檔案以記憶體映射讀取
+    '''
+    with open(abspath(path),mode="rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0: return []
+
+        #小檔案直接讀取，建立映射的成本比複製還高
+        if not mapped or size < _MMAP_THRESHOLD:
+            buffer = file.read()
+        else:
+            buffer = mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ)
+
+    encoding, start = _detect_encoding(buffer)
+    blocks = _scan_blocks(buffer,start)
+
+    #括號不成對時無法依區塊延遲，整個檔案解碼後處理
+    if blocks is None:
+        return _parse(buffer[start:].decode(encoding))
+
+    return _MappedFile(buffer,encoding,blocks).build(start,len(buffer),0)
+
+def _scan_blocks(buffer:bytes | mmap.mmap,start:int) -> list[list] | None:
+    '''
+    以bytes找出所有`{ ... }`區塊，略過引號與註解中的括號。\n
+    回傳依左括號位置排序的[左括號位置, 右括號位置, 深度, 是否含有下一層區塊]，括號不成對時回傳None
+    '''
+    #引號與註解以等長的空白遮蔽，保持位置不變
+    if buffer.find(b'"',start) != -1 or buffer.find(b"#",start) != -1:
+        buffer = _MASKED.sub(_blank,buffer)
+
+    #逐一找出括號位置，bytes.find比逐字元的正規表達式快得多
+    positions = []
+    for brace in (b"{", b"}"):
+        position = buffer.find(brace,start)
+        while position != -1:
+            positions.append(position)
+            position = buffer.find(brace,position+1)
+    positions.sort()
+
+    blocks = []
+    stack = []      #尚未配對的區塊
+
+    for position in positions:
+
+        #左括號
+        if buffer[position] == 123:
+            if len(stack): stack[-1][3] = True
+            block = [position,-1,len(stack),False]
+            blocks.append(block)
+            stack.append(block)
+
+        #右括號
+        elif len(stack):
+            stack.pop()[1] = position
+
+        else:
+            return None
+
+    if len(stack): return None
+
+    return blocks
+
+def _blank(match:re.Match) -> bytes:
+    return b" " * (match.end() - match.start())
+
+class _MappedFile:
+    '''
+    lazy或mapped模式讀取的檔案，保留記憶體映射、編碼與區塊位置，供延遲建立的區塊解碼
+    '''
+    __slots__ = ("buffer", "encoding", "blocks", "opens")
+
+    def __init__(self,buffer:bytes | mmap.mmap,encoding:str,blocks:list[list]) -> None:
+        self.buffer = buffer
+        self.encoding = encoding
+        self.blocks = blocks
+        self.opens = [block[0] for block in blocks]
+
+    def decode(self,start:int,end:int) -> str:
+        return self.buffer[start:end].decode(self.encoding)
+
+    def build(self,start:int,end:int,depth:int) -> list['PDXstatement']:
+        '''
+        將[start, end)範圍內的內容轉為statement。\n
+        範圍內深度為`depth`且含有下一層區塊的區塊不解碼，以_MappedBlock代替；不含下一層的區塊(如列表)直接一併處理
+        '''
+        tokens = []
+        position = start
+
+        for open_, close, block_depth, nested in self.blocks[bisect_left(self.opens,start):bisect_left(self.opens,end)]:
+            if block_depth != depth or not nested: continue
+
+            tokens += _tokenize(self.decode(position,open_))
+            tokens.append(_MappedBlock(self,open_+1,close,depth+1))
+            position = close + 1
+
+        tokens += _tokenize(self.decode(position,end))
+
+        statements = _build_fast(tokens)
+
+        #不符合常見寫法的範圍，整段解碼後以狀態機處理
+        if statements is None:
+            statements = _build(_tokenize(self.decode(start,end)))
+
+        return statements
+
+class _MappedBlock:
+    '''
+    lazy或mapped模式中延遲建立的區塊範圍
+    '''
+    __slots__ = ("file", "start", "end", "depth")
+
+    def __init__(self,file:_MappedFile,start:int,end:int,depth:int) -> None:
+        self.file = file
+        self.start = start
+        self.end = end
+        self.depth = depth
+
+    def build(self) -> list['PDXstatement']:
+        return self.file.build(self.start,self.end,self.depth)
+
+def _parse(text:str) -> list['PDXstatement']:
+    '''
+    將pdxscript字串轉為statement的list
+    '''
+    tokens = _tokenize(text)
+    statements = _build_fast(tokens)
+
+    #不符合常見寫法的檔案，改用逐token的狀態機處理
+    if statements is None:
+        statements = _build(tokens)
+
+    return statements
+
+def _tokenize(text:str) -> list[str]:
+    '''
+    將整個檔案一次切成token
+    '''
+    stripped = _COMMENT.sub("",text) if "#" in text else text
+
+    #引號內含空白等特殊字元時，交由正規表達式處理
+    if not _is_plain(stripped):
+        return [token for token in _TOKEN.findall(text) if token]
+
+    return (stripped.replace("="," = ")
+                    .replace("{"," { ")
+                    .replace("}"," } ")
+                    .replace("<"," < ")
+                    .replace(">"," > ")
+                    .split())
+
+def _is_plain(text:str) -> bool:
+    '''
+    確認(已移除註解的)字串是否可以直接以str.split()切割
+    '''
+    if text.isascii():
+        if any(char in text for char in _ASCII_EXTRA_SPACE): return False
+
+    elif _EXTRA_SPACE.search(text) is not None: return False
+
+    #引號必須成對，且引號內不含空白、操作符或跳脫字元
+    if '"' in text:
+        parts = text.split('"')
+
+        if len(parts) % 2 == 0: return False
+
+        quoted = "".join(parts[1::2])
+        if any(char in quoted for char in _UNSAFE_QUOTED): return False
+
+    return True
+
+def _span_tokens(source:bytes,start:int = 0,end:int | None = None) -> tuple[list[str],list[int],list[int]]:
+    '''
+    將bytes中[start, end)的範圍切成token，並記錄每個token的起訖byte位置
+    '''
+    if end is None: end = len(source)
+
+    encoding, offset = _detect_encoding(source)
+    start = max(start,offset)
+
+    tokens = []
+    starts = []
+    ends = []
+
+    for match in _TOKEN_BYTES.finditer(source,start,end):
+        if match.start(1) < 0: continue
+        tokens.append(match.group(1).decode(encoding))
+        starts.append(match.start(1))
+        ends.append(match.end(1))
+
+    return tokens, starts, ends
+
+def _parse_spans(source:bytes,start:int = 0,end:int | None = None) -> list['PDXstatement']:
+    '''
+    解析bytes中[start, end)的範圍，並記錄每個statement的byte位置
+    '''
+    tokens, starts, ends = _span_tokens(source,start,end)
+
+    statements = _build_spans(tokens,starts,ends)
+
+    #不符合常見寫法時，改為逐個最外層statement處理
+    if statements is None:
+        statements = _build_top_level_spans(tokens,starts,ends)
+
+    #最外層也無法切分時，以逐token的狀態機處理，不記錄位置
+    if statements is None:
+        statements = _build(tokens)
+
+    return statements
+
+def _build_top_level_spans(tokens:list[str],starts:list[int],ends:list[int]) -> list['PDXstatement'] | None:
+    '''
+    將token切分為最外層的`keyword = value`或`keyword = { ... }`後逐個處理，
+    無法以_build_spans處理的statement改用狀態機，只記錄最外層的位置。最外層無法切分時回傳None
+    '''
+    statements = []
+    index = 0
+    length = len(tokens)
+
+    while index < length:
+        if index + 2 >= length or tokens[index] in _SPECIAL or tokens[index+1] not in _OPERATORS:
+            return None
+
+        #找出statement的最後一個token
+        if tokens[index+2] == "{":
+            depth = 0
+            last = index + 2
+            while last < length:
+                if tokens[last] == "{": depth += 1
+                elif tokens[last] == "}":
+                    depth -= 1
+                    if depth == 0: break
+                last += 1
+            if last == length: return None
+
+        elif tokens[index+2] in _SPECIAL:
+            return None
+
+        else:
+            last = index + 2
+
+        segment = _build_spans(tokens[index:last+1],starts[index:last+1],ends[index:last+1])
+
+        if segment is None:
+            segment = _build(tokens[index:last+1])
+            for statement in segment:
+                statement.span = (starts[index], ends[last])
+
+        statements += segment
+        index = last + 1
+
+    return statements
+
+def _build_spans(tokens:list[str],starts:list[int],ends:list[int]) -> list['PDXstatement'] | None:
+    '''
+    與_build_fast相同，但同時記錄每個statement的起點與終點，遇到其他寫法時回傳None
+    '''
+    current_stack = []  #當前層級中的平行statements
+    stack = []          #current_stack的上級statements，每一項代表一層
+    index = 0
+    length = len(tokens)
+
+    try:
+        while index < length:
+            keyword = tokens[index]
+
+            #右括號，回到上一層
+            if keyword == "}":
+                last_stack = stack.pop()
+                statement = last_stack[-1]
+                statement._value = current_stack
+                statement.span = (statement.span[0], ends[index])
+                current_stack = last_stack
+                index += 1
                 continue
-            
-            #對於特殊token進行配對並新增紀錄的token
-            elif char in "=<>{}":
-                if len(text_buffer): tokens.append(text_buffer)
-                text_buffer = ""
-                match char:
-                    case "=": tokens.append("#E")
-                    case "<": tokens.append("#S")
-                    case ">": tokens.append("#G")
-                    case "{": tokens.append("#L")
-                    case "}": tokens.append("#R")
-            
-            #對於引號進行檢查
-            elif char == "\"":
-
-                #若是跳脫字元，則忽略此次效果並消去反斜線效果
-                if has_backslash: 
-                    has_backslash = False   
-                    text_buffer += char
-                else: 
-                    in_text = not in_text
-                    text_buffer += char
-            
-            #對於反斜線進行檢查
-            elif char == "\\":
-                has_backslash = True
-                text_buffer += char
-            
+
+            operator = _OPERATORS[tokens[index+1]]
+            value = tokens[index+2]
+
+            if keyword in _SPECIAL: return None
+
+            #左括號，判斷是列表或是下一層
+            if value == "{":
+                block_start = index + 3
+                block_end = tokens.index("}",block_start)
+                array = tokens[block_start:block_end]
+
+                if _SPECIAL.isdisjoint(array):
+                    statement = PDXstatement(intern(keyword),_convert_array(array))
+                    statement.span = (starts[index], ends[block_end])
+                    current_stack.append(statement)
+                    index = block_end + 1
+
+                else:
+                    statement = PDXstatement(intern(keyword),"")
+                    statement.span = (starts[index], -1)
+                    current_stack.append(statement)
+                    stack.append(current_stack)
+                    current_stack = []
+                    index = block_start
+
+            elif value in _SPECIAL: return None
+
             else:
-                text_buffer += char
-    
-    #回收資源
-    del text_buffer, in_text, has_backslash, raw_file, line, char
+                statement = PDXstatement(intern(keyword),_convert_scalar(value),operator)
+                statement.span = (starts[index], ends[index+2])
+                current_stack.append(statement)
+                index += 3
+
+    except (KeyError, IndexError, ValueError):
+        return None
+
+    #括號沒有關閉
+    if len(stack): return None
+
+    return current_stack
 
-    #statement化
-    statements:list[PDXstatement] = list()  #最後輸出的statement
-    state = "k"                             #讀取狀態，k 代表keyword, v代表value, l代表list
-    counter = 0                             #當前讀取的token在statement的位置
-    array = []                              #讀取到列表資料時暫存的地方
+def _shift_spans(statements:list['PDXstatement'],delta:int) -> None:
+    '''
+    將statements與其所有子statement的位置平移`delta`
+    '''
+    pending = list(statements)
+
+    while pending:
+        statement = pending.pop()
+        if statement.span is not None:
+            statement.span = (statement.span[0] + delta, statement.span[1] + delta)
+
+        value = statement.value
+        if value.__class__ is list and value and value[0].__class__ is PDXstatement:
+            pending += value
+
+def _build_fast(tokens:list[str],
+                start:int = 0,
+                end:int | None = None) -> list['PDXstatement'] | None:
+    '''
+    以statement為單位將token轉為樹狀的statement。\n
+    只處理`keyword = value`、`keyword = { ... }`與`keyword = { 列表 }`的寫法，遇到其他寫法時回傳None。
+
+    :param start: 處理範圍的起點
+    :param end: 處理範圍的終點(不含)
+    '''
+    current_stack = []  #當前層級中的平行statements
+    stack = []          #current_stack的上級statements，每一項代表一層
+    index = start
+    length = len(tokens) if end is None else end
+
+    try:
+        while index < length:
+            keyword = tokens[index]
+
+            #右括號，回到上一層
+            if keyword == "}":
+                last_stack = stack.pop()
+                last_stack[-1]._value = current_stack
+                current_stack = last_stack
+                index += 1
+                continue
+
+            operator = _OPERATORS[tokens[index+1]]
+            value = tokens[index+2]
+
+            if keyword in _SPECIAL: return None
+
+            #左括號，判斷是列表或是下一層
+            if value == "{":
+                block_start = index + 3
+                block_end = tokens.index("}",block_start)
+                array = tokens[block_start:block_end]
+
+                if _SPECIAL.isdisjoint(array):
+                    current_stack.append(PDXstatement(intern(keyword),_convert_array(array)))
+                    index = block_end + 1
+
+                else:
+                    current_stack.append(PDXstatement(intern(keyword),""))
+                    stack.append(current_stack)
+                    current_stack = []
+                    index = block_start
+
+            elif value in _SPECIAL: return None
+
+            #lazy或mapped模式中尚未解碼的區塊
+            elif value.__class__ is _MappedBlock:
+                statement = PDXstatement(intern(keyword),"")
+                statement._source = value
+                current_stack.append(statement)
+                index += 3
+
+            else:
+                scalar = _SCALARS.get(value)
+                if scalar is None: scalar = _convert_scalar(value)
+                current_stack.append(PDXstatement(intern(keyword),scalar,operator))
+                index += 3
+
+    except (KeyError, IndexError, ValueError):
+        return None
+
+    return current_stack
+
+def _build(tokens:list[str]) -> list['PDXstatement']:
+    '''
+    逐個token將其直接轉為樹狀的statement，不經過中間的標記statement
+    '''
+    current_stack = []  #當前層級中的平行statements
+    stack = []          #current_stack的上級statements，每一項代表一層
+    state = "k"         #讀取狀態，k 代表keyword, v代表value, l代表list
+    counter = 0         #當前讀取的token在statement的位置
+    array = []          #讀取到列表資料時暫存的地方
+    keyword = operator = None
 
-    #依序讀取token
     for token in tokens:
 
         #如果讀取到第二個位置但不是操作符或右括號，則判定為列表
-        if counter == 1 and token not in "#E#S#G#R":
+        if counter == 1 and token not in _NOT_LIST_ITEM:
             state = "l"
             array.append(keyword)
             array.append(token)
 
         #如果讀取到操作符，則將狀態切換至value模式
-        elif token in "#E#S#G":
-            operator = token
+        elif token in _OPERATORS:
+            operator = _OPERATORS[token]
             state = "v"
-        
-        #如果讀取到右括號，將狀態切回keyword模式
-        elif token == "#R":
+
+        #如果讀取到右括號，將列表或當前層級寫回上一層的statement
+        elif token == "}":
             state = "k"
 
             #如果對於只有一項的列表，則將先前當成keyword的內容轉至array
             if counter == 1:
                 array.append(keyword)
 
-            #如果array有東西，則創建一個列表型statment，否則創建一般型R statment
+            last_stack = stack.pop()
+
             if len(array):
-                statements.append(PDXstatement("#A",array))
+                last_stack[-1].value = _convert_array(array)
                 array = []
             else:
-                statements.append(PDXstatement("#R","#R"))
+                last_stack[-1].value = current_stack
+
+            current_stack = last_stack
             counter = -1
 
         #如果狀態為keyword，則將讀取到的token作為keyword紀錄
         elif state == "k":
             keyword = token
-        
-        #如果狀態為value，則創建一個一般型statement
+
+        #如果狀態為value，則創建一般型statement或進入下一層
         elif state == "v":
-            statements.append(PDXstatement(keyword,token,operator))
+            if token == "{":
+                current_stack.append(PDXstatement(intern(keyword),""))
+                stack.append(current_stack)
+                current_stack = []
+            else:
+                current_stack.append(PDXstatement(intern(keyword),_convert_scalar(token),operator))
             counter = -1
             state = "k"
-        
+
         #如果狀態是list，則將讀取到的token加入array
         elif state == "l":
             array.append(token)
-        
+
         counter += 1
 
-    #回收資源
-    del tokens, state, counter, array, keyword, operator, token, file
+    return current_stack
 
-    #樹狀化
-    current_stack = []  #當前層級中的平行statments
-    stack = []          #current_stack的上級statements，每一項代表一層，每一層中則可能存在多個statements
+def _convert_scalar(token:str) -> int | float | bool | str:
+    '''
+    將單一token轉型：yes/no轉為bool，數字轉為int或float(見`_convert_number`)，其餘維持str。\n
+    結果會記錄在`_SCALARS`，同樣的token不再重複轉換
+    '''
+    if token[0] in _NUMBER_START:
+        value = _convert_number(token)
+    else:
+        value = _BOOLEANS.get(token,token)
 
-    #逐行處理statement
-    for statement in statements:
+    if len(_SCALARS) >= _SCALARS_LIMIT: _SCALARS.clear()
+    _SCALARS[token] = value
 
-        #如果當前statement屬於L statement，則在加入該statement後將整個current_stack的物件移置stack
-        if statement.value == "#L":
-            current_stack.append(PDXstatement(statement.keyword,""))
-            stack.append(current_stack)
-            current_stack = []
-        
-        #如果是一般statement，則加入current_stack
-        elif statement.keyword not in  "#A#R":
-            current_stack.append(statement)
+    return value
 
-        #如果是列表，則在預處理後加入stack最後一項並將其作為current_stack
-        elif statement.keyword == "#A":
+def _convert_number(token:str) -> int | float | str:
+    '''
+    將數字token轉為int或float。\n
+    轉回文字後與原本不同的寫法(如`1.10`、`007`、`+5`)維持原本的str，不是數字時也維持str
+    '''
+    #int()無法處理小數點，可以省去一次例外處理
+    if "." not in token:
+        try:
+            value = int(token)
+            return value if repr(value) == token else token
+        except ValueError:
+            pass
 
-            #預處理列表
-            array= []
-            statement_array = statement.value
-            for element in statement_array:
-                try:
-                    array.append(int(element))
+    try:
+        value = float(token)
+    except ValueError:
+        return token
 
-                except:
-                    try:
-                        array.append(float(element))
+    return value if repr(value) == token else token
+
+def _convert_array(elements:list[str]) -> array | list[int | float | str]:
+    '''
+    預處理列表，盡可能將元素轉為數字(見`_convert_number`)，全為整數時存為`array('i')`
+    '''
+    #多數列表全為整數，先在C層級一次轉換，轉回文字後與原本相同才採用
+    if len(elements):
+        try:
+            result = array("i",map(int,elements))
+            if list(map(str,result)) == elements: return result
+        except (ValueError, OverflowError):
+            pass
 
-                    except:
-                        array.append(element)
+    result = []
+    is_int = True
 
-            last_stack = stack.pop()
-            last_stack[-1].value = array
-            current_stack = last_stack
+    for element in elements:
+        value = _convert_number(element)
+        if value.__class__ is not int: is_int = False
+        result.append(value)
 
-        #如果是R statement，加入stack最後一項並將其作為current_stack
-        elif statement.keyword == "#R":
-            last_stack = stack.pop()
-            last_stack[-1].value = current_stack
-            current_stack = last_stack
+    if is_int and len(result):
+        try:
+            return array("i",result)
+        except OverflowError:
+            pass
 
-    return current_stack
\ No newline at end of file
+    return result
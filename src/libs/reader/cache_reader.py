@@ -8,6 +8,7 @@ cache_reader.py
 import pickle
 from typing import Any
 
+from libs.pdxscript import ParseCache, get_cache, set_cache
 from libs.root import root
 
 def pickle_write(data:Any,path:str):
@@ -26,7 +27,29 @@ def save_cache(running_window) -> None:
 
 def load_cache(running_window=None) -> None:
     try:
+        #背景讀取本地化層的設定不會被pickle，沿用原本的
+        on_missing_layer = root.game_loc.on_missing_layer
         root.game_loc, root.map_data, root.game_image, root.common_data = pickle_read("data/cache.dat")
+        root.game_loc.on_missing_layer = on_missing_layer
     except:
         running_window.exception = "讀取快取資料出現錯誤"
-        return
\ No newline at end of file
+        return
+
+def open_parse_cache(running_window=None) -> None:
+    '''
+    啟用pdxscript的逐檔解析快取，未變更的檔案會直接從快取還原
+    '''
+    try:
+        set_cache(ParseCache("data/parse_cache"))
+    except:
+        #無法建立快取資料夾時照常解析
+        set_cache(None)
+
+def close_parse_cache(running_window=None) -> None:
+    '''
+    停用pdxscript的逐檔解析快取，並輸出命中次數
+    '''
+    cache = get_cache()
+    if cache is not None:
+        print(f"解析快取 命中:{cache.hits} 未命中:{cache.misses}")
+    set_cache(None)
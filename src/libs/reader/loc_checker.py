@@ -0,0 +1,95 @@
+'''
+loc_checker.py
+
+本地化文檔的一致性檢查
+註:不可以匯入libs.root等會建立視窗的模組
+'''
+
+from pathlib import Path
+
+class LocReport:
+    '''
+    說明
+    ---------------------------------------------
+    本地化檢查的結果，各項的檔案列表皆依讀取順序排列，最後一個為實際生效的定義
+
+    missing: 英文有但`language`沒有的key，兩個語言都以`check_loc_layer`加入後才完整\n
+    duplicates: 語言→在多個一般檔案(或多個replace檔案)中定義的key→定義該key的檔案\n
+    shadowed: 語言→replace底下覆蓋一般檔案的key→定義該key的檔案
+    '''
+
+    def __init__(self,language:str) -> None:
+        self.language = language
+        self.missing:list[str] = []
+        self.duplicates:dict[str,dict[str,list[Path]]] = dict()
+        self.shadowed:dict[str,dict[str,list[Path]]] = dict()
+
+        #語言→該語言定義的key，算出missing後清除
+        self._defined:dict[str,set[str]] = dict()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_defined"] = dict()
+        return state
+
+    def __repr__(self) -> str:
+        return f"LocReport({self.language!r})"
+
+    def summary(self) -> str:
+        '''
+        各項的數量
+        '''
+        duplicates = sum(len(keys) for keys in self.duplicates.values())
+        shadowed = sum(len(keys) for keys in self.shadowed.values())
+        return f"本地化檢查({self.language}) 缺少翻譯:{len(self.missing)} 重複定義:{duplicates} replace覆蓋:{shadowed}"
+
+def check_loc_layer(report:LocReport,
+                    language:str,
+                    loc_files:list[Path],
+                    replace_loc_files:list[Path],
+                    locs:list[dict[str,str]]) -> None:
+    '''
+    以讀取`language`層時每個檔案的內容更新`report`，不需要再次讀取檔案。\n
+    英文與`report.language`都加入後算出缺少的翻譯
+
+    :param loc_files: 一般檔案
+    :param replace_loc_files: localisation/replace底下的檔案
+    :param locs: 依`loc_files`、`replace_loc_files`順序排列的每個檔案內容
+    '''
+    owners, duplicates = _find_duplicates(loc_files,locs[:len(loc_files)])
+    replace_owners, replace_duplicates = _find_duplicates(replace_loc_files,locs[len(loc_files):])
+
+    #replace的key與一般檔案的key的交集
+    shadowed = {key: duplicates.get(key,[owners[key]]) + replace_duplicates.get(key,[replace_owners[key]])
+                for key in replace_owners.keys() & owners.keys()}
+    if shadowed: report.shadowed[language] = shadowed
+
+    duplicates.update(replace_duplicates)
+    if duplicates: report.duplicates[language] = duplicates
+
+    report._defined[language] = owners.keys() | replace_owners.keys()
+
+    languages = ("english",report.language)
+    if all(lang in report._defined for lang in languages):
+        report.missing = sorted(report._defined["english"] - report._defined[report.language])
+        report._defined.clear()
+
+def _find_duplicates(loc_files:list[Path],locs:list[dict[str,str]]) -> tuple[dict[str,Path],dict[str,list[Path]]]:
+    '''
+    找出在多個檔案中定義的key
+
+    :return: key→最後定義該key的檔案，以及重複的key→定義該key的所有檔案
+    '''
+    owners:dict[str,Path] = dict()
+    duplicates:dict[str,list[Path]] = dict()
+
+    for loc_file, loc in zip(loc_files,locs):
+
+        #只有重複的key需要逐一處理
+        for key in loc.keys() & owners.keys():
+            if key in duplicates: duplicates[key].append(loc_file)
+            else: duplicates[key] = [owners[key],loc_file]
+
+        owners.update(dict.fromkeys(loc,loc_file))
+
+    return owners, duplicates
@@ -0,0 +1,162 @@
+'''
+loc_reader.py
+
+本地化文檔(.yml)的讀取
+註:子process會匯入本檔案，不可以匯入libs.root等會建立視窗的模組
+'''
+
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from libs.enums import LANGUAGE
+
+#形如 keyword :0"value"的特徵，每行前後的空白會被忽略
+LOC_PATTERN = re.compile(r'^[^\S\n]*+(\w++):[^\S\n]*+\d*+[^\S\n]*+"([^"\n]++)"',re.MULTILINE)
+
+#檔名結尾的語言，如 xxx_l_english.yml，只接受已知的語言，避免檔名中其他的l_被當成語言
+LANGUAGE_PATTERN = re.compile(r"(?:^|_)l_(" + "|".join(map(re.escape,LANGUAGE)) + r")\.yml$")
+
+#每個process至少分到的檔案數量，檔案太少時直接在本process讀取
+MIN_FILES_PER_WORKER = 8
+
+def read_loc_text(loc_file:str) -> dict[str,str]:
+    '''
+    一次讀取整個`loc_file`的本地化文檔，以一次finditer取出所有key與翻譯字串
+
+    :param loc_file: 本地化文檔的路徑
+    :return: key→翻譯字串，同一檔案中重複的key以最後一個為準
+    '''
+    with open(file=loc_file,mode="r",encoding="utf-8-sig") as file:
+        return {match.group(1): match.group(2) for match in LOC_PATTERN.finditer(file.read())}
+
+def read_loc_texts(loc_files:list[str],
+                   workers:int | None = None,
+                   progress:Callable[[int,int],Any] | None = None,
+                   is_cancelled:Callable[[],bool] | None = None) -> list[dict[str,str]] | None:
+    '''
+    以多個process讀取多個本地化文檔，依`loc_files`的順序回傳每個檔案的內容
+
+    :param workers: process數量，預設為CPU核心數
+    :param progress: 每讀完一個檔案時呼叫`progress(已完成數量, 總數量)`
+    :param is_cancelled: 回傳True時停止讀取，並回傳None
+    :return: 每個檔案的key→翻譯字串，被取消時回傳None
+    '''
+    loc_files = list(loc_files)
+    total = len(loc_files)
+    results = []
+
+    if workers is None: workers = os.cpu_count() or 1
+    workers = min(workers, total // MIN_FILES_PER_WORKER)
+
+    #檔案太少或只有一個核心時，啟動process的成本高於平行化的好處
+    if workers <= 1:
+        for loc_file in loc_files:
+            if is_cancelled is not None and is_cancelled(): return None
+            results.append(read_loc_text(loc_file))
+            if progress is not None: progress(len(results),total)
+        return results
+
+    #spawn在各平台行為一致，也不會複製主程式的Tk視窗與執行緒
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        chunk_size = max(1, total // (workers * 4))
+
+        #map會依輸入的順序回傳
+        for loc in executor.map(read_loc_text, loc_files, chunksize=chunk_size):
+            if is_cancelled is not None and is_cancelled(): return None
+            results.append(loc)
+            if progress is not None: progress(len(results),total)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+def find_loc_files(paths:list[str],language:str) -> list[Path]:
+    '''
+    找出`language`的本地化文檔，依序為一般檔案與localisation/replace底下的檔案。\n
+    同名的檔案只保留後面路徑中的那一個，讓模組可以覆蓋本體遊戲的檔案
+
+    :param paths: 本體遊戲與模組的路徑，後面的優先
+    :param language: 語言，如`english`、`simp_chinese`
+    '''
+    loc_files, replace_loc_files = find_loc_file_groups(paths,language)
+    return loc_files + replace_loc_files
+
+def find_loc_file_groups(paths:list[str],language:str) -> tuple[list[Path],list[Path]]:
+    '''
+    同`find_loc_files`，但分別回傳一般檔案與localisation/replace底下的檔案
+    '''
+    loc_files:dict[str,Path] = dict()
+    replace_loc_files:dict[str,Path] = dict()
+
+    for loc_dir in paths:
+        for file in Path(loc_dir).joinpath("localisation").rglob(f"*l_{language}.yml"):
+
+            #萬用字元也會符合如xxx_bl_english.yml的檔名
+            if language_of(file.name) != language: continue
+
+            #replace底下的檔案最後才讀取
+            if "replace" in file.relative_to(loc_dir).parts[1:-1]:
+                replace_loc_files[file.name] = file
+            else:
+                loc_files[file.name] = file
+
+    return list(loc_files.values()), list(replace_loc_files.values())
+
+def read_loc_groups(paths:list[str],
+                    language:str,
+                    workers:int | None = None,
+                    progress:Callable[[int,int],Any] | None = None,
+                    is_cancelled:Callable[[],bool] | None = None) -> tuple[list[Path],list[Path],list[dict[str,str]]] | None:
+    '''
+    讀取單一語言的所有本地化文檔，保留每個檔案各自的內容
+
+    :param paths: 本體遊戲與模組的路徑，後面的優先
+    :param language: 語言，如`english`、`simp_chinese`
+    :return: (一般檔案, replace底下的檔案, 依兩者順序排列的每個檔案內容)，被取消時回傳None
+    '''
+    loc_files, replace_loc_files = find_loc_file_groups(paths,language)
+    locs = read_loc_texts(loc_files + replace_loc_files,workers,progress,is_cancelled)
+
+    if locs is None: return None
+
+    return loc_files, replace_loc_files, locs
+
+def merge_locs(locs:list[dict[str,str]]) -> dict[str,str]:
+    '''
+    依序合併多個檔案的內容，後面的檔案覆蓋先前的內容
+    '''
+    layer:dict[str,str] = dict()
+    for loc in locs:
+        layer.update(loc)
+
+    return layer
+
+def read_loc_layer(paths:list[str],
+                   language:str,
+                   workers:int | None = None,
+                   progress:Callable[[int,int],Any] | None = None,
+                   is_cancelled:Callable[[],bool] | None = None) -> dict[str,str] | None:
+    '''
+    讀取單一語言的所有本地化文檔並依序合併，後讀取的檔案覆蓋先前的內容
+
+    :param paths: 本體遊戲與模組的路徑，後面的優先
+    :param language: 語言，如`english`、`simp_chinese`
+    :return: key→翻譯字串，被取消時回傳None
+    '''
+    groups = read_loc_groups(paths,language,workers,progress,is_cancelled)
+
+    if groups is None: return None
+
+    return merge_locs(groups[2])
+
+def language_of(loc_file:str) -> str | None:
+    '''
+    由檔名判斷本地化文檔的語言，無法判斷時回傳None
+    '''
+    match = LANGUAGE_PATTERN.search(Path(loc_file).name)
+    return match.group(1) if match is not None else None
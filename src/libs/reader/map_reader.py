@@ -0,0 +1,175 @@
+'''
+map_reader.py
+
+地圖文檔(map/)的批次讀取，結果為numpy陣列
+註:不可以匯入libs.root等會建立視窗的模組
+'''
+
+from typing import Iterable
+
+import numpy as np
+
+from libs.map_store import PROVINCE_ID, Adjacencies, ProvinceColumns, Railways, UnitStacks
+
+#unitstacks.txt每次讀取的大小(位元組)
+UNITSTACKS_CHUNK_SIZE = 1 << 20
+
+#unitstacks.txt每一列的欄位 id;type;x;y;z;rotation;offset
+UNITSTACKS_COLUMNS = 7
+
+#adjacencies.csv每一列的欄位 From;To;Type;Through;start_x;start_y;stop_x;stop_y;adjacency_rule_name;Comment
+ADJACENCIES_COLUMNS = 9
+
+def read_definition_csv(file_path:str) -> ProvinceColumns:
+    '''
+    一次讀取整個definition.csv，每一列的格式為 id;r;g;b;type;coastal;terrain;continent
+
+    :param file_path: 檔案位置
+    '''
+    with open(file_path,"r",encoding="utf-8-sig") as file:
+        rows = [line.split(";",8)[:8] for line in file.read().splitlines() if line.strip()]
+
+    #逐欄轉換，欄數不足的列視為損壞
+    rows = [row for row in rows if len(row) == 8]
+    if len(rows) == 0: raise Exception("definition.csv沒有任何省分")
+
+    ids, r, g, b, types, coastal, terrains, continents = (np.array(column) for column in zip(*rows))
+
+    ids = ids.astype(np.int64)
+    colors = (r.astype(np.uint32) << 16) | (g.astype(np.uint32) << 8) | b.astype(np.uint32)
+
+    #第一列ID為0的是垃圾
+    used = ids != 0
+
+    return ProvinceColumns(ids=ids[used],
+                           colors=colors[used],
+                           types=np.char.strip(types[used]),
+                           coastal=np.char.lower(np.char.strip(coastal[used])) == "true",
+                           terrains=np.char.strip(terrains[used]),
+                           continents=continents[used].astype(np.int64))
+
+def read_supply_nodes(file_path:str) -> np.ndarray:
+    '''
+    讀取補給基地所在的省份，每一列的格式為 等級 省分ID
+
+    :param file_path: 檔案位置
+    :return: 排序後不重複的省分ID
+    '''
+    with open(file_path,"r",encoding="utf-8-sig") as file:
+        lines = [line for line in file.read().splitlines() if line.strip()]
+
+    values = _parse_integers(" ".join(lines).split())
+    if len(values) != 2 * len(lines): raise Exception("supply_nodes.txt每一列必須是 等級 省分ID")
+
+    return np.unique(values[1::2]).astype(PROVINCE_ID)
+
+def read_railways(file_path:str) -> Railways:
+    '''
+    讀取鐵軌所在的省分及等級，每一列的格式為 等級 省分數量 省分ID...
+
+    :param file_path: 檔案位置
+    '''
+    with open(file_path,"r",encoding="utf-8-sig") as file:
+        lines = [line for line in file.read().splitlines() if line.strip()]
+
+    #所有數值一次轉換，再依每一列的數值數量切開
+    tokens = [line.split() for line in lines]
+    values = _parse_integers([token for line_tokens in tokens for token in line_tokens])
+    lengths = np.array([len(line_tokens) for line_tokens in tokens],dtype=np.int64)
+
+    line_starts = np.zeros(len(lines)+1,dtype=np.int64)
+    np.cumsum(lengths,out=line_starts[1:])
+    line_starts = line_starts[:-1]
+
+    #跳過每一列開頭的等級與省分數量
+    offsets = np.zeros(len(lines)+1,dtype=np.int64)
+    np.cumsum(np.maximum(lengths-2,0),out=offsets[1:])
+    is_province = np.ones(len(values),dtype=bool)
+    is_province[line_starts] = False
+    is_province[line_starts[lengths > 1]+1] = False
+
+    return Railways(levels=values[line_starts],
+                    offsets=offsets,
+                    province_ids=values[is_province])
+
+def _parse_integers(tokens:list[str]) -> np.ndarray:
+    '''
+    將字串列表一次轉換成int64陣列
+    '''
+    if len(tokens) == 0: return np.zeros(0,dtype=np.int64)
+    return np.array(tokens).astype(np.int64)
+
+def read_adjacencies_csv(file_path:str) -> Adjacencies:
+    '''
+    一次讀取整個adjacencies.csv，第一列為欄位名稱，From為-1的列為檔案結尾
+
+    :param file_path: 檔案位置
+    '''
+    with open(file_path,"r",encoding="utf-8-sig") as file:
+        rows = [line.split(";")[:ADJACENCIES_COLUMNS] for line in file.read().splitlines()[1:] if line.strip()]
+
+    #欄數不足的列視為損壞
+    rows = [row for row in rows if len(row) == ADJACENCIES_COLUMNS and row[0].strip() != "-1"]
+    if len(rows) == 0: return Adjacencies()
+
+    froms, tos, types, throughs, start_x, start_y, stop_x, stop_y, rules = (np.char.strip(np.array(column)) for column in zip(*rows))
+
+    def numbers(column:np.ndarray) -> np.ndarray:
+        return np.where(column == "","-1",column).astype(np.float32)
+
+    return Adjacencies(froms=froms.astype(np.int64),
+                       tos=tos.astype(np.int64),
+                       types=types,
+                       throughs=numbers(throughs).astype(np.int64),
+                       starts=np.stack([numbers(start_x),numbers(start_y)],axis=1),
+                       stops=np.stack([numbers(stop_x),numbers(stop_y)],axis=1),
+                       rules=rules)
+
+def read_unitstacks(file_path:str,types:Iterable[int] | None = None) -> UnitStacks:
+    '''
+    分段讀取unitstacks.txt，每一段以numpy解析後只保留需要的類型
+
+    :param file_path: 檔案位置
+    :param types: 需要的物件類型，None表示全部保留
+    '''
+    wanted = None if types is None else np.asarray(list(types),dtype=np.float32)
+    chunks:list[np.ndarray] = []
+
+    with open(file_path,"r",encoding="utf-8-sig") as file:
+        while True:
+            lines = file.readlines(UNITSTACKS_CHUNK_SIZE)
+            if not lines: break
+
+            rows = _parse_unitstacks(lines)
+            if wanted is not None: rows = rows[np.isin(rows[:,1],wanted)]
+            chunks.append(rows)
+
+    rows = np.concatenate(chunks) if chunks else np.zeros((0,UNITSTACKS_COLUMNS),dtype=np.float32)
+
+    #類型以uint8保存，超出範圍的列視為損壞
+    rows = rows[(rows[:,0] >= 0) & (rows[:,1] >= 0) & (rows[:,1] < 256)]
+
+    return UnitStacks(provinces=rows[:,0],
+                      types=rows[:,1],
+                      positions=rows[:,2:5],
+                      rotations=rows[:,5],
+                      offsets=rows[:,6])
+
+def _parse_unitstacks(lines:list[str]) -> np.ndarray:
+    '''
+    解析一段unitstacks.txt，回傳形狀為(列數, 7)的float32陣列
+    '''
+    try:
+        rows = np.loadtxt(lines,delimiter=";",dtype=np.float32,ndmin=2)
+        if rows.shape[1] == UNITSTACKS_COLUMNS: return rows
+    except ValueError: pass
+
+    #有欄數不對或無法轉換的列時，才逐列過濾
+    rows = []
+    for line in lines:
+        fields = line.strip().split(";")
+        if len(fields) != UNITSTACKS_COLUMNS: continue
+        try: rows.append([float(field) for field in fields])
+        except ValueError: continue
+
+    return np.array(rows,dtype=np.float32).reshape(-1,UNITSTACKS_COLUMNS)
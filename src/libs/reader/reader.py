@@ -5,15 +5,24 @@ reader.py
 import re
 import traceback as tb
 
+import numpy as np
 from pathlib import Path
 from PIL import Image
 
 from libs.enums import *
 from libs.interface.running_window import RunningWindow
 from libs.map import *
+from libs.map_render import MapRaster
+from libs.map_store import StateColumns, UnitStacks
 from libs.misc.buildings import BuildingData
+from libs.pdxscript import compile_query as pdxcompile_query
+from libs.pdxscript import iterparse as pdxiterparse
 from libs.pdxscript import read as pdxread
+from libs.pdxscript import read_many as pdxread_many
 from libs.pdxscript import PDXstatement
+from libs.reader.loc_checker import LocReport, check_loc_layer
+from libs.reader.loc_reader import language_of, read_loc_text
+from libs.reader.map_reader import read_adjacencies_csv, read_definition_csv, read_railways, read_supply_nodes, read_unitstacks
 from libs.root import root
 
 def check_path_avalibility(running_window:RunningWindow) -> None:
@@ -83,8 +92,8 @@ def get_mod_name(path:str) -> str:
     '''
 
     try:
-        mod_name = PDXstatement("mod",pdxread(path+"/descriptor.mod"))["name"].strip('"')
-        mod_version =  PDXstatement("mod",pdxread(path+"/descriptor.mod"))["version"].strip('"')
+        mod_name = str(PDXstatement("mod",pdxread(path+"/descriptor.mod"))["name"]).strip('"')
+        mod_version =  str(PDXstatement("mod",pdxread(path+"/descriptor.mod"))["version"]).strip('"')
     except:
         raise Exception(f"模組讀取失敗:{path}")
     
@@ -92,78 +101,50 @@ def get_mod_name(path:str) -> str:
     
 def read_loc_files(running_window:RunningWindow) -> None:
     '''
-    讀取本地化文件
+    讀取本地化文件，英文與模組開發語言各為一層，其他語言在查詢時才讀取。\n
+    讀取時一併以每個檔案的內容建立檢查結果(`root.loc_report`)，不需要再次讀取
     '''
 
-    #找出本地化文件的路徑
-    loc_files = dict()
+    #清除舊的層，之後切換語言時從這些路徑讀取
+    root.game_loc.reset(root.path.avalible_path,root.mod_lang)
 
-    for loc_dir in root.path.avalible_path:
+    #英文為所有語言的退回層，先讀取
+    languages = list(dict.fromkeys(("english",root.mod_lang)))
 
-        loc_file_dir = Path(loc_dir).joinpath("localisation")
+    #讀取時一併以每個檔案的內容檢查缺少的翻譯、重複定義與replace覆蓋的key
+    report = LocReport(root.mod_lang)
 
-        en_loc_file_list = list(loc_file_dir.rglob(f"*l_english.yml"))
-        native_loc_file_list = list(loc_file_dir.rglob(f"*l_{root.mod_lang}.yml"))
+    for i, language in enumerate(languages):
 
-        en_loc_file_list.extend(native_loc_file_list)
+        #以多個process讀取，進度依語言平分
+        loaded = root.game_loc.load_layer(language,
+                                          progress=lambda done, total, i=i: running_window.update_progress(int((i+done/total)/len(languages)*100)),
+                                          is_cancelled=lambda: running_window.is_cancel_task,
+                                          on_read=lambda *groups, language=language: check_loc_layer(report,language,*groups))
+        if not loaded: return
 
-        #確保同名檔案只會出現一次
-        for file in en_loc_file_list:
-            loc_files[file.name] = file
-    
-    #replace底下的檔案
-
-    replace_loc_files = dict()
-    for loc_dir in root.path.avalible_path:
-
-        replace_loc_file_dir = Path(loc_dir).joinpath("localisation/replace")
-
-        replce_en_loc_file_list = list(replace_loc_file_dir.rglob(f"*l_english.yml"))
-        replace_native_loc_file_list = list(replace_loc_file_dir.rglob(f"*l_{root.mod_lang}.yml"))
-
-        replce_en_loc_file_list.extend(replace_native_loc_file_list)
+    root.loc_report = report
+    print(report.summary())
 
-        for file in replce_en_loc_file_list:
-            replace_loc_files[file.name] = file
-
-    for counter1, loc_file in enumerate(loc_files.values()):
-
-        read_loc_file(running_window,loc_file)
-
-        running_window.update_progress(int((counter1+1)/(len(loc_files)+len(replace_loc_files))*100))
-        
-        if running_window.is_cancel_task:return
-    
-    for counter2, loc_file in enumerate(replace_loc_files.values()):
-
-        read_loc_file(running_window,loc_file)
-
-        running_window.update_progress(int((counter2+counter1+1)/(len(loc_files)+len(replace_loc_files))*100))
-        
-        if running_window.is_cancel_task:return
+def read_loc_layer(running_window:RunningWindow,language:str) -> None:
+    '''
+    讀取`language`的本地化層，查詢到尚未讀取的語言時在背景執行(見`LocStore.on_missing_layer`)
+    '''
+    try:
+        root.game_loc.load_layer(language,
+                                 progress=lambda done, total: running_window.update_progress(int(done/total*100)),
+                                 is_cancelled=lambda: running_window.is_cancel_task)
+    except Exception as e:
+        running_window.exception = f"讀取{language}的本地化文件出現錯誤:{e}"
+        print(fc.RED+tb.format_exc()+fc.CC)
 
 def read_loc_file(running_window:RunningWindow,loc_file:str) -> None:
     '''
-    讀取`loc_file`的本地化文檔
+    讀取`loc_file`的本地化文檔，寫入檔名中的語言層
 
     :param loc_file: 本地化文檔的路徑
     '''
-
-    #形如 keyword :0"value"的特徵。
-    loc_pattern = r'(^\w+):\s*\d*?\s*"([^"]+)"'
-
-    #讀取檔案並找尋翻譯字串加入到本地化資料中
-    with open(file=loc_file,mode="r",encoding="utf-8-sig") as file:
-
-        for line in file:
-
-            match = re.search(loc_pattern, line.strip())
-
-            if match:
-                key, value = match.groups()
-                root.game_loc[key] = value
-
-            if running_window.is_cancel_task: break
+    root.game_loc.update(read_loc_text(loc_file),language_of(loc_file))
 
 def read_map_files(running_window:RunningWindow) -> None:
     '''                                                   
@@ -172,8 +153,6 @@ def read_map_files(running_window:RunningWindow) -> None:
 
     :param root: 根視窗
     '''
-    import numpy as np
-
     running_window.update_progress(0)
     print("正在處理圖像")
 
@@ -213,48 +192,32 @@ def read_map_files(running_window:RunningWindow) -> None:
     running_window.update_progress(5)
     print("正在處理map/definition.csv")
 
-    #處理省分定義(definition.csv)
-    province_definitions_csv_column_names = ("id","r","g","b","type","coastal","category","continent")
-
+    #處理省分定義(definition.csv)，以最後一個路徑中的檔案為準
     for path in root.path.avalible_path:
+        file_reading = Path(path).joinpath("map").joinpath("definition.csv")
         try:
-            province_array = np.genfromtxt(Path(path).joinpath("map").joinpath("definition.csv"),
-                                                 delimiter=";",
-                                                 dtype=None,
-                                                 encoding="utf-8",
-                                                 names=province_definitions_csv_column_names)
-            
-            root.map_data.province = dict()
-
-            for index, data in enumerate(province_array):
-                
-                #第一項是垃圾
-                if index == 0: continue
+            columns = read_definition_csv(file_reading)
 
-                color = (data["r"],data["g"],data["b"])
+            #省分資料只保存在陣列中，Province為其檢視
+            root.map_data.province_columns = columns
+            root.map_data.province = ProvinceTable(columns)
 
-                root.map_data.color_mapping.avalible_color.add(color)
-
-                #將資料調整成 id: Province的字典
-                root.map_data.province[data["id"]] = Province(id=data["id"],
-                                                              color=color,
-                                                              type=data["type"],
-                                                              terrain=data["category"],
-                                                              coastal= True if data["coastal"] else False,
-                                                              continent=data["continent"])
-                
-                #建立顏色查詢表
-                root.map_data.color_mapping.province_id_from_color[color] = data["id"]
-
-                if running_window.is_cancel_task: return
+            if running_window.is_cancel_task: return
 
         except FileNotFoundError: pass
         except Exception as e:
-            running_window.exception = f"處理以下檔案時發生錯誤:{Path(path).joinpath("map").joinpath("definition.csv")},{e}"
+            running_window.exception = f"處理以下檔案時發生錯誤:{file_reading},{e}"
             print(fc.RED+tb.format_exc()+fc.CC)
             return
-    
-    del path, province_array, index, data, color
+
+    del path, file_reading
+
+    #provinces.bmp只在這裡解碼一次，之後的地圖模式都以省分ID圖層繪製
+    try: root.game_image.province_raster = MapRaster(root.map_data.province_columns,root.game_image.province_image)
+    except Exception as e:
+        running_window.exception = f"解碼provinces.bmp時發生錯誤:{e}"
+        print(fc.RED+tb.format_exc()+fc.CC)
+        return
 
     running_window.update_progress(15)
     print("正在處理map/adjacencies.csv")
@@ -263,34 +226,14 @@ def read_map_files(running_window:RunningWindow) -> None:
     #文件的最後一行必須是-1;-1;-1;-1;-1;-1;-1;-1;-1
     for path in root.path.avalible_path:
         file_reading = Path(path).joinpath("map").joinpath("adjacencies.csv")
-        try:
-            adjacencies_array = np.genfromtxt(Path(path).joinpath("map").joinpath("adjacencies.csv"),
-                                             delimiter=";",
-                                             dtype=None,
-                                             encoding="utf-8",
-                                             invalid_raise=False,
-                                             names=True)
-            
-            for data in adjacencies_array:
-                adjacencies = Adjacency(data["From"],
-                                          data["To"],
-                                          data["Type"],
-                                          data["Through"],
-                                          (data["start_x"],data["start_y"]),
-                                          (data["stop_x"],data["stop_y"]),
-                                          data["adjacency_rule_name"])
-                
-                root.map_data.adjacencies.add(adjacencies)
-
-                if running_window.is_cancel_task: return
-
+        try: root.map_data.adjacencies = read_adjacencies_csv(file_reading)
         except FileNotFoundError: pass
         except Exception as e:
             running_window.exception = f"處理以下檔案時發生錯誤:{file_reading},{e}"
             print(fc.RED+tb.format_exc()+fc.CC)
             return
     
-    del path, file_reading, adjacencies_array, data, adjacencies
+    del path, file_reading
 
     running_window.update_progress(20)
     print("正在處理map/adjacency_rules.txt")
@@ -307,7 +250,7 @@ def read_map_files(running_window:RunningWindow) -> None:
             relationships = ("contested","enemy","friend","neutral")
 
             for statement in adjacency_rules_data:
-                name = statement["name"].strip('"')
+                name = str(statement["name"]).strip('"')
                 required_provinces = statement["required_provinces"]
                 is_disabled = statement["is_disabled"]
                 icon = statement["icon"]
@@ -318,10 +261,10 @@ def read_map_files(running_window:RunningWindow) -> None:
 
                 for relationship in relationships:
 
-                    army_rule = True if statement[relationship]["army"] == "yes" else False
-                    navy_rule = True if statement[relationship]["navy"] == "yes" else False
-                    submarine_rule = True if statement[relationship]["submarine"] == "yes" else False
-                    trade_rule = True if statement[relationship]["trade"] == "yes" else False
+                    army_rule = statement[relationship]["army"] is True
+                    navy_rule = statement[relationship]["navy"] is True
+                    submarine_rule = statement[relationship]["submarine"] is True
+                    trade_rule = statement[relationship]["trade"] is True
 
                     passing_rule[relationship] = (army_rule,navy_rule,submarine_rule,trade_rule)
                 
@@ -376,7 +319,7 @@ def read_map_files(running_window:RunningWindow) -> None:
     #處理補給基地(supply_nodes.txt)
     for path in root.path.avalible_path:
         file_reading = Path(path).joinpath("map").joinpath("supply_nodes.txt")
-        try: root.map_data.supply_nodes = read_supply_node_file(Path(path).joinpath("map").joinpath("supply_nodes.txt"))
+        try: root.map_data.supply_nodes = read_supply_nodes(file_reading)
         except FileNotFoundError: pass
         except Exception as e:
             running_window.exception = f"處理以下檔案時發生錯誤:{file_reading},{e}"
@@ -391,7 +334,7 @@ def read_map_files(running_window:RunningWindow) -> None:
     #處理鐵路(railways.txt)
     for path in root.path.avalible_path:
         file_reading = Path(path).joinpath("map").joinpath("railways.txt")
-        try: root.map_data.railways = read_railway_file(Path(path).joinpath("map").joinpath("railways.txt"))
+        try: root.map_data.railways = read_railways(file_reading)
         except FileNotFoundError: pass
         except Exception as e:
             running_window.exception = f"處理以下檔案時發生錯誤:{file_reading},{e}"
@@ -403,26 +346,20 @@ def read_map_files(running_window:RunningWindow) -> None:
     running_window.update_progress(35)
     print("正在處理map/unitstacks.txt")
 
-    #處理物件位置(unitstacks.txt)，事實上我只關心victory_point的位置
-    unitstack_column_names = ("id","type","x","y","z","rotation","offset")
+    #處理物件位置(unitstacks.txt)，所有類型都保留，勝利點的位置另外寫入省分
+    province_columns = root.map_data.province_columns
 
     for path in root.path.avalible_path:
         try:
             file_reading = Path(path).joinpath("map").joinpath("unitstacks.txt")
-            unitstacks_array = np.genfromtxt(Path(path).joinpath("map").joinpath("unitstacks.txt"),
-                                            delimiter=";",
-                                            dtype=None,
-                                            encoding="utf-8",
-                                            invalid_raise=False,
-                                            names=unitstack_column_names)
-            VICTORY_POINT_SYMBOL = 38
-            victory_points = unitstacks_array[unitstacks_array["type"] == VICTORY_POINT_SYMBOL]
+            unitstacks = read_unitstacks(file_reading)
+            root.map_data.unitstacks = unitstacks
 
-            for victory_point in victory_points:
-
-                root.map_data.province[victory_point["id"]].pos = (victory_point["x"],victory_point["z"])
+            if running_window.is_cancel_task: return
 
-                if running_window.is_cancel_task: return
+            province_ids, positions = unitstacks.of_type(UnitStacks.VICTORY_POINT)
+            used = province_ids < len(province_columns.defined)
+            province_columns.pos[province_ids[used]] = positions[used][:,[0,2]]
 
         except FileNotFoundError: pass
         except Exception as e:
@@ -430,119 +367,135 @@ def read_map_files(running_window:RunningWindow) -> None:
             print(fc.RED+tb.format_exc()+fc.CC)
             return
     
-    del path, file_reading, unitstacks_array, VICTORY_POINT_SYMBOL, victory_points, victory_point
+    del path, file_reading
 
     running_window.update_progress(40)
     print("正在處理history/state")
 
+    #state檔案中需要的路徑
+    RESOURCES_QUERY = pdxcompile_query("resources.*")
+    BUILDINGS_QUERY = pdxcompile_query("history.buildings.*")
+    VICTORY_POINTS_QUERY = pdxcompile_query("history.victory_points")
+    STATE_CATEGORY_QUERY = pdxcompile_query("state_category")
+
+    #地塊ID→地塊資料，之後的路徑覆蓋先前的
+    state_rows:dict[int,tuple] = dict()
+
     #處理地塊(state)
     for path in root.path.avalible_path:
         try:
 
             #列出可以讀取的state檔案
             state_files = list(Path(path).joinpath("history/states").rglob("*txt"))
+            file_reading = Path(path).joinpath("history/states")
+
+            #以多個process平行解析
+            state_datas = pdxread_many(state_files,
+                                       progress=lambda done, total: running_window.update_progress(40+int(done/total*40)),
+                                       is_cancelled=lambda: running_window.is_cancel_task)
+
+            if state_datas is None: return
 
             #依序處理檔案
-            for file in state_files:
+            for file, statements in zip(state_files,state_datas):
 
                 file_reading = file
 
-                data = pdxread(file)[0]
+                data = statements[0]
 
-                state_id = int(data["id"])
+                state_id = data["id"]
 
-                #表示法可能分成合併型或並排型，同時會有在數量使用小數點的謎之行為要注意
-                if data["resources"] is not None and data["resources"] != []:
+                #表示法可能分成合併型或並排型，查詢會一併走訪，同時會有在數量使用小數點的謎之行為要注意
+                #24.000這類寫法轉回文字後不同，會維持str
+                resources = {statement.keyword.lower(): int(float(statement.value)) for statement in RESOURCES_QUERY.run(data)} or None
 
-                    #寫在一起
-                    if isinstance(data["resources"],PDXstatement):
-                        resources = { statement.keyword.lower(): int(float(statement.value)) for statement in data["resources"].value}
+                building_statements = BUILDINGS_QUERY.run(data)
 
-                    #並排分開
-                    else:
-                        resources = {statement.value[0].keyword.lower() : int(float(statement.value[0].value)) for statement in data["resources"]}
-                else:
-                    resources = None
+                if len(building_statements) != 0:
+
+                    buildings = set()
 
-                if data["history"]["buildings"] is not None:
+                    for statement in building_statements:
 
-                    if len(data["history"]["buildings"].value) != 0:
+                        if not isinstance(statement.value,list):
+                            buildings.add(Building(statement.keyword,statement.value))
 
-                        buildings = set()
-                        
-                        for statement in data["history"]["buildings"].value:
+                        else:
+                            province_buildings = set()
 
-                            if not isinstance(statement.value,list):
-                                buildings.add(Building(statement.keyword,statement.value))
-                            
-                            else:
-                                province_buildings = set()
-                                
-                                for province_statement in statement.value:
-                                    
-                                    #考慮有些DLC才有的內容，如地標
-                                    if not isinstance(province_statement.value,list):
-                                        building_level = province_statement.value
-                                    else:
-                                        building_level = province_statement["level"]
+                            for province_statement in statement.value:
 
-                                    province_buildings.add(Building(name=province_statement.keyword,level=building_level))
+                                #考慮有些DLC才有的內容，如地標
+                                if not isinstance(province_statement.value,list):
+                                    building_level = province_statement.value
+                                else:
+                                    building_level = province_statement["level"]
 
-                                root.map_data.province[int(statement.keyword)].buildings = province_buildings
+                                province_buildings.add(Building(name=province_statement.keyword,level=building_level))
 
-                    else:
-                        buildings = None
+                            root.map_data.province[int(statement.keyword)].buildings = province_buildings
                 else:
                     buildings = None
-                
-                if data["history"]["victory_points"] is not None:
-
-                    if isinstance(data["history"]["victory_points"][0],list):
-                        
-                        for victory_point_data in data["history"]["victory_points"]:
-                            province_id = victory_point_data[0]
-                            victory_point_value = victory_point_data[1]
-                            root.map_data.province[province_id].victory_point = victory_point_value
-                    
-                    else:
-                        province_id = data["history"]["victory_points"][0]
-                        victory_point_value = data["history"]["victory_points"][1]
-                        root.map_data.province[province_id].victory_point = victory_point_value
-                
-                #參見history/states/190-Kurzeme.txt，他重複兩次category不知道在衝三小
-                try:
-                    state_category = data["state_category"].strip('"')
-                except:
-                    state_category = data["state_category"][-1].strip('"')
 
-                #紀錄
-                root.map_data.states[state_id] = State(id=state_id,
-                                                       manpower=data["manpower"],
-                                                       state_category=state_category,
-                                                       provinces=data["provinces"],
-                                                       owner=data["history"]["owner"],
-                                                       local_supply=data["local_supplies"],
-                                                       core=data["history"]["add_core_of"],
-                                                       claim=data["history"]["add_claim_by"],
-                                                       demilitarized_zone= True if data["history"]["set_demilitarized_zone"] == "yes" else False,
-                                                       controller= data["history"]["controller"],
-                                                       resources=resources,
-                                                       buildings=buildings,
-                                                       impassable=True if data["impassable"] == "yes" else False)
+                #單一或多個勝利點都是相同的形式
+                for statement in VICTORY_POINTS_QUERY.run(data):
+                    province_id = statement.value[0]
+                    victory_point_value = statement.value[1]
+                    root.map_data.province[province_id].victory_point = victory_point_value
+
+                #參見history/states/190-Kurzeme.txt，他重複兩次category不知道在衝三小，以最後一個為準
+                state_category = str(STATE_CATEGORY_QUERY.values(data)[-1]).strip('"')
+
+                #紀錄，全部讀取後再一次建立陣列
+                state_rows[state_id] = (data["manpower"],
+                                        state_category,
+                                        data["history"]["owner"],
+                                        data["history"]["controller"],
+                                        data["local_supplies"],
+                                        data["impassable"] is True,
+                                        data["history"]["set_demilitarized_zone"] is True,
+                                        data["provinces"],
+                                        resources,
+                                        buildings,
+                                        data["history"]["add_core_of"],
+                                        data["history"]["add_claim_by"])
 
         except FileNotFoundError: pass
         except Exception as e:
             running_window.exception = f"讀取{file_reading}出現錯誤:{e}"
             print(fc.RED+tb.format_exc()+fc.CC)
             return
-        
+
+    state_ids = list(state_rows)
+    manpower, categories, owners, controllers, local_supplies, impassable, demilitarized_zone, provinces, resources, buildings, cores, claims = zip(*state_rows.values()) if state_rows else ((),)*12
+
+    state_columns = StateColumns(ids=state_ids,
+                                 manpower=manpower,
+                                 categories=categories,
+                                 owners=owners,
+                                 controllers=controllers,
+                                 local_supplies=local_supplies,
+                                 impassable=impassable,
+                                 demilitarized_zone=demilitarized_zone,
+                                 provinces=provinces)
+
+    #只有部分地塊有的資料
+    for state_id, resource, building, core, claim in zip(state_ids,resources,buildings,cores,claims):
+        if resource is not None: state_columns.resources[state_id] = resource
+        if building is not None: state_columns.buildings[state_id] = building
+        if core is not None: state_columns.core[state_id] = core
+        if claim is not None: state_columns.claim[state_id] = claim
+
+    root.map_data.state_columns = state_columns
+    root.map_data.states = StateTable(state_columns)
+
     #將province回來映射
-    for state_id in root.map_data.states:
-        for province_id in root.map_data.states[state_id].provinces:
-            root.map_data.map_mapping.province_to_state[province_id] = state_id
+    root.map_data.province_columns.assign_states(state_columns)
 
-    del path, state_files, file, file_reading, data, state_id, resources, buildings, statement, province_statement, building_level
-    del victory_point_data, province_id, victory_point_value, state_category
+    del path, state_files, state_datas, statements, file, file_reading, data, state_id, resources, buildings, statement, province_statement, building_level
+    del building_statements, province_id, victory_point_value, state_category, state_rows, state_ids
+    del manpower, categories, owners, controllers, local_supplies, impassable, demilitarized_zone, provinces, cores, claims
+    del RESOURCES_QUERY, BUILDINGS_QUERY, VICTORY_POINTS_QUERY, STATE_CATEGORY_QUERY
 
     running_window.update_progress(90)
 
@@ -559,65 +512,33 @@ def read_map_files(running_window:RunningWindow) -> None:
             for file in strategicregion_files:
 
                 file_reading = file
-                data = pdxread(file)[0]
-                strategicregion_id = int(data["id"])
+
+                #只需要id、省份、名稱與海軍地形，weather等區塊不必解碼與建立
+                data = pdxread(file,mapped=True)[0]
+                strategicregion_id = data["id"]
                 provinces = data["provinces"]
-                name = data["name"].strip('"')
+                name = str(data["name"]).strip('"')
                 naval_terrain = data["naval_terrain"]
                 root.map_data.strategicregions[strategicregion_id] = StrategicRegion(strategicregion_id,provinces,name,naval_terrain=naval_terrain)
 
                 #建立省分的逆向映射
                 #留意: 原版的15 - Asia是空的
                 if provinces is not None:
-                    for province in provinces:
-                        root.map_data.map_mapping.province_to_strategic[int(province)] = strategicregion_id
+                    province_ids = np.asarray(provinces,dtype=np.int64)
+                    strategic_column = root.map_data.province_columns.strategic
+                    strategic_column[province_ids[province_ids < len(strategic_column)]] = strategicregion_id
 
-                        if running_window.is_cancel_task: return
+                if running_window.is_cancel_task: return
 
         except Exception as e:
             running_window.exception = f"讀取{file_reading}出現錯誤:{e}"
             print(fc.RED+tb.format_exc()+fc.CC)
             return
 
-    del path, strategicregions_file_path, strategicregion_files, file, file_reading, data, strategicregion_id, provinces, name, province
+    del path, strategicregions_file_path, strategicregion_files, file, file_reading, data, strategicregion_id, provinces, name
 
     running_window.update_progress(100)
 
-def read_supply_node_file(file_path:str) -> set[int]:
-    '''
-    讀取補給基地所在的省份
-
-    :param file_path: 檔案位置
-    :return: 一串紀錄省分ID的列表
-    '''
-    with open(file_path,"r",encoding="utf-8") as file:
-        result = list()
-        for line in file:
-            province = line.strip().split(" ")[1]
-            result.append(int(province))
-    
-    return set(result)
-
-def read_railway_file(file_path:str) -> tuple[Railway]:
-    '''
-    讀取鐵軌所在的省分及等級
-
-    :param file_path: 檔案位置
-    :return: 一串象徵每條鐵軌的列表
-    '''
-    with open(file_path,"r",encoding="utf-8") as file:
-        result = list()
-        for line in file:
-            single_railway_data = line.strip().split(" ")
-            railway_level = int(single_railway_data[0])
-
-            converted = list()
-            for province in single_railway_data[2:len(single_railway_data)]:
-                converted.append(int(province))
-            railway_provinces = converted[:]
-            result.append(Railway(railway_level,railway_provinces))
-    return tuple(result)
-
 def read_country_tag_file(running_window:RunningWindow) -> None:
     '''
     讀取國家代碼
@@ -639,11 +560,18 @@ def read_country_tag_file(running_window:RunningWindow) -> None:
 
     for index, country_tag_file in enumerate(using_country_tag_files.values()):
 
-        country_tag_pdxscript = pdxread(country_tag_file)
+        depth = 0
 
-        for statement in country_tag_pdxscript:
+        #只需要最外層的keyword = value
+        for event, keyword, value, _ in pdxiterparse(country_tag_file):
 
-            root.path.country_tag[statement.keyword] = statement.value.strip('"')
+            if event == "start": depth += 1
+
+            elif event == "end": depth -= 1
+
+            #值已轉型，dynamic_tags = yes等非國家代碼的設定不紀錄
+            elif event == "assign" and depth == 0 and isinstance(value,str):
+                root.path.country_tag[keyword] = value.strip('"')
 
             if running_window.is_cancel_task: return
         
@@ -696,204 +624,81 @@ def read_country_color(running_window:RunningWindow) -> None:
 
     running_window.update_progress(100)
 
-def create_province_map_image(running_window:RunningWindow) -> None:
-    '''
-    建立省分視圖
-    '''
-    running_window.update_progress(0)
-    root.game_image.province_map = root.game_image.province_image.copy()
-
-    running_window.update_progress(100)
-        
-def create_state_map_image(running_window:RunningWindow) -> None:
+def read_buildings_files(running_window:RunningWindow) -> None:
     '''
-    建立地塊視圖
+    讀取common/buildings
     '''
     running_window.update_progress(0)
-    state_image = root.game_image.province_image.copy()
-    w,h = state_image.size
 
-    pixels = state_image.load()
-
-    state_definition = dict()   #dict[list]，代表特定state id 之下的province顏色指派
-    recorded_state = set()      #用於在後續檢查時確認是否已經有存在的地塊顏色
+    #收集檔案
+    files:dict[str,str] = dict() # name: path
 
-    #預先建立查詢表以加快速度
-    color_to_state = dict()
-    for color in root.map_data.color_mapping.avalible_color:
-        state = State.from_province_id(Province.from_color(color).id)
-        if state is not None:
-            color_to_state[color] = state.id
-        
-        else:
-            color_to_state[color] = None
-
-    #對每個像素逐一檢查並修改
-    for x in range(w):
-        for y in range(h):
-            
-            #用戶中斷
-            if running_window.is_cancel_task: return
+    for path in root.path.avalible_path:
 
-            #獲取省分所在的地塊
-            state = color_to_state[pixels[x,y]]
+        building_dir = Path(path).joinpath("common/buildings")
+        building_files = list(building_dir.rglob("*.txt"))
 
-            #如果是海洋省份或未登記的省分，那就跳過該輪檢查
-            if state is None:
-                pixels[x,y] = (0,0,0)   #black
-                continue
-                
-            #如果是尚未紀錄的省分
-            if state not in recorded_state:
-                state_definition[state] = pixels[x,y]
-                recorded_state.add(state)
-            
-            #繪製
-            pixels[x,y] = state_definition[state]
-
-        running_window.update_progress(int((x/w)*100))
+        for building_file in building_files:
+            files[building_file.name] = building_file
     
-    root.game_image.state_map =  state_image
-
-def create_strategic_map_image(running_window:RunningWindow) -> None:
-    '''
-    建立戰略區視圖
-    '''
-    running_window.update_progress(0)
-    province_image = root.game_image.province_image.copy()
-    w,h = province_image.size
-
-    pixels = province_image.load()
-
-    strategic_definition = dict() #dict[list]，代表特定strategic id 之下的province顏色指派
-    recorded_strategic = set()
-
-    #預先建立查詢表以加快速度
-    color_to_strategic = dict()
-
-    for color in root.map_data.color_mapping.avalible_color:
+    #讀取，只取出buildings區塊內每個建築的屬性
+    for file in files.values():
 
-        try:
-            color_to_strategic[color] = StrategicRegion.from_province_id(Province.from_color(color).id)
-        except:
-            running_window.exception = f"以下省分尚未指派戰略區，請在戰略區文件中添加該省分:{Province.from_color(color).id}"
-            return
+        block_path:list[str] = list()   #當前所在的區塊keyword
+        building:dict = dict()          #當前建築的屬性
+        level_cap:dict = dict()         #當前建築的level_cap
 
-    #對每個像素逐一檢查並修改
-    for x in range(w):
-        for y in range(h):
-            
-            #用戶中斷
-            if running_window.is_cancel_task: return
+        for event, keyword, value, _ in pdxiterparse(file):
 
-            #獲取省分所在的戰略區
-            strategic_id = color_to_strategic[pixels[x,y]]
-                
-            #如果是尚未紀錄的省分
-            if strategic_id not in recorded_strategic:
-                strategic_definition[strategic_id] = pixels[x,y]
-                recorded_strategic.add(strategic_id)
-            
-            pixels[x,y] = strategic_definition[strategic_id]
-
-        running_window.update_progress(int((x/w)*100))
-    
-    root.game_image.strategic_map = province_image
+            if event == "start":
+                block_path.append(keyword)
 
-def create_nation_map_image(running_window:RunningWindow) -> None:
-    '''
-    建立無條件時的政權地圖(有條件ex:比屬剛果)
-    有條件的真的太麻煩，情況太多，不考慮處理。
-    '''
-    running_window.update_progress(0)
-    nation_map_image = root.game_image.province_image.copy()
+                if len(block_path) == 2 and block_path[0] == "buildings":
+                    building = dict()
+                    level_cap = dict()
 
-    pixels = nation_map_image.load()
+            elif event == "end":
 
-    #建立查詢表
-    get_country_color = dict()
-    for color in root.map_data.color_mapping.avalible_color:
+                if len(block_path) == 2 and block_path[0] == "buildings":
+                    record_building(block_path[1],building,level_cap)
 
-        try:
-            get_country_color[color] = root.map_data.color_mapping.country_color[State.from_province_id(Province.from_color(color).id).owner]
-
-        except AttributeError:
-            get_country_color[color] = (0,0,0) #black
-        
-        except KeyError:
-            get_country_color[color] = (25,25,25)   #gray
-    
-    #對每個像素進行繪製
-    w,h = nation_map_image.size
+                block_path.pop()
 
-    for x in range(w):
-        for y in range(h):
+            elif event == "assign" and len(block_path) >= 2 and block_path[0] == "buildings":
 
-            pixels[x,y] = get_country_color[pixels[x,y]]
+                if len(block_path) == 2:
+                    building[keyword] = value
 
-            if running_window.is_cancel_task: return
+                elif len(block_path) == 3 and block_path[2] == "level_cap":
+                    level_cap[keyword] = value
 
-        running_window.update_progress(int((x/w)*100))
-    
-    root.game_image.nation_map =  nation_map_image
+        if running_window.is_cancel_task: return
 
-def read_buildings_files(running_window:RunningWindow) -> None:
+def record_building(name:str,building:dict[str,str],level_cap:dict[str,str]) -> None:
     '''
-    讀取common/buildings
-    '''
-    running_window.update_progress(0)
-
-    #收集檔案
-    files:dict[str,str] = dict() # name: path
-
-    for path in root.path.avalible_path:
+    將建築屬性紀錄為BuildingData
 
-        building_dir = Path(path).joinpath("common/buildings")
-        building_files = list(building_dir.rglob("*.txt"))
+    :param name: 建築名稱
+    :param building: 建築區塊中的keyword = value
+    :param level_cap: level_cap區塊中的keyword = value
+    '''
 
-        for building_file in building_files:
-            files[building_file.name] = building_file
-    
-    #讀取
-    for file in files.values():
+    using_slot = "non-shared"
 
-        data = PDXstatement("file",pdxread(file))["buildings"].value
+    if "shares_slots" in level_cap:using_slot = "shared"
 
-        for building_type_statement in data:
+    elif "province_max" in level_cap:using_slot = "provincial"
 
-            statement:PDXstatement = building_type_statement
+    if "state_max" in level_cap:
+        max_level = level_cap["state_max"]
 
-            name = statement.keyword
-            icon_frame = statement["icon_frame"]
-            
-            level_cap_statement = statement["level_cap"]
+    elif "province_max" in level_cap:
+        max_level = level_cap["province_max"]
 
-            using_slot = "non-shared"
+    else:
+        max_level = 15 # by hoi4 default
 
-            if level_cap_statement["shares_slots"] is not None:using_slot = "shared"
-                
-            elif level_cap_statement["province_max"] is not None:using_slot = "provincial"
-            
-            if level_cap_statement["state_max"] is not None:
-                max_level = level_cap_statement["state_max"]
-            
-            elif level_cap_statement["province_max"] is not None:
-                max_level = level_cap_statement["province_max"]
-            
-            else:
-                max_level = 15 # by hoi4 default
-            
-            if statement["only_costal"] is not None:    #原文如此
-                only_coastal = True
-            
-            else:
-                only_coastal = False
-            
-            if statement["disabled_in_dmz"] is not None:
-                disabled_in_dmz = True
-            
-            else:
-                disabled_in_dmz = False
-
-            root.common_data.buildings[name] = BuildingData(name,icon_frame,using_slot,only_coastal,disabled_in_dmz,max_level)
+    only_coastal = "only_costal" in building    #原文如此
+    disabled_in_dmz = "disabled_in_dmz" in building
 
+    root.common_data.buildings[name] = BuildingData(name,building.get("icon_frame"),using_slot,only_coastal,disabled_in_dmz,max_level)
@@ -6,10 +6,17 @@ root.py
 更新時請檢察cache_reader.py是否正常修改
 '''
 
+from collections.abc import Mapping
+
+import numpy as np
 from PIL import Image
 import ttkbootstrap as ttk
 
 from libs.abstract.abstract_map import *
+from libs.loc_store import LocStore
+from libs.map_render import BorderOverlays, MapModeCache, MapRaster
+from libs.map_store import PROVINCE_ID, Adjacencies, ProvinceColumns, Railways, StateColumns, UnitStacks
+from libs.reader.loc_checker import LocReport
 from libs.misc.buildings import BuildingData
 
 class RootImage:
@@ -21,44 +28,32 @@ class RootImage:
         self.terrain_image:Image.Image          #terrain.bmp
         self.heightmap_image:Image.Image        #heightmap.bmp
         self.rivers_image:Image.Image           #rivers.bmp
-
-        self.province_map:Image.Image           #省分視圖
-        self.state_map:Image.Image              #地塊視圖
-        self.strategic_map:Image.Image          #戰略區視圖
-        self.nation_map:Image.Image             #政權視圖
+        self.province_raster:MapRaster          #provinces.bmp每個像素的省分ID，地圖模式以此繪製
 
 class ColorMapping:
     '''
     顏色指派儲存區
     '''
     def __init__(self) -> None:
-        self.avalible_color:set[tuple[int,int,int]] = set()         #省分顏色集合
-        self.province_id_from_color:dict[tuple,int] = dict()        #由顏色獲取省分id
         self.country_color: dict[str,tuple[int,int,int]] = dict()   #國家TAG對上顏色
 
-class MapMapping:
-    '''
-    地圖相關的儲存區
-    '''
-    def __init__(self) -> None:
-        self.province_to_state:dict[int,int] = dict()           #省分ID對上地塊ID
-        self.province_to_strategic:dict[int,int] = dict()       #省分ID對上戰略區ID
-
 class Mapdata:
     '''
     地圖資料儲存區
     '''
     def __init__(self) -> None:
-        self.province:dict[int,Province] = dict()               #省分資料
-        self.adjacencies: set[Adjacency] = set()                #省分連結
+        self.province:Mapping[int,Province] = dict()            #省分資料，為province_columns的檢視
+        self.province_columns:ProvinceColumns = ProvinceColumns()   #省分資料的陣列，以省分ID為索引
+        self.adjacencies:Adjacencies = Adjacencies()            #省分連結
         self.adjacency_rules: dict[str,AdjacencyRule] = dict()  #省分連結規則，以代號為key找到其規則
         self.continents: dict[int,str] = dict()                 #大陸指派，以id為key找到其字串
-        self.supply_nodes: set[int] = set()                     #補給基地的所在省分
-        self.railways: tuple[Railway]                           #鐵路
+        self.supply_nodes:np.ndarray = np.zeros(0,dtype=PROVINCE_ID)   #補給基地的所在省分，排序後不重複
+        self.railways:Railways = Railways()                     #鐵路
+        self.unitstacks:UnitStacks = UnitStacks()               #物件位置(unitstacks.txt)，包含勝利點、港口與建築的位置
         self.strategicregions:dict[int,StrategicRegion] = dict()   #map/strategicregions
-        self.states:dict[int,State] = dict()                    #地塊
+        self.states:Mapping[int,State] = dict()                 #地塊，為state_columns的檢視
+        self.state_columns:StateColumns = StateColumns()        #地塊資料的陣列，以地塊ID為索引
 
-        self.map_mapping:MapMapping = MapMapping()              #地圖元件映射
         self.color_mapping:ColorMapping = ColorMapping()        #顏色指派
 
 class Rootpath:
@@ -85,11 +80,14 @@ class Root(ttk.Window):
         super().__init__(*args,**kwargs)
         self.mod_lang: str = "simp_chinese"         #模組開發語言(主要影響讀取本地化文件時的路徑)
         self.using_cache:bool = True                #使用快取建立檔案
-        self.game_loc: dict = dict()                #本地化文件
+        self.game_loc: LocStore = LocStore("data/loc.db")   #本地化文件，存放在硬碟，查詢時才讀取
+        self.loc_report: LocReport | None = None            #本地化文件的檢查結果
         self.path:Rootpath = Rootpath()             #路徑
         self.map_data:Mapdata = Mapdata()           #地圖資訊
         self.common_data:CommonData = CommonData()  #難以歸類的遊戲資料
         self.game_image:RootImage = RootImage()     #圖像
+        self.map_modes:MapModeCache = MapModeCache()    #地圖模式的圖像，選用時才繪製，不寫入快取
+        self.map_borders:BorderOverlays = BorderOverlays()  #地圖上的邊界圖層，不寫入快取
 
 root:Root = Root(title="鋼鐵雄心四模組工具",
                  themename="darkly",
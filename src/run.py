@@ -3,6 +3,12 @@ run.py
 
 程式從這裡開始執行
 '''
-from hoi4_modding_tool import App
+import multiprocessing
 
-App()
\ No newline at end of file
+#pdxscript.read_many以spawn啟動子process時會重新匯入本檔案，主程式只能在主process執行
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
+    from hoi4_modding_tool import App
+
+    App()